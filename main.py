@@ -1,29 +1,25 @@
 """Main program for playing and testing Connect 4 minimax with iterative deepening."""
 
 import time
-from src.connect_4 import(
-    make_move, check_win, minimax,
-    create_board, check_draw
-)
+from src.bitboard import CONNECT
+from src.book import open_book
+from src.engine import Engine
+from src.tablebase import open_tablebase
 
-def print_board(board):
+def print_board(board, connect=CONNECT):
     """
     Pretty-print the current board state.
-    If a player has won, highlight the winning 4-in-a-row in brackets.
+    If a player has won, highlight the winning `connect`-in-a-row in brackets.
     """
     print()
 
+    win_patterns = [[(i * dx, i * dy) for i in range(1, connect)]
+                    for dx, dy in ((1, 1), (1, 0), (0, 1), (-1, 1))]
     win_coords = set()
     for player in [1, 2]:
         ps = {(x, y) for y, row in enumerate(board)
               for x, cell in enumerate(row) if cell == player}
         for x, y in ps:
-            win_patterns = [
-                [(1, 1), (2, 2), (3, 3)],
-                [(1, 0), (2, 0), (3, 0)],
-                [(0, 1), (0, 2), (0, 3)],
-                [(-1, 1), (-2, 2), (-3, 3)]
-            ]
             for pattern in win_patterns:
                 coords = [(x + dx, y + dy) for dx, dy in pattern]
                 if all(c in ps for c in coords):
@@ -60,85 +56,86 @@ def cell_repr(cell):
     return "O"
 
 
-def iterative_deepening(board, cal_time, maximizing, last_move):
+def engine_move(engine, cal_time):
     """
-    Function for calling minimax in a deepening search.
-    Minimax runs iteratively depth by depth until the given calculation time is reached.
+    Let `engine` search its game for `cal_time` seconds and print the
+    calculation time and how the player to move sees the position.
+    Returns the chosen column.
     """
     start_time = time.time()
-    if check_win(board, last_move):
-        return (None, None), None
-    memory = {}
-    depth = 0
-    best_eval, best_move = 0, None
-    while time.time() - start_time < cal_time:
-        depth += 1
-        best_eval, best_move = minimax(
-            board, depth, float("-inf"), float("inf"),
-            maximizing, memory, last_move
-        )
-        if abs(best_eval) >= 100000:
-            break
+    player = engine.position.player
+    result = engine.best_move(budget=cal_time)
     print(f"calculation time: {(time.time() - start_time):.2f} seconds")
-    return (best_eval, best_move), depth
+    score = result.score if player == 1 else -result.score
+    print(f"Player {player} calculates with a depth of {result.depth} "
+          f"that the position is {score} points for him")
+    return result.move
+
 
+def ask_move(engine, ponder):
+    """
+    Ask the player for a move in the game of `engine` until a playable
+    column is given. With `ponder` the engine searches in the background
+    while waiting. Returns the column.
+    """
+    if ponder:
+        engine.ponder()
+    while True:
+        answer = input("Make a move: ").strip()
+        move = int(answer) - 1 if answer.isdigit() else -1
+        if move in engine.position.valid_columns():
+            break
+        print(f"Choose a column from 1 to {engine.position.geometry.cols} that isn't full")
+    engine.ponderer.stop()
+    if ponder and engine.ponderer.hit(move):
+        print(f"Pondered your move to a depth of {engine.ponderer.depth}")
+    return move
 
 
-def play_game(side, cal_time):
+def run_game(engines, players):
+    """
+    Play a game from the empty board. `players[player]` returns the move
+    of player 1 or 2, and every Engine of `engines` plays every move, so
+    they all follow the game. Prints the board after every move and the result.
+    """
+    for engine in engines:
+        engine.new_game()
+    position = engines[0].position
+    while True:
+        player = position.player
+        move = players[player]()
+        for engine in engines:
+            winner = engine.play(move)
+        print_board(position.to_board())
+        if winner == player:
+            print(f"{player} Won on round {(len(position.moves) + 1) // 2}")
+            return
+        if winner == 0:
+            print("Game drawn")
+            return
+
+
+def play_game(side, cal_time, ponder=True, engine=None):
     """
     Function for playing against the minimax algorithm.
     Assigns player to the side they desired.
     The opponent is a minimax that calculates a fixed time.
+    `engine` is the Engine of the opponent, kept between games.
+    With `ponder` the opponent keeps searching while waiting for the
+    player's move.
     """
-    board = create_board()
-    last_move = None
-    for i in range(22):
-        if side == 1:
-            best_move = int(input("Make a move: ")) - 1
-            last_move = make_move(board, best_move, 1)
-            print_board(board)
-            if check_win(board, last_move):
-                print(f"1 Won on round {i+1}")
-                break
-            if check_draw(board):
-                print("Game drawn")
-                break
+    if engine is None:
+        engine = Engine()
+    players = {side: lambda: ask_move(engine, ponder),
+               3 - side: lambda: engine_move(engine, cal_time)}
+    run_game([engine], players)
 
-            best, cal_depth = iterative_deepening(board, cal_time, False, last_move)
-            best_eval, best_move = best
-            last_move = make_move(board, best_move, 2)
-            print(f"Player 2 calculates with a depth of {cal_depth} "
-                  f"that the position is {-best_eval} points for him")
-            print_board(board)
-            if check_win(board, last_move):
-                print(f"2 Won on round {i+1}")
-                break
-            if check_draw(board):
-                print("Game drawn")
-                break
-        else:
-            best, cal_depth = iterative_deepening(board, cal_time, True, last_move)
-            best_eval, best_move = best
-            last_move = make_move(board, best_move, 1)
-            print(f"Player 1 calculates with a depth of {cal_depth} "
-                  f"that the position is {best_eval} points for him")
-            print_board(board)
-            if check_win(board, last_move):
-                print(f"1 Won on round {i+1}")
-                break
-            if check_draw(board):
-                print("Game drawn")
-                break
 
-            best_move = int(input("Make a move: ")) - 1
-            last_move = make_move(board, best_move, 2)
-            print_board(board)
-            if check_win(board, last_move):
-                print(f"2 Won on round {i+1}")
-                break
-            if check_draw(board):
-                print("Game drawn")
-                break
+def watch_game(cal_time1, cal_time2, engines):
+    """Let the two Engines of `engines` play each other with their calculation times."""
+    players = {1: lambda: engine_move(engines[0], cal_time1),
+               2: lambda: engine_move(engines[1], cal_time2)}
+    run_game(engines, players)
 
 
 def main():
@@ -147,8 +144,13 @@ def main():
     The player has two choices:
     1. Play against the bot -> choose side and calculation depth for minimax.
     2. Watch two minimax play -> choose the starting position and their calculation depth.
+    The engines use the opening book opening_book.bin and the endgame
+    tablebase tablebase.bin if there are such files.
     """
     choice = None
+    book, tablebase = open_book(), open_tablebase()
+    engine = Engine(book=book, tablebase=tablebase)
+    watch_engines = None
     print("Welcome to Connect 4")
     while choice != "exit":
         print("Play against bot (play)")
@@ -159,51 +161,22 @@ def main():
             first = input("Play first? (y/n): ").strip().lower()
             cal_time = float(input("Choose enemy calculation time: "))
             if first == "y":
-                play_game(1, cal_time)
+                play_game(1, cal_time, engine=engine)
                 choice = None
                 time.sleep(1)
             if first == "n":
-                play_game(2, cal_time)
+                play_game(2, cal_time, engine=engine)
                 choice = None
                 time.sleep(1)
 
-        while choice == "watch":
-            board = create_board()
+        if choice == "watch":
+            if watch_engines is None:
+                watch_engines = (Engine(book=book, tablebase=tablebase),
+                                 Engine(book=book, tablebase=tablebase))
             cal_time1 = float(input("Choose player 1 calculation time: "))
             cal_time2 = float(input("Choose player 2 calculation time: "))
-            last_move = None
-
-            for i in range(22):
-                best, cal_depth = iterative_deepening(board, cal_time1, True, last_move)
-                best_eval, best_move = best
-                last_move = make_move(board, best_move, 1)
-                print(f"Player 1 calculates with a depth of {cal_depth} "
-                      f"that the position is {best_eval} points for him")
-                print_board(board)
-                if check_win(board, last_move):
-                    print(f"1 Won on round {i+1}")
-                    choice = None
-                    break
-
-                if check_draw(board):
-                    print("Game drawn")
-                    choice = None
-                    break
-
-                best, cal_depth = iterative_deepening(board, cal_time2, False, last_move)
-                best_eval, best_move = best
-                last_move = make_move(board, best_move, 2)
-                print(f"Player 2 calculates with a depth of {cal_depth} "
-                      f"that the position is {-best_eval} points for him")
-                print_board(board)
-                if check_win(board, last_move):
-                    print(f"2 Won on round {i+1}")
-                    choice = None
-                    break
-                if check_draw(board):
-                    print("Game drawn")
-                    choice = None
-                    break
+            watch_game(cal_time1, cal_time2, watch_engines)
+            choice = None
 
 
 if __name__ == "__main__":
@@ -0,0 +1,297 @@
+"""
+Module providing the analysis of game records: every position of every
+game is searched at a fixed depth or node budget and its score and best
+move are streamed out as JSON lines.
+
+Run the analysis with:
+    python -m src.analysis games.txt --output analysis.jsonl --depth 10
+Every line of the input is one game, either a string of the columns (1-7)
+played such as "4453" or a JSON object with "moves", like the records of
+a tournament. The input is read lazily, so it can be any size or "-" for
+stdin, and the output is written in the order of the input, one line per
+position:
+    {"game": 0, "ply": 2, "moves": "44", "move": 3, "score": 12, "depth": 10, ...}
+If the analysis is interrupted, running the same command again continues
+after the last position written.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+
+from .bitboard import Position, mirror_move
+from .connect_4 import SearchState
+from .engine import Engine
+from .solver import position_from_moves
+from .transposition import DEFAULT_TABLE_SIZE
+
+DEFAULT_DEPTH = 10
+DEFAULT_CACHE_SIZE = 100000
+PENDING_PER_WORKER = 4
+
+# The engine of a worker process, made by _init_worker.
+_worker = {}
+
+
+def _init_worker(table_size):
+    """Give the worker process an Engine for all the positions it searches."""
+    _worker["engine"] = Engine(table_size)
+
+
+def _search(moves, depth, nodes):
+    """
+    Search the position after `moves` in a worker to `depth` or about
+    `nodes` nodes. The table is cleared first, so the result doesn't
+    depend on what the worker searched before.
+    """
+    engine = _worker["engine"]
+    engine.memory.clear()
+    state = SearchState(node_limit=nodes if nodes is not None else float("inf"))
+    result = engine.best_move(position_from_moves(moves), float("inf"), depth, state)
+    return {"move": result.move, "score": result.score, "depth": result.depth,
+            "nodes": result.state.nodes}
+
+
+def read_games(lines):
+    """
+    Yield the move string of every game record of `lines`, an iterable of
+    lines such as an open file. Blank lines and lines starting with # are
+    skipped. A line that isn't valid JSON or has no moves gives its text.
+    """
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("{"):
+            try:
+                line = str(json.loads(line).get("moves", ""))
+            except (ValueError, AttributeError):
+                pass
+        yield line
+
+
+def game_positions(games):
+    """
+    Yield a dict for every position of the games of `games`, move strings
+    as given by `read_games`: the number of the game, the ply and the moves
+    played to reach it. Every position where a move is still to be played
+    is yielded, so a finished game gives one position per move. A game
+    with an invalid move gives a dict with its "error" after its valid
+    positions, and so does a game with moves after it has ended.
+    """
+    for game, moves in enumerate(games):
+        position = Position()
+        for ply in range(len(moves) + 1):
+            if position.moves and position.is_win(3 - position.player) or position.is_full():
+                if ply < len(moves):
+                    yield {"game": game, "ply": ply, "moves": moves,
+                           "error": f"Moves after the end of the game in {moves}"}
+                break
+            yield {"game": game, "ply": ply, "moves": moves[:ply]}
+            if ply == len(moves):
+                break
+            char = moves[ply]
+            col = int(char) - 1 if char.isdigit() else -1
+            if not 0 <= col < position.geometry.cols or not position.can_play(col):
+                yield {"game": game, "ply": ply, "moves": moves,
+                       "error": f"Invalid move {char} in {moves}"}
+                break
+            position.play(col)
+
+
+def resume_point(path):
+    """
+    Return the number of records in the output file `path` and the last
+    of them, (0, None) if there is no file. A last line cut short by an
+    interruption is removed from the file.
+    """
+    if not os.path.exists(path):
+        return 0, None
+    count, last, end = 0, None, 0
+    with open(path, "rb") as file:
+        for line in file:
+            if not line.endswith(b"\n"):
+                break
+            count, last, end = count + 1, line, end + len(line)
+    if end != os.path.getsize(path):
+        with open(path, "r+b") as file:
+            file.truncate(end)
+    return count, json.loads(last) if last is not None else None
+
+
+class Analysis:
+    """
+    Searches the positions of game records in a pool of `workers`
+    processes (all cores by default), every worker with an Engine with a
+    table of `table_size` entries.
+    Every position is searched to `depth`, or for about `nodes` nodes when
+    that is given, from a cleared table, so a position gets the same
+    result whichever worker searches it and whatever it searched before,
+    and a resumed run writes the same records as an uninterrupted one.
+    Results are cached by the canonical key of the position, so a
+    position that several games reach, or its mirror image, is searched
+    once. The cache keeps the last `cache_size` positions and at most
+    PENDING_PER_WORKER positions per worker are searched ahead of the
+    output, so the memory used doesn't grow with the input.
+    """
+
+    def __init__(self, depth=DEFAULT_DEPTH, nodes=None, workers=None,
+                 table_size=DEFAULT_TABLE_SIZE, cache_size=DEFAULT_CACHE_SIZE):
+        self.depth = None if nodes is not None else depth
+        self.nodes = nodes
+        self.workers = workers or os.cpu_count() or 1
+        self.table_size = table_size
+        self.cache_size = cache_size
+        self.searched = 0
+        self.cache_hits = 0
+        self._cache = OrderedDict()
+
+    def run(self, positions, skip=0, last=None):
+        """
+        Yield the record of every position of `positions`, dicts as given
+        by `game_positions`, in their order. The first `skip` positions
+        were already written by an earlier run and are passed over; `last`
+        is the last record written then, which must be the record of the
+        last position passed over.
+        Raises ValueError if `last` doesn't match the positions.
+        """
+        pending = deque()
+        running = {}
+        executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                       initargs=(self.table_size,))
+        try:
+            passed = 0
+            for record in positions:
+                if passed < skip:
+                    passed += 1
+                    if passed == skip:
+                        _check_resume(record, last)
+                    continue
+                pending.append(self._start(record, running, executor))
+                while len(pending) > PENDING_PER_WORKER * self.workers:
+                    yield self._finish(pending.popleft(), running)
+            if passed < skip:
+                raise ValueError("The output has more records than the input has positions")
+            while pending:
+                yield self._finish(pending.popleft(), running)
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+    def _start(self, record, running, executor):
+        """
+        Start the analysis of one position: take its result from the cache,
+        join the search of the same position already running, or start a
+        search. Returns the pending entry of the position.
+        """
+        if "error" in record:
+            return record, None, False, None
+        key, mirrored = position_from_moves(record["moves"]).canonical_key()
+        source = self._cache.get(key)
+        if source is not None:
+            self._cache.move_to_end(key)
+        else:
+            source = running.get(key)
+        if source is not None:
+            self.cache_hits += 1
+            return record, key, mirrored, source
+        running[key] = _Job(executor.submit(_search, record["moves"], self.depth, self.nodes),
+                            mirrored)
+        self.searched += 1
+        return record, key, mirrored, running[key]
+
+    def _finish(self, entry, running):
+        """Wait for the result of a pending entry and return its output record."""
+        record, key, mirrored, source = entry
+        if key is None:
+            return record
+        cached = not isinstance(source, _Job) or not source.first
+        if isinstance(source, _Job):
+            source.first = False
+            if running.get(key) is source:
+                del running[key]
+                self._cache[key] = source.result()
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            source = source.result()
+        answer = dict(record, **source, cached=cached)
+        if mirrored and answer["move"] is not None:
+            answer["move"] = mirror_move(answer["move"])
+        return answer
+
+
+class _Job:
+    """A search running in the pool for the position, mirrored or not, that started it."""
+
+    def __init__(self, future, mirrored):
+        self.future = future
+        self.mirrored = mirrored
+        self.first = True
+
+    def result(self):
+        """Wait for the search and return its result for the canonical position."""
+        result = self.future.result()
+        if self.mirrored and result["move"] is not None:
+            result = dict(result, move=mirror_move(result["move"]))
+        return result
+
+
+def _check_resume(record, last):
+    """Raise ValueError if `last`, the last record of the output, isn't the record of `record`."""
+    if last is None or any(last.get(name) != record[name] for name in ("game", "ply", "moves")):
+        raise ValueError("The output doesn't belong to this input, remove it to start again")
+
+
+def analyze(lines, output, depth=DEFAULT_DEPTH, nodes=None, workers=None,
+            table_size=DEFAULT_TABLE_SIZE, cache_size=DEFAULT_CACHE_SIZE):
+    """
+    Analyse every position of the game records `lines` (see `read_games`)
+    and append a JSON line per position to the file `output`, continuing
+    after the records an earlier run already wrote there.
+    Returns the Analysis with its counts of searches and cache hits.
+    """
+    skip, last = resume_point(output)
+    analysis = Analysis(depth, nodes, workers, table_size, cache_size)
+    with open(output, "a", encoding="utf-8") as file:
+        for record in analysis.run(game_positions(read_games(lines)), skip, last):
+            file.write(json.dumps(record) + "\n")
+            file.flush()
+    return analysis
+
+
+def main():
+    """Command line entry point for analysing game records."""
+    parser = argparse.ArgumentParser(description="Analyse every position of connect four games.")
+    parser.add_argument("input", nargs="?", default="-",
+                        help="file of games, one per line, or - for stdin")
+    parser.add_argument("--output", default="analysis.jsonl", help="JSONL file to write to")
+    parser.add_argument("--depth", type=int, default=DEFAULT_DEPTH, help="fixed search depth")
+    parser.add_argument("--nodes", type=int, help="fixed nodes per position instead of a depth")
+    parser.add_argument("--workers", type=int, help="worker processes (all cores by default)")
+    parser.add_argument("--table-size", type=int, default=DEFAULT_TABLE_SIZE,
+                        help="transposition table entries per worker")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE,
+                        help="positions kept in the result cache")
+    args = parser.parse_args()
+
+    start = time.time()
+    try:
+        if args.input == "-":
+            analysis = analyze(sys.stdin, args.output, args.depth, args.nodes, args.workers,
+                               args.table_size, args.cache_size)
+        else:
+            with open(args.input, encoding="utf-8") as file:
+                analysis = analyze(file, args.output, args.depth, args.nodes, args.workers,
+                                   args.table_size, args.cache_size)
+    except ValueError as error:
+        print(f"Can't continue {args.output}: {error}", file=sys.stderr)
+        sys.exit(2)
+    print(f"Searched {analysis.searched} positions, {analysis.cache_hits} from the cache, "
+          f"in {time.time() - start:.1f} s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
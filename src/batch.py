@@ -0,0 +1,63 @@
+"""Module providing a vectorized heuristic for scoring many positions at once with NumPy."""
+
+import numpy as np
+
+from .bitboard import ROWS, COLS, cell_bit
+from .evaluation import HEURISTIC_TABLE, LINES, LINE_TABLES
+
+# Cells are numbered y * COLS + x, the order of a flattened create_board list.
+_CELL_BITS = np.array([cell_bit(x, y) for y in range(ROWS) for x in range(COLS)],
+                      dtype=np.uint64)
+_WEIGHTS = np.array(HEURISTIC_TABLE, dtype=np.int64).reshape(-1)
+
+
+def _line_groups():
+    """
+    Return (cells, powers, table) for every line length.
+    cells holds the flat cell indices of all lines of that length, one row
+    per line, and table the run score of every base 3 line code.
+    """
+    groups = []
+    for length in sorted({len(line) for line in LINES}):
+        lines = [i for i, line in enumerate(LINES) if len(line) == length]
+        cells = np.array([[y * COLS + x for x, y in LINES[i]] for i in lines], dtype=np.intp)
+        powers = 3 ** np.arange(length, dtype=np.int64)
+        table = np.array(LINE_TABLES[lines[0]], dtype=np.int64)
+        groups.append((cells, powers, table))
+    return groups
+
+
+_LINE_GROUPS = _line_groups()
+
+
+def bitboards(positions):
+    """Return an N x 2 array of the player 1 and player 2 bitboards of Positions."""
+    return np.array([(p.boards[1], p.boards[2]) for p in positions], dtype=np.uint64)
+
+
+def bitboards_to_cells(pairs):
+    """Return an N x 6 x 7 array of cells for an N x 2 array of bitboard pairs."""
+    pairs = np.asarray(pairs, dtype=np.uint64)
+    p1 = (pairs[:, 0, None] >> _CELL_BITS) & np.uint64(1)
+    p2 = (pairs[:, 1, None] >> _CELL_BITS) & np.uint64(1)
+    return (p1 + 2 * p2).astype(np.int8).reshape(-1, ROWS, COLS)
+
+
+def heuristic_batch(boards):
+    """
+    Return the `heuristic` score of N positions as an array of N integers.
+    `boards` is either an N x 6 x 7 array of cells (0 empty, 1 and 2 players)
+    in the `create_board` layout or an N x 2 array of bitboard pairs.
+    Every line is turned into its base 3 code with one matrix product per
+    line length and scored from the same tables as EvaluatedPosition.
+    """
+    boards = np.asarray(boards)
+    if boards.ndim == 2 and boards.shape[1] == 2:
+        boards = bitboards_to_cells(boards)
+    cells = boards.reshape(len(boards), ROWS * COLS).astype(np.int64)
+
+    scores = (cells == 1) @ _WEIGHTS - (cells == 2) @ _WEIGHTS
+    for line_cells, powers, table in _LINE_GROUPS:
+        codes = cells[:, line_cells] @ powers
+        scores += table[codes].sum(axis=1)
+    return scores
@@ -0,0 +1,175 @@
+"""
+Module providing a fixed-depth and fixed-node benchmark of the search over
+a fixed set of positions, compared against a stored baseline.
+
+Run the benchmark with:
+    python -m src.benchmark --depth 10
+and store a new baseline with --update.
+"""
+
+import argparse
+import json
+import sys
+import time
+
+from .connect_4 import SearchState
+from .engine import Engine
+from .solver import position_from_moves
+from .transposition import DEFAULT_TABLE_SIZE
+
+DEFAULT_DEPTH = 10
+DEFAULT_BASELINE = "benchmark_baseline.json"
+
+# Positions given as the columns (1-7) played from the empty board.
+# None of them is won, and the side to move can't win at once in any of them.
+POSITIONS = (
+    ("opening", ""),
+    ("opening", "4"),
+    ("opening", "44"),
+    ("opening", "324"),
+    ("opening", "61175"),
+    ("middlegame", "135152114"),
+    ("middlegame", "41215417512"),
+    ("middlegame", "3425153576215"),
+    ("middlegame", "562315615152465"),
+    ("middlegame", "755773363545741713"),
+    ("endgame", "466116636564374731432"),
+    ("endgame", "455714637617614767242476"),
+    ("endgame", "117636223453273741776455261"),
+    ("endgame", "612446361123226564136743342112"),
+)
+
+
+def bench_position(moves, depth=None, nodes=None, table_size=DEFAULT_TABLE_SIZE):
+    """
+    Search the position after `moves` to `depth`, or until about `nodes`
+    nodes are searched, with a new Engine.
+    Returns a dict with the nodes, time, nodes per second, depth reached,
+    move, score and the time to reach every depth.
+    """
+    engine = Engine(table_size)
+    position = position_from_moves(moves)
+    state = SearchState(node_limit=nodes if nodes is not None else float("inf"))
+    start = time.perf_counter()
+    move, score, reached, state = engine.best_move(position, float("inf"), depth, state)
+    seconds = time.perf_counter() - start
+    to_depth, elapsed = [], 0
+    for record in state.depths:
+        elapsed += record["time"]
+        to_depth.append(elapsed)
+    return {"moves": moves, "nodes": state.nodes, "time": seconds,
+            "nps": state.nodes / seconds if seconds > 0 else None,
+            "depth": reached, "move": move, "score": score, "time_to_depth": to_depth}
+
+
+def run_benchmark(depth=DEFAULT_DEPTH, nodes=None, table_size=DEFAULT_TABLE_SIZE, repeat=1,
+                  positions=POSITIONS):
+    """
+    Benchmark every position of `positions` at a fixed `depth`, or a fixed
+    number of `nodes` per position when it is given.
+    Every position is searched `repeat` times and the fastest time is kept,
+    which filters out most of the noise of other programs.
+    The signature is the total node count: the search is deterministic,
+    so it only changes when the search itself changes.
+    """
+    if nodes is not None:
+        depth = None
+    results = []
+    for phase, moves in positions:
+        runs = [bench_position(moves, depth, nodes, table_size) for _ in range(repeat)]
+        result = min(runs, key=lambda run: run["time"])
+        result["phase"] = phase
+        results.append(result)
+    total_nodes = sum(result["nodes"] for result in results)
+    total_time = sum(result["time"] for result in results)
+    return {"depth": depth, "nodes_limit": nodes, "table_size": table_size,
+            "signature": total_nodes, "nodes": total_nodes, "time": total_time,
+            "nps": total_nodes / total_time if total_time > 0 else None,
+            "positions": results}
+
+
+def compare(result, baseline, time_tolerance=0.25, node_tolerance=0.0):
+    """
+    Compare a benchmark result with a baseline of the same settings.
+    Returns a list of regressions, empty when there are none: more nodes
+    than the baseline allows with `node_tolerance`, or more time than it
+    allows with `time_tolerance` (0.25 allows 25% more).
+    Raises ValueError if the settings of the two differ.
+    """
+    for setting in ("depth", "nodes_limit", "table_size"):
+        if result[setting] != baseline[setting]:
+            raise ValueError(f"Baseline {setting} {baseline[setting]} differs from "
+                             f"{result[setting]}")
+    if [r["moves"] for r in result["positions"]] != [b["moves"] for b in baseline["positions"]]:
+        raise ValueError("Baseline was made from other positions")
+    regressions = []
+    if result["nodes"] > baseline["nodes"] * (1 + node_tolerance):
+        regressions.append(f"nodes {result['nodes']} > baseline {baseline['nodes']}")
+    if result["time"] > baseline["time"] * (1 + time_tolerance):
+        regressions.append(f"time {result['time']:.2f} s > baseline {baseline['time']:.2f} s "
+                           f"+ {time_tolerance:.0%}")
+    return regressions
+
+
+def load_baseline(path):
+    """Return the baseline stored in the JSON file `path`."""
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save_baseline(result, path):
+    """Write a benchmark result to the JSON file `path` as the new baseline."""
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(result, file, indent=1)
+        file.write("\n")
+
+
+def main():
+    """Command line entry point for the benchmark. Exits with 1 on a regression."""
+    parser = argparse.ArgumentParser(description="Benchmark the connect four search.")
+    parser.add_argument("--depth", type=int, default=DEFAULT_DEPTH, help="fixed search depth")
+    parser.add_argument("--nodes", type=int, help="fixed nodes per position instead of a depth")
+    parser.add_argument("--table-size", type=int, default=DEFAULT_TABLE_SIZE,
+                        help="transposition table entries")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per position, fastest kept")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON file")
+    parser.add_argument("--update", action="store_true", help="store the result as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown against the baseline (0.25 is 25%%)")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = parser.parse_args()
+
+    result = run_benchmark(args.depth, args.nodes, args.table_size, args.repeat)
+    if args.json:
+        print(json.dumps(result))
+    else:
+        for position in result["positions"]:
+            print(f"{position['phase']:<11} {position['moves'] or '-':<31} "
+                  f"depth {position['depth']:>2} nodes {position['nodes']:>8} "
+                  f"time {position['time']:6.2f} s nps {position['nps'] or 0:8.0f}")
+        print(f"Total: nodes {result['nodes']}, time {result['time']:.2f} s, "
+              f"nps {result['nps'] or 0:.0f}, signature {result['signature']}")
+    if args.update:
+        save_baseline(result, args.baseline)
+        print(f"Baseline written to {args.baseline}")
+        return
+    try:
+        baseline = load_baseline(args.baseline)
+    except FileNotFoundError:
+        print(f"No baseline {args.baseline}, store one with --update")
+        return
+    try:
+        regressions = compare(result, baseline, args.tolerance)
+    except ValueError as error:
+        print(f"Can't compare with {args.baseline}: {error}")
+        sys.exit(2)
+    if result["signature"] != baseline["signature"]:
+        print(f"Signature changed: {baseline['signature']} -> {result['signature']}")
+    if regressions:
+        print("Regression: " + "; ".join(regressions))
+        sys.exit(1)
+    print(f"No regression against {args.baseline} (time {baseline['time']:.2f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,384 @@
+"""Module providing a bitboard representation of a connect four position."""
+
+from functools import lru_cache
+
+ROWS, COLS = 6, 7
+CONNECT = 4
+
+
+class Geometry:
+    """
+    Everything about a board size that can be computed once: the bit
+    layout, masks, win shifts, mirror table, center-first move order and
+    the windows of `connect` cells in a row. Get one with `geometry`, which
+    caches it, so every position of a size shares the same tables.
+    Every column takes rows + 1 bits: the extra bit on top of each column
+    stays empty so that shifted bitboards can't wrap a line into the next
+    column. `has_win`, `winning_cells` and `playable_cells` are plain
+    functions with the tables bound in, as fast as the module functions.
+    """
+
+    def __init__(self, rows, cols, connect):
+        if rows < 1 or cols < 1 or connect < 2 or connect > max(rows, cols):
+            raise ValueError(f"No {connect} in a row on a {cols}x{rows} board")
+        self.rows, self.cols, self.connect = rows, cols, connect
+        self.cells = rows * cols
+        self.h1 = h1 = rows + 1
+        self.bottom = sum(1 << (col * h1) for col in range(cols))
+        self.column_bottom = tuple(col * h1 for col in range(cols))
+        self.column_top = tuple(col * h1 + rows for col in range(cols))
+        self.column_mask = (1 << rows) - 1
+        self.full = sum(self.column_mask << (col * h1) for col in range(cols))
+        self.win_shifts = (1, h1, h1 + 1, h1 - 1)  # vertical, horizontal, both diagonals
+        # mirror_bits[i] is the bit of the cell at index i reflected left to right.
+        self.mirror_bits = tuple(1 << ((cols - 1 - i // h1) * h1 + i % h1)
+                                 for i in range(cols * h1))
+        self.check_order = tuple(sorted(range(cols), key=lambda col: (abs(2 * col - cols + 1),
+                                                                      col)))
+        self.windows = self._windows()
+        # cell_windows[bit] holds the bitboard of every window through the
+        # cell of bit index `bit`, coordinate_windows[y][x] the windows
+        # themselves as (x, y) cells.
+        self.cell_windows = [()] * (cols * h1)
+        self.coordinate_windows = [[() for _ in range(cols)] for _ in range(rows)]
+        for window in self.windows:
+            bits = sum(1 << self.cell_bit(x, y) for x, y in window)
+            for x, y in window:
+                self.cell_windows[self.cell_bit(x, y)] += (bits,)
+                self.coordinate_windows[y][x] += (window,)
+        self.cell_windows = tuple(self.cell_windows)
+        self.weights = tuple(tuple(len(self.coordinate_windows[y][x]) for x in range(cols))
+                             for y in range(rows))
+        self.has_win, self.winning_cells = _win_functions(self)
+        self.playable_cells, self.non_losing_cells = _move_functions(self)
+
+    def __repr__(self):
+        return f"Geometry(rows={self.rows}, cols={self.cols}, connect={self.connect})"
+
+    def __reduce__(self):
+        return geometry, (self.rows, self.cols, self.connect)
+
+    def _windows(self):
+        """Return every line of `connect` cells on the board as a tuple of (x, y)."""
+        windows = []
+        for dx, dy in ((1, 0), (0, 1), (1, 1), (1, -1)):
+            for y in range(self.rows):
+                for x in range(self.cols):
+                    cells = tuple((x + i * dx, y + i * dy) for i in range(self.connect))
+                    if all(0 <= cx < self.cols and 0 <= cy < self.rows for cx, cy in cells):
+                        windows.append(cells)
+        return tuple(windows)
+
+    def cell_bit(self, x, y):
+        """Return the bit index of board coordinates (x, y), y = 0 being the top row."""
+        return x * self.h1 + (self.rows - 1 - y)
+
+    def mirror(self, bits):
+        """Return the bitboard `bits` reflected left to right."""
+        mirrored = 0
+        for col in range(self.cols):
+            mirrored |= ((bits >> (col * self.h1)) & self.column_mask) << (
+                (self.cols - 1 - col) * self.h1)
+        return mirrored
+
+    def mirror_move(self, col):
+        """Return the column `col` reflected left to right."""
+        return self.cols - 1 - col
+
+
+def _win_functions(shape):
+    """
+    Return the has_win and winning_cells functions of a geometry.
+    Four in a row, the usual case, gets the unrolled shifts; other lengths
+    build their runs in a loop.
+    """
+    shifts, lines, full = shape.win_shifts, shape.win_shifts[1:], shape.full
+    connect = shape.connect
+    if connect == 4:
+        def has_four_in_row(bits):
+            """Return True if the bitboard `bits` contains four in a row."""
+            for shift in shifts:
+                pairs = bits & (bits >> shift)
+                if pairs & (pairs >> (2 * shift)):
+                    return True
+            return False
+
+        def four_cells(bits, mask):
+            """
+            Return the bitboard of empty cells that would give the pieces `bits`
+            four in a row, `mask` being the occupied cells. The cells don't need
+            to be playable yet; AND with `playable_cells` for the immediate wins.
+            """
+            cells = (bits << 1) & (bits << 2) & (bits << 3)  # vertical, only upwards
+            for shift in lines:
+                pairs = (bits << shift) & (bits << 2 * shift)
+                cells |= pairs & (bits << 3 * shift)
+                cells |= pairs & (bits >> shift)
+                pairs = (bits >> shift) & (bits >> 2 * shift)
+                cells |= pairs & (bits << shift)
+                cells |= pairs & (bits >> 3 * shift)
+            return cells & (full ^ mask)
+        return has_four_in_row, four_cells
+
+    def has_run(bits):
+        """Return True if the bitboard `bits` contains `connect` in a row."""
+        for shift in shifts:
+            runs, length = bits, 1
+            while 2 * length <= connect:
+                runs &= runs >> (length * shift)
+                length *= 2
+            if runs & (runs >> ((connect - length) * shift)):
+                return True
+        return False
+
+    def run_cells(bits, mask):
+        """Return the empty cells that would give the pieces `bits` `connect` in a row."""
+        cells = -1
+        for i in range(1, connect):
+            cells &= bits << i  # vertical, only upwards
+        for shift in lines:
+            # back[i] and forward[i] have a bit where the i cells before or
+            # after the cell in the direction all hold pieces.
+            back, forward = [-1], [-1]
+            for i in range(1, connect):
+                back.append(back[-1] & (bits << i * shift))
+                forward.append(forward[-1] & (bits >> i * shift))
+            for before in range(connect):
+                cells |= back[before] & forward[connect - 1 - before]
+        return cells & (full ^ mask)
+    return has_run, run_cells
+
+
+def _move_functions(shape):
+    """Return the playable_cells and non_losing_cells functions of a geometry."""
+    bottom, full, threat_cells = shape.bottom, shape.full, shape.winning_cells
+
+    def playable(mask):
+        """Return the bitboard of the lowest empty cell of every column that isn't full."""
+        return (mask + bottom) & full
+
+    def non_losing(bits, mask):
+        """
+        Return the playable cells where the side with pieces `bits` can move
+        without letting the opponent win with the next move: the block when
+        the opponent has one winning cell to play, none when it has two, and
+        never the cell under a winning cell of the opponent. 0 means that
+        every move loses. The side must not have a winning move itself.
+        """
+        possible = (mask + bottom) & full
+        threats = threat_cells(bits ^ mask, mask)
+        forced = possible & threats
+        if forced:
+            if forced & (forced - 1):
+                return 0
+            possible = forced
+        return possible & ~(threats >> 1)
+    return playable, non_losing
+
+
+def geometry(rows=ROWS, cols=COLS, connect=CONNECT):
+    """Return the shared Geometry of a board of `rows` x `cols` with `connect` in a row to win."""
+    return _cached_geometry(rows, cols, connect)
+
+
+@lru_cache(maxsize=None)
+def _cached_geometry(rows, cols, connect):
+    """Build the Geometry of a size once."""
+    return Geometry(rows, cols, connect)
+
+
+DEFAULT_GEOMETRY = geometry()
+
+# The tables of the standard 6x7 board, for code that only plays on it.
+H1 = DEFAULT_GEOMETRY.h1
+BOTTOM = DEFAULT_GEOMETRY.bottom
+COLUMN_TOP = list(DEFAULT_GEOMETRY.column_top)
+COLUMN_MASK = DEFAULT_GEOMETRY.column_mask
+FULL = DEFAULT_GEOMETRY.full
+WIN_SHIFTS = DEFAULT_GEOMETRY.win_shifts
+MIRROR_BITS = DEFAULT_GEOMETRY.mirror_bits
+has_four = DEFAULT_GEOMETRY.has_win
+winning_cells = DEFAULT_GEOMETRY.winning_cells
+playable_cells = DEFAULT_GEOMETRY.playable_cells
+non_losing_cells = DEFAULT_GEOMETRY.non_losing_cells
+mirror_bits = DEFAULT_GEOMETRY.mirror
+mirror_move = DEFAULT_GEOMETRY.mirror_move
+cell_bit = DEFAULT_GEOMETRY.cell_bit
+
+
+class Position:
+    """
+    Connect four position stored as bitboards.
+    boards[1] and boards[2] hold the pieces of each player and boards[0]
+    the union of both. heights[col] is the bit index of the lowest empty
+    cell in column col, so playing and undoing a move are O(1).
+    key_code and mirror_code are the position key (without the side to
+    move) of the position and of its reflection, kept up to date on every
+    move so that `canonical_key` doesn't have to reflect the bitboards.
+    `geometry` is the board size and connect length (see `geometry`),
+    the standard 6x7 board with four in a row by default.
+    """
+
+    __slots__ = ("boards", "heights", "moves", "player", "key_code", "mirror_code", "geometry")
+
+    def __init__(self, player=1, geometry=DEFAULT_GEOMETRY):  # pylint: disable=redefined-outer-name
+        self.geometry = geometry
+        self.boards = [0, 0, 0]
+        self.heights = list(geometry.column_bottom)
+        self.moves = []
+        self.player = player
+        self.key_code = self.mirror_code = geometry.bottom
+
+    @classmethod
+    def from_board(cls, board, player=1, connect=CONNECT):
+        """
+        Build a position from a 2D list board as returned by `create_board`.
+        `player` is the side to move. The size of the board comes from the
+        list and `connect` is the number in a row that wins.
+        """
+        rows, cols = len(board), len(board[0])
+        position = cls(player, geometry(rows, cols, connect))
+        boards, heights = position.boards, position.heights
+        cell_index = position.geometry.cell_bit
+        for x in range(cols):
+            for y in range(rows - 1, -1, -1):
+                cell = board[y][x]
+                if cell == 0:
+                    break
+                bit = 1 << cell_index(x, y)
+                boards[cell] |= bit
+                boards[0] |= bit
+                heights[x] += 1
+        position.update_codes()
+        return position
+
+    def to_board(self):
+        """Return the position as a 2D list board in the `create_board` layout."""
+        p1, p2 = self.boards[1], self.boards[2]
+        cell_index = self.geometry.cell_bit
+        board = []
+        for y in range(self.geometry.rows):
+            row = []
+            for x in range(self.geometry.cols):
+                bit = 1 << cell_index(x, y)
+                row.append(1 if p1 & bit else 2 if p2 & bit else 0)
+            board.append(row)
+        return board
+
+    def copy(self):
+        """Return an independent copy of the position."""
+        position = Position(self.player, self.geometry)
+        position.boards = self.boards[:]
+        position.heights = self.heights[:]
+        position.moves = self.moves[:]
+        position.key_code, position.mirror_code = self.key_code, self.mirror_code
+        return position
+
+    def update_codes(self):
+        """Recompute key_code and mirror_code from the bitboards."""
+        p1, mask = self.boards[1], self.boards[0]
+        mirror, bottom = self.geometry.mirror, self.geometry.bottom
+        self.key_code = p1 + mask + bottom
+        self.mirror_code = mirror(p1) + mirror(mask) + bottom
+
+    def can_play(self, col):
+        """Return True if column `col` is not full."""
+        return self.heights[col] < self.geometry.column_top[col]
+
+    def valid_columns(self):
+        """Return a list of playable column indices."""
+        heights, tops = self.heights, self.geometry.column_top
+        return [col for col in range(len(tops)) if heights[col] < tops[col]]
+
+    def play(self, col):
+        """
+        Drop a piece for the side to move into column `col`.
+        The column must be playable, see `can_play`.
+        """
+        index = self.heights[col]
+        bit = 1 << index
+        self.heights[col] = index + 1
+        self.boards[0] |= bit
+        self.boards[self.player] |= bit
+        # Player 1's pieces count twice in the key: in boards[1] and boards[0].
+        shift = 2 - self.player
+        self.key_code += bit << shift
+        self.mirror_code += self.geometry.mirror_bits[index] << shift
+        self.moves.append(col)
+        self.player = 3 - self.player
+
+    def undo(self):
+        """Take back the last move played with `play`."""
+        col = self.moves.pop()
+        index = self.heights[col] - 1
+        self.heights[col] = index
+        bit = 1 << index
+        self.player = 3 - self.player
+        self.boards[0] ^= bit
+        self.boards[self.player] ^= bit
+        shift = 2 - self.player
+        self.key_code -= bit << shift
+        self.mirror_code -= self.geometry.mirror_bits[index] << shift
+
+    def is_win(self, player):
+        """Return True if `player` has `connect` in a row."""
+        return self.geometry.has_win(self.boards[player])
+
+    def is_winning_move(self, col):
+        """Return True if playing column `col` wins for the side to move."""
+        index = self.heights[col]
+        bits = self.boards[self.player] | 1 << index
+        return any(bits & window == window for window in self.geometry.cell_windows[index])
+
+    def winning_moves(self, player=None):
+        """
+        Return the columns where `player`, the side to move by default,
+        would get `connect` in a row by playing there now.
+        """
+        player = self.player if player is None else player
+        shape, mask, heights = self.geometry, self.boards[0], self.heights
+        cells = shape.winning_cells(self.boards[player], mask) & shape.playable_cells(mask)
+        return [col for col in range(shape.cols) if cells >> heights[col] & 1]
+
+    def non_losing_moves(self):
+        """
+        Return the columns the side to move can play without letting the
+        opponent win with the next move, see `Geometry.non_losing_cells`.
+        The list is empty when every move loses. Call it only when the side
+        to move has no winning move, which it should play instead.
+        """
+        shape, heights = self.geometry, self.heights
+        cells = shape.non_losing_cells(self.boards[self.player], self.boards[0])
+        return [col for col in range(shape.cols) if cells >> heights[col] & 1]
+
+    def piece_count(self):
+        """Return the number of pieces on the board."""
+        return self.boards[0].bit_count()
+
+    def is_full(self):
+        """Return True if no more moves can be played."""
+        return self.boards[0] == self.geometry.full
+
+    def key(self):
+        """
+        Return an integer that uniquely identifies the position and side to move.
+        Adding BOTTOM to the occupied mask marks the top of every column,
+        so together with player 1's pieces the cells are fully determined.
+        """
+        return (self.key_code << 1) | (self.player - 1)
+
+    def mirror_key(self):
+        """Return the key of the position reflected left to right."""
+        return (self.mirror_code << 1) | (self.player - 1)
+
+    def canonical_key(self):
+        """
+        Return (key, mirrored): the smaller of the key and the mirror key,
+        and whether it belongs to the reflected position. A position and its
+        reflection have the same value, with moves reflected by `mirror_move`.
+        """
+        side = self.player - 1
+        if self.mirror_code < self.key_code:
+            return (self.mirror_code << 1) | side, True
+        return (self.key_code << 1) | side, False
+
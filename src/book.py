@@ -0,0 +1,159 @@
+"""
+Module providing an opening book: best moves for every early position,
+generated offline and read from a memory-mapped file.
+
+Generate a book with:
+    python -m src.book --ply 6 --depth 8 --output opening_book.bin
+"""
+
+import argparse
+import mmap
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor
+
+from .bitboard import COLS, DEFAULT_GEOMETRY, Position, mirror_move
+from .connect_4 import minimax
+from .evaluation import EvaluatedPosition
+from .transposition import TranspositionTable
+
+DEFAULT_BOOK_PATH = "opening_book.bin"
+MAGIC = b"C4BK"
+HEADER = struct.Struct("<4sHHI")  # magic, ply, search depth, record count
+RECORD = struct.Struct("<QiB")  # canonical key, score, move
+_KEY = struct.Struct("<Q")
+
+
+class OpeningBook:
+    """
+    Read-only opening book file opened with mmap.
+    The file is a header and records sorted by the canonical key of the
+    position (see `Position.canonical_key`), so a position and its mirror
+    image share a record and a lookup is a binary search over the file.
+    Nothing is loaded into memory up front.
+    """
+
+    def __init__(self, path=DEFAULT_BOOK_PATH):
+        with open(path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.ply, self.depth, self.count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not an opening book")
+
+    def __len__(self):
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        """Close the memory map of the file."""
+        self._map.close()
+
+    def lookup(self, position):
+        """
+        Return (score, move) for `position`, or None if it isn't in the book.
+        The score is from player 1's point of view like `minimax`, and the
+        move is reflected back if the record was stored for the mirror image.
+        The book is of the standard board, so other board sizes are never in it.
+        """
+        if position.geometry is not DEFAULT_GEOMETRY:
+            return None
+        key, mirrored = position.canonical_key()
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            middle_key = _KEY.unpack_from(self._map, HEADER.size + middle * RECORD.size)[0]
+            if middle_key < key:
+                low = middle + 1
+            elif middle_key > key:
+                high = middle
+            else:
+                _, score, move = RECORD.unpack_from(self._map, HEADER.size + middle * RECORD.size)
+                return score, mirror_move(move) if mirrored else move
+        return None
+
+
+def open_book(path=DEFAULT_BOOK_PATH):
+    """Return the OpeningBook of the file `path`, or None if there is no such file."""
+    return OpeningBook(path) if os.path.exists(path) else None
+
+
+def book_positions(ply):
+    """
+    Yield the moves leading to every position of at most `ply` moves,
+    skipping finished games and reflected duplicates.
+    """
+    seen = set()
+    position = Position()
+
+    def visit():
+        key, _ = position.canonical_key()
+        if key in seen:
+            return
+        seen.add(key)
+        yield list(position.moves)
+        if len(position.moves) == ply:
+            return
+        for col in range(COLS):
+            if position.can_play(col):
+                position.play(col)
+                if not position.is_win(3 - position.player) and not position.is_full():
+                    yield from visit()
+                position.undo()
+
+    yield from visit()
+
+
+def search_book_position(moves, depth):
+    """Return the book record (canonical key, score, move) of the position after `moves`."""
+    position = EvaluatedPosition()
+    for col in moves:
+        position.play(col)
+    memory = TranspositionTable(1 << 16)
+    for current in range(1, depth + 1):
+        score, move = minimax(position, current, float("-inf"), float("inf"),
+                              position.player == 1, memory)
+    key, mirrored = position.canonical_key()
+    return key, score, mirror_move(move) if mirrored else move
+
+
+def generate_book(path, ply, depth, workers=1):
+    """
+    Search every position up to `ply` moves to `depth` and write the book to `path`.
+    With more than one worker the positions are searched in worker processes.
+    Returns the number of records written.
+    """
+    positions = list(book_positions(ply))
+    depths = [depth] * len(positions)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            records = list(executor.map(search_book_position, positions, depths, chunksize=64))
+    else:
+        records = list(map(search_book_position, positions, depths))
+    records.sort()
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, ply, depth, len(records)))
+        for record in records:
+            file.write(RECORD.pack(*record))
+    return len(records)
+
+
+def main():
+    """Command line entry point for generating a book."""
+    parser = argparse.ArgumentParser(description="Generate a connect four opening book.")
+    parser.add_argument("--ply", type=int, default=6, help="deepest position in moves")
+    parser.add_argument("--depth", type=int, default=8, help="search depth per position")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes")
+    parser.add_argument("--output", default=DEFAULT_BOOK_PATH, help="book file to write")
+    args = parser.parse_args()
+    count = generate_book(args.output, args.ply, args.depth, args.workers)
+    print(f"Wrote {count} positions to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,14 @@
 """Module providing a connect four game and minimax algorithm solving it."""
 
+import json
 import time
+from .bitboard import CONNECT, ROWS, COLS, DEFAULT_GEOMETRY, Position, geometry
+from .evaluation import EvaluatedPosition
+from .transposition import DEFAULT_TABLE_SIZE, EXACT, LOWER, UPPER, TranspositionTable
 
-ROWS, COLS = 6, 7
-
-def create_board():
-    """Return a new empty 6x7 Connect Four board as a 2D list filled with 0."""
-    return [[0 for _ in range(COLS)] for _ in range(ROWS)]
+def create_board(rows=ROWS, cols=COLS):
+    """Return a new empty Connect Four board, 6x7 by default, as a 2D list filled with 0."""
+    return [[0 for _ in range(cols)] for _ in range(rows)]
 
 
 def check_draw(board):
@@ -20,55 +22,44 @@ def make_move(board, col, player):
     Returns the (x, y) coordinates of the placed piece.
     Raises ValueError if column is invalid or full.
     """
-    if not 0 <= col < COLS:
+    if not 0 <= col < len(board[0]):
         raise ValueError("Column out of range")
     if board[0][col] != 0:
         raise ValueError("Column is full")
     # Find lowest empty row (from bottom up)
-    for y in range(ROWS - 1, -1, -1):
+    for y in range(len(board) - 1, -1, -1):
         if board[y][col] == 0:
             board[y][col] = player
             return (col, y)
 
 
+def undo_move(board, last_move):
+    """Take back the piece that `make_move` placed at `last_move` (x, y)."""
+    board[last_move[1]][last_move[0]] = 0
+
+
 def valid_columns(board):
     """Return a list of playable column indices."""
-    return [x for x in range(COLS) if board[0][x] == 0]
+    return [x for x in range(len(board[0])) if board[0][x] == 0]
 
 
-def in_bounds(x, y):
-    """Return True if coordinates (x, y) are within the board."""
-    return 0 <= x < COLS and 0 <= y < ROWS
+def in_bounds(x, y, rows=ROWS, cols=COLS):
+    """Return True if coordinates (x, y) are within a board of `rows` x `cols`."""
+    return 0 <= x < cols and 0 <= y < rows
 
 
-def check_win(board, last_move):
+def check_win(board, last_move, connect=CONNECT):
     """
     Return True if "last_move" (x, y) resulted in a win.
-    Checks horizontal, vertical, and diagonal 4-in-a-rows.
+    Checks the precomputed windows of `connect` cells through the move
+    (see `Geometry.coordinate_windows`) instead of walking every direction.
     """
     if last_move is None:
         return False
     x0, y0 = last_move
     player = board[y0][x0]
-
-    directions = [(1, 0), (0, 1), (1, 1), (1, -1)]
-    for dx, dy in directions:
-        count = 1
-        # forward
-        x, y = x0 + dx, y0 + dy
-        while in_bounds(x, y) and board[y][x] == player:
-            count += 1
-            x += dx
-            y += dy
-        # backward
-        x, y = x0 - dx, y0 - dy
-        while in_bounds(x, y) and board[y][x] == player:
-            count += 1
-            x -= dx
-            y -= dy
-        if count >= 4:
-            return True
-    return False
+    windows = geometry(len(board), len(board[0]), connect).coordinate_windows[y0][x0]
+    return any(all(board[y][x] == player for x, y in window) for window in windows)
 
 def single_direction_heuristic(board, xy, direction, player):
     """
@@ -80,22 +71,23 @@ def single_direction_heuristic(board, xy, direction, player):
       - Both ends open    → higher base value
     """
     opponent = 3 - player
+    rows, cols = len(board), len(board[0])
     x, y = xy
     dx, dy = direction
 
     def is_blocked(cx, cy):
-        return not in_bounds(cx, cy) or board[cy][cx] == opponent
+        return not in_bounds(cx, cy, rows, cols) or board[cy][cx] == opponent
 
     # Avoid double counting
     prevx, prevy = x - dx, y - dy
-    if in_bounds(prevx, prevy) and board[prevy][prevx] == player:
+    if in_bounds(prevx, prevy, rows, cols) and board[prevy][prevx] == player:
         return 0
 
     # Count consecutive player's pieces
     count = 1
     for i in range(1, 4):
         nx, ny = x + i * dx, y + i * dy
-        if not in_bounds(nx, ny) or board[ny][nx] != player:
+        if not in_bounds(nx, ny, rows, cols) or board[ny][nx] != player:
             break
         count += 1
 
@@ -124,26 +116,25 @@ def heuristic(board):
     Calculate heuristic score of board.
     Positive = good for Player 1 (X), negative = good for Player 2 (O).
     Combines positional table values and run-based values.
+    Accepts a 2D list board of any size or a Position. An EvaluatedPosition
+    already keeps this score up to date, so it is returned without a rescan.
+    The positional values are the weights of the board's geometry.
     """
-    heuristic_table = [
-        [3, 4, 5, 7, 5, 4, 3],
-        [4, 6, 8, 10, 8, 6, 4],
-        [5, 8, 11, 13, 11, 8, 5],
-        [5, 8, 11, 13, 11, 8, 5],
-        [4, 6, 8, 10, 8, 6, 4],
-        [3, 4, 5, 7, 5, 4, 3],
-    ]
-
+    if isinstance(board, EvaluatedPosition):
+        return board.score
+    if isinstance(board, Position):
+        board = board.to_board()
+    weights = geometry(len(board), len(board[0])).weights
     score = 0
     directions = [(1, 0), (0, 1), (1, 1), (-1, 1)]
     for y, row in enumerate(board):
         for x, cell in enumerate(row):
             if cell == 1:
                 score += sum(single_direction_heuristic(board, (x, y), d, 1) for d in directions)
-                score += heuristic_table[y][x]
+                score += weights[y][x]
             elif cell == 2:
                 score -= sum(single_direction_heuristic(board, (x, y), d, 2) for d in directions)
-                score -= heuristic_table[y][x]
+                score -= weights[y][x]
     return score
 
 
@@ -152,76 +143,477 @@ def clone_board(board):
     return [row[:] for row in board]
 
 
-def minimax(board, depth, alpha, beta, maximizing, memory, last_move=None):
+CHECK_ORDER = DEFAULT_GEOMETRY.check_order  # center-first ordering
+WIN_SCORE = 100000
+
+
+# The search looks at the clock and the node limit once every POLL_INTERVAL
+# nodes (a power of two).
+POLL_INTERVAL = 1024
+
+# Half width of the window around the previous depth's score that
+# iterative deepening searches first.
+ASPIRATION_WINDOW = 50
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the deadline or node limit of its SearchState has passed."""
+
+
+class SearchState:
+    """
+    State shared by every node of a search and the statistics it collects.
+    Limits: the deadline (a time.time() value) and the node limit after
+    which the search aborts, and the best root move found so far in the
+    iteration at `root_depth`. The node limit is checked with the clock,
+    so the search stops within POLL_INTERVAL nodes of it.
+    Move ordering: two killer moves per ply (moves that caused a beta
+    cutoff at that number of moves played) and a history score per player
+    and cell, indexed by the cell's bit index (column * H1 + row), that
+    grows with every cutoff the move causes. Both persist between the
+    depths of `iterative_deepening`. They are sized for the standard
+    board; `fit` grows them for a larger geometry.
+    Statistics: nodes visited, leaf evaluations, transposition table
+    probes, hits (entry found), cuts (search answered by the entry) and
+    stores, beta cutoffs with `cutoff_index[i]` counting the cutoffs made
+    by the i:th move searched, and one record per completed depth of
+    `iterative_deepening` with its nodes, time, nodes per second and
+    effective branching factor, and the positions answered by the
+    tablebase.
+    `tablebase` is an optional Tablebase the search probes (see `_negamax`).
+    """
+
+    __slots__ = ("nodes", "deadline", "node_limit", "root_depth", "partial", "leaves", "tt_probes",
+                 "tt_hits", "tt_cuts", "tt_stores", "cutoffs", "cutoff_index", "depths",
+                 "killers", "history", "tablebase", "tb_hits")
+
+    def __init__(self, deadline=float("inf"), node_limit=float("inf")):
+        self.nodes = 0
+        self.deadline = deadline
+        self.node_limit = node_limit
+        self.root_depth = None
+        self.partial = None
+        self.leaves = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.tt_cuts = 0
+        self.tt_stores = 0
+        self.cutoffs = 0
+        self.cutoff_index = [0] * COLS
+        self.depths = []
+        self.killers = []
+        self.history = [None, [], []]
+        self.tablebase = None
+        self.tb_hits = 0
+        self.fit(DEFAULT_GEOMETRY)
+
+    def fit(self, shape):
+        """Grow the move ordering tables and cutoff counts to fit the geometry `shape`."""
+        extra = shape.cells + 1 - len(self.killers)
+        self.killers.extend([None, None] for _ in range(extra))
+        for history in self.history[1:]:
+            history.extend([0] * (shape.cols * shape.h1 - len(history)))
+        self.cutoff_index.extend([0] * (shape.cols - len(self.cutoff_index)))
+
+    def add_depth(self, depth, nodes, seconds):
+        """Record a completed depth of iterative deepening."""
+        previous = self.depths[-1]["nodes"] if self.depths else 0
+        self.depths.append({
+            "depth": depth,
+            "nodes": nodes,
+            "time": seconds,
+            "nps": nodes / seconds if seconds > 0 else None,
+            "ebf": nodes / previous if previous else None,
+        })
+
+    def as_dict(self):
+        """Return the statistics as a dict of plain values."""
+        return {
+            "nodes": self.nodes,
+            "leaves": self.leaves,
+            "tt_probes": self.tt_probes,
+            "tt_hits": self.tt_hits,
+            "tt_cuts": self.tt_cuts,
+            "tt_stores": self.tt_stores,
+            "tt_hit_rate": self.tt_hits / self.tt_probes if self.tt_probes else None,
+            "cutoffs": self.cutoffs,
+            "cutoff_index": list(self.cutoff_index),
+            "tb_hits": self.tb_hits,
+            "depths": [dict(record) for record in self.depths],
+        }
+
+    def to_json(self):
+        """Return the statistics as a JSON string."""
+        return json.dumps(self.as_dict())
+
+
+def minimax(board, depth, alpha, beta, maximizing, memory, last_move=None, state=None):
     """
     Minimax with alpha-beta pruning and transposition table.
+    The search itself is a negamax principal variation search (see
+    `_negamax`); the window and the returned score are from player 1's
+    point of view.
+    `memory` is a TranspositionTable or a dict.
+    `state` is an optional SearchState that collects statistics; with a
+    tablebase set on it, the positions below the root found there are
+    answered from the tablebase.
+    Raises SearchTimeout if the deadline of `state` passes; a list board
+    is left as it was, a Position may be left with moves played.
+    `board` is either a 2D list board or a Position. A list board is
+    converted to a Position once, with the side to move given by
+    `maximizing`; a Position searches for its own side to move.
     Returns (score, move).
     """
-    str_board = str(board)
-    if last_move is not None and check_win(board, last_move):
+    if isinstance(board, Position):
+        if board.is_win(3 - board.player):
+            return _win_score(3 - board.player, depth), None
+    elif last_move is not None and check_win(board, last_move):
         winner = board[last_move[1]][last_move[0]]
-        return (100000 + depth, None) if winner == 1 else (-100000 - depth, None)
+        return _win_score(winner, depth), None
+    if state is None:
+        state = SearchState()
+    position = _search_position(board, maximizing)
+    state.fit(position.geometry)
+    root_depth = state.root_depth
+    if root_depth is None:
+        state.root_depth = depth
+    try:
+        if position.player == 1:
+            return _negamax(position, depth, alpha, beta, memory, state)
+        score, move = _negamax(position, depth, -beta, -alpha, memory, state)
+        return -score, move
+    finally:
+        state.root_depth = root_depth
+
+
+def root_position(board, maximizing, last_move):
+    """
+    Return the EvaluatedPosition to search from, or None if the game is already won.
+    `board` and `last_move` are as in `iterative_deepening`.
+    """
+    if isinstance(board, Position):
+        if board.is_win(3 - board.player):
+            return None
+    elif check_win(board, last_move):
+        return None
+    return _search_position(board, maximizing)
+
+
+def _search_position(board, maximizing):
+    """
+    Return the EvaluatedPosition to search for a 2D list board or a Position.
+    An EvaluatedPosition is searched in place, anything else is converted.
+    """
+    if isinstance(board, EvaluatedPosition):
+        return board
+    if isinstance(board, Position):
+        return EvaluatedPosition.from_position(board)
+    return EvaluatedPosition.from_board(board, 1 if maximizing else 2)
+
+
+def _win_score(winner, depth):
+    """Return the score of a won position with `depth` plies left to search."""
+    return WIN_SCORE + depth if winner == 1 else -WIN_SCORE - depth
+
+
+def _to_table(score, depth):
+    """
+    Return a score as stored in the transposition table.
+    Win scores depend on the depth left when the win is reached, so they
+    are stored relative to the node and restored with `_from_table`. A win
+    from the tablebase further away than the depth left is below WIN_SCORE.
+    """
+    if score >= WIN_SCORE // 2:
+        return score - depth
+    if score <= -WIN_SCORE // 2:
+        return score + depth
+    return score
 
-    check_order = [3, 2, 4, 1, 5, 0, 6]  # center-first ordering
-    valid_moves = [col for col in check_order if board[0][col] == 0]
+
+def _from_table(score, depth):
+    """
+    Return a score read from the transposition table at `depth`.
+    A stored win is at least WIN_SCORE minus the number of cells, far
+    above any heuristic score on every board size.
+    """
+    if score >= WIN_SCORE // 2:
+        return score + depth
+    if score <= -WIN_SCORE // 2:
+        return score - depth
+    return score
+
+
+def _tablebase_score(moves, depth):
+    """
+    Return the score for the side to move at `depth` of a position that
+    the tablebase gives `moves` to the end of the game, see `Tablebase.probe_key`.
+    """
+    if moves > 0:
+        return WIN_SCORE + depth - moves
+    if moves < 0:
+        return -WIN_SCORE - depth - moves
+    return 0
+
+
+def _negamax(position, depth, alpha, beta, memory, state):
+    """
+    Search an EvaluatedPosition in place with play/undo.
+    Negamax: scores and the alpha-beta window are from the point of view of
+    the side to move, and a child's score is the negated score of the child.
+    Principal variation search: the first move is searched with the full
+    window and the others with a null window that only tells whether they
+    beat alpha; a move that does is searched again with the full window.
+    A node with a winning move returns the win at once, found from the
+    bitboards before any move is played, so a child is only entered when
+    the move didn't end the game. Above depth 1 only the non-losing moves
+    are searched (see `Geometry.non_losing_cells`): a move that lets the
+    opponent win at once would just lose in the child, and a node where
+    every move does returns the loss without searching any child.
+    A node below the root with at most the tablebase's number of empty
+    cells is answered from the tablebase of `state` when it is there: a
+    win or loss n moves from the end scores like a win found n plies
+    below the node, a draw 0.
+    A table entry searched at least as deep as `depth` returns at once
+    if it is exact or its bound falls outside the window, and otherwise
+    narrows the window.
+    Moves are ordered: the table move, the killer moves of the ply, then
+    the rest by history score with ties in the center-first order of the position's geometry.
+    At depth 1, where the children are leaves, only the table move is
+    moved first.
+    Entries are keyed by the canonical key, so a position and its mirror
+    image share one entry; moves are stored for the canonical side and
+    reflected when the position is the mirror image.
+    """
+    state.nodes += 1
+    if not state.nodes & (POLL_INTERVAL - 1) and (time.time() >= state.deadline
+                                                  or state.nodes >= state.node_limit):
+        raise SearchTimeout
+    shape = position.geometry
+    heights, tops = position.heights, shape.column_top
+    valid_moves = [col for col in shape.check_order if heights[col] < tops[col]]
     if not valid_moves:
         return 0, None
 
-    if depth == 0:
-        return heuristic(board), None
+    tablebase = state.tablebase
+    if (tablebase is not None and depth != state.root_depth and shape is tablebase.geometry
+            and shape.cells - position.boards[0].bit_count() <= tablebase.max_empty):
+        moves = tablebase.probe_key(position.canonical_key()[0])
+        if moves is not None:
+            state.tb_hits += 1
+            return _tablebase_score(moves, depth), None
 
-    if str_board in memory:
-        _, prev_best = memory[str_board]
-        if prev_best in valid_moves:
-            valid_moves.remove(prev_best)
-            valid_moves.insert(0, prev_best)
-
-    if maximizing:
-        best_eval, best_move = float("-inf"), None
+    player = position.player
+    if depth == 0:
+        state.leaves += 1
+        return (position.score if player == 1 else -position.score), None
+
+    boards = position.boards
+    winning_cells = shape.winning_cells
+    playable = shape.playable_cells(boards[0])
+    wins = winning_cells(boards[player], boards[0]) & playable
+    if wins:
         for col in valid_moves:
-            new_board = clone_board(board)
-            new_last = make_move(new_board, col, 1)
-            child_eval, _ = minimax(new_board, depth - 1, alpha, beta, False, memory, new_last)
-            if child_eval > best_eval:
-                best_eval, best_move = child_eval, col
-                alpha = max(alpha, best_eval)
+            if wins >> heights[col] & 1:
+                return WIN_SCORE + depth - 1, col
+    if depth > 1:
+        safe = shape.non_losing_cells(boards[player], boards[0])
+        if not safe:
+            blocks = winning_cells(boards[3 - player], boards[0]) & playable
+            return -WIN_SCORE - depth + 2, next(
+                (col for col in valid_moves if blocks >> heights[col] & 1), valid_moves[0])
+        if safe != playable:
+            valid_moves = [col for col in valid_moves if safe >> heights[col] & 1]
+
+    key, mirrored = position.canonical_key()
+    state.tt_probes += 1
+    entry = memory.get(key)
+    prev_best = None
+    if entry is not None:
+        state.tt_hits += 1
+        entry_depth, flag, score, prev_best = entry
+        if mirrored and prev_best is not None:
+            prev_best = shape.mirror_move(prev_best)
+        if entry_depth >= depth:
+            score = _from_table(score, depth)
+            if flag == EXACT:
+                state.tt_cuts += 1
+                return score, prev_best
+            if flag == LOWER:
+                alpha = max(alpha, score)
+            else:
+                beta = min(beta, score)
             if beta <= alpha:
-                break
-        memory[str_board] = (best_eval, best_move)
-        return best_eval, best_move
-
-    best_eval, best_move = float("inf"), None
-    for col in valid_moves:
-        new_board = clone_board(board)
-        new_last = make_move(new_board, col, 2)
-        child_eval, _ = minimax(new_board, depth - 1, alpha, beta, True, memory, new_last)
-        if child_eval < best_eval:
+                state.tt_cuts += 1
+                return score, prev_best
+    alpha_orig, beta_orig = alpha, beta
+
+    if depth > 1 and len(valid_moves) > 1:
+        _order_moves(valid_moves, heights, state.history[player],
+                     state.killers[len(position.moves)])
+    if prev_best in valid_moves:
+        valid_moves.remove(prev_best)
+        valid_moves.insert(0, prev_best)
+
+    best_eval, best_move = float("-inf"), None
+    for index, col in enumerate(valid_moves):
+        position.play(col)
+        if index == 0:
+            child_eval = -_negamax(position, depth - 1, -beta, -alpha, memory, state)[0]
+        else:
+            child_eval = -_negamax(position, depth - 1, -alpha - 1, -alpha, memory, state)[0]
+            if alpha < child_eval < beta:
+                child_eval = -_negamax(position, depth - 1, -beta, -alpha, memory, state)[0]
+        position.undo()
+        if child_eval > best_eval:
             best_eval, best_move = child_eval, col
-            beta = min(beta, best_eval)
+            if best_eval > alpha:
+                alpha = best_eval
+                if depth == state.root_depth:
+                    state.partial = (best_eval if player == 1 else -best_eval, best_move)
         if beta <= alpha:
+            state.cutoffs += 1
+            state.cutoff_index[index] += 1
+            state.history[player][heights[col]] += depth * depth
+            killers = state.killers[len(position.moves)]
+            if killers[0] != col:
+                killers[1], killers[0] = killers[0], col
             break
-    memory[str_board] = (best_eval, best_move)
+    _store(memory, key, depth, best_eval,
+           shape.mirror_move(best_move) if mirrored else best_move, alpha_orig, beta_orig)
+    state.tt_stores += 1
     return best_eval, best_move
 
 
-def iterative_deepening(board, cal_time, maximizing, last_move):
+def _order_moves(moves, heights, history, killers):
+    """
+    Sort `moves` in place for searching: the killer moves of the ply, then
+    the rest by their history score with ties kept in center-first order.
+    A winning cell of the opponent needs no ordering: when there is one to
+    block, the block is the only non-losing move left.
+    """
+    moves.sort(key=lambda col: history[heights[col]], reverse=True)
+    for col in reversed(killers):
+        if col in moves:
+            moves.remove(col)
+            moves.insert(0, col)
+
+
+def _store(memory, key, depth, score, move, alpha, beta):
+    """Store a search result with its bound type given the window it was searched with."""
+    if score <= alpha:
+        flag = UPPER
+    elif score >= beta:
+        flag = LOWER
+    else:
+        flag = EXACT
+    memory[key] = (depth, flag, _to_table(score, depth), move)
+
+
+def iterative_deepening(board, cal_time, maximizing, last_move, table_size=DEFAULT_TABLE_SIZE,
+                        state=None, return_stats=False, book=None, memory=None,
+                        max_depth=None, tablebase=None):
     """
     Function for calling minimax in a deepening search.
     Minimax runs iteratively depth by depth until the given calculation time is reached.
+    `board` is either a 2D list board or a Position; a Position searches
+    for its own side to move.
+    `table_size` is the number of entries in the transposition table.
+    `memory` is an optional TranspositionTable to search with instead of
+    a new one, so entries of earlier searches are reused.
+    `state` is an optional SearchState that collects statistics. If its
+    deadline is earlier than `cal_time` allows, the earlier one is kept,
+    so another thread can stop the search by moving the deadline.
+    Its `node_limit` stops the search after about that many nodes.
+    With `return_stats` the SearchState is returned as a third value;
+    its `as_dict` and `to_json` give the statistics in machine-readable form.
+    `book` is an optional OpeningBook; a position found in it is answered
+    from the book with its search depth, without searching.
+    `max_depth` stops the search after that depth even if there is time
+    left; with an infinite `cal_time` the search is a fixed depth search.
+    `tablebase` is an optional Tablebase probed by the search below the
+    root, set on `state`.
+
+    The search polls the clock while it runs and aborts when the time is
+    up. The move of the last completed depth is returned, or the best root
+    move of the aborted depth if one of its root moves was fully searched.
+    A depth isn't started when the branching factor seen so far predicts
+    that it can't finish in the remaining time.
     """
     start_time = time.time()
-    if check_win(board, last_move):
-        return (None, None), None
-    memory = {}
+    if state is None:
+        state = SearchState()
+    position = root_position(board, maximizing, last_move)
+    if position is None:
+        return ((None, None), None, state) if return_stats else ((None, None), None)
+    state.fit(position.geometry)
+    if book is not None:
+        entry = book.lookup(position)
+        if entry is not None:
+            return (entry, book.depth, state) if return_stats else (entry, book.depth)
+    if memory is None:
+        memory = TranspositionTable(table_size)
+    if tablebase is not None:
+        state.tablebase = tablebase
+    state.deadline = min(state.deadline, start_time + cal_time)
+    root_length = len(position.moves)
     depth = 0
     best_eval, best_move = 0, None
     while time.time() - start_time < cal_time:
+        if (time.time() + _predict_next(state.depths) > state.deadline
+                or state.nodes >= state.node_limit):
+            break
         depth += 1
-        best_eval, best_move = minimax(
-            board, depth, float("-inf"), float("inf"),
-            maximizing, memory, last_move
-        )
-        if abs(best_eval) >= 100000:
+        state.root_depth, state.partial = depth, None
+        iteration_start, iteration_nodes = time.time(), state.nodes
+        try:
+            best_eval, best_move = _aspiration_search(position, depth, best_eval, memory, state)
+        except SearchTimeout:
+            while len(position.moves) > root_length:
+                position.undo()
+            if state.partial is not None:
+                best_eval, best_move = state.partial
+            depth -= 1
+            break
+        state.add_depth(depth, state.nodes - iteration_nodes, time.time() - iteration_start)
+        if (abs(best_eval) >= WIN_SCORE or depth == max_depth
+                or depth >= position.geometry.cells - position.piece_count()):
             break
-    print(f"calculation time: {(time.time() - start_time):.2f} seconds")
+    state.root_depth = None
+    if return_stats:
+        return (best_eval, best_move), depth, state
     return (best_eval, best_move), depth
+
+
+def _aspiration_search(position, depth, guess, memory, state):
+    """
+    Search the root with a window of ASPIRATION_WINDOW around `guess`, the
+    score of the previous depth. A narrow window cuts more of the tree;
+    if the score falls outside it, that side of the window is opened and
+    the root is searched again. Returns (score, move) like `minimax`.
+    """
+    alpha, beta = float("-inf"), float("inf")
+    if depth > 1 and abs(guess) < WIN_SCORE:
+        alpha, beta = guess - ASPIRATION_WINDOW, guess + ASPIRATION_WINDOW
+    while True:
+        score, move = minimax(position, depth, alpha, beta, position.player == 1,
+                              memory, state=state)
+        if score <= alpha:
+            alpha = float("-inf")
+        elif score >= beta:
+            beta = float("inf")
+        else:
+            return score, move
+
+
+def _predict_next(depths):
+    """
+    Estimate the time of the next depth from the records of the completed ones.
+    The last depth's time is multiplied by the effective branching factor
+    of the depth before it: odd and even depths grow at different rates,
+    so that depth is the best guess of how the next one grows.
+    """
+    if len(depths) >= 2 and depths[-2]["ebf"] is not None:
+        return depths[-1]["time"] * depths[-2]["ebf"]
+    if depths and depths[-1]["ebf"] is not None:
+        return depths[-1]["time"] * depths[-1]["ebf"]
+    return 0
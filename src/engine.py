@@ -0,0 +1,128 @@
+"""
+Module providing the engine: a game, its search and everything the search
+has learned, kept together for a whole session.
+
+Every entry point (the terminal game, tournaments, the server and the
+benchmark) plays through an Engine, so they all run the same search:
+    engine = Engine()
+    engine.play(3)
+    result = engine.best_move(budget=0.5)
+    engine.play(result.move)
+"""
+
+import os
+from collections import namedtuple
+
+from .bitboard import DEFAULT_GEOMETRY
+from .connect_4 import iterative_deepening
+from .evaluation import EvaluatedPosition
+from .ponder import Ponderer
+from .transposition import DEFAULT_TABLE_SIZE, TranspositionTable
+
+DEFAULT_BUDGET = 1.0
+
+# The answer of Engine.best_move. The score is from player 1's point of
+# view like the scores of minimax, and state is the SearchState with the
+# statistics of the search.
+SearchResult = namedtuple("SearchResult", "move score depth state")
+
+
+class Engine:
+    """
+    Search engine kept for a whole game or session.
+    It owns the position of its game, a transposition table that is kept
+    between moves and games, so the positions searched for one move are
+    already in the table when the next move is searched, an optional
+    OpeningBook, an optional endgame Tablebase and a Ponderer that searches on the opponent's time.
+    Every search starts a new generation of the table (see
+    `TranspositionTable.new_search`), so entries of old positions give way
+    to the current ones without clearing the table.
+    With `table_path` the table is loaded from that file if it exists, and
+    `save` writes it back for a warm start next time. `memory` is an
+    optional TranspositionTable to use instead, such as one in shared
+    memory that several engines search with. `geometry` is the board of
+    the engine's games. Keys of positions on different boards can be the
+    same, so the table is cleared when a search is on another board than
+    the one the table holds.
+    """
+
+    def __init__(self, table_size=DEFAULT_TABLE_SIZE, book=None, table_path=None, memory=None,
+                 geometry=DEFAULT_GEOMETRY, tablebase=None):
+        self.book = book
+        self.tablebase = tablebase
+        self.table_path = table_path
+        if memory is not None:
+            self.memory = memory
+        elif table_path is not None and os.path.exists(table_path):
+            self.memory = TranspositionTable.load(table_path)
+        else:
+            self.memory = TranspositionTable(table_size)
+        self.ponderer = Ponderer(self.memory)
+        self.position = EvaluatedPosition(geometry=geometry)
+        self._table_geometry = geometry
+
+    def new_game(self, geometry=None):
+        """Start a new game, on the board `geometry` or the board of the last game."""
+        self.ponderer.stop()
+        self.position = EvaluatedPosition(geometry=geometry or self.position.geometry)
+        self._fit_table(self.position.geometry)
+
+    def _fit_table(self, shape):
+        """Clear the table if it holds positions of another board than `shape`."""
+        if shape is not self._table_geometry:
+            self.memory.clear()
+            self._table_geometry = shape
+
+    def play(self, col):
+        """
+        Play column `col` for the side to move in the engine's game and
+        stop pondering. Returns the result of the game, see `winner`.
+        Raises ValueError if the game is over or `col` can't be played.
+        """
+        self.ponderer.stop()
+        position = self.position
+        if self.winner() is not None:
+            raise ValueError("The game is over")
+        if not (isinstance(col, int) and 0 <= col < position.geometry.cols
+                and position.can_play(col)):
+            raise ValueError(f"Column {col} can't be played")
+        position.play(col)
+        return self.winner()
+
+    def winner(self):
+        """Return the winner of the engine's game, 0 for a draw or None while it goes on."""
+        position = self.position
+        if position.moves and position.is_win(3 - position.player):
+            return 3 - position.player
+        return 0 if position.is_full() else None
+
+    def best_move(self, position=None, budget=DEFAULT_BUDGET, max_depth=None, state=None):
+        """
+        Search `position`, a Position, or the engine's own game for its
+        side to move, for `budget` seconds. `max_depth` stops the search
+        after that depth even if there is time left; with an infinite
+        budget it is a fixed depth search. `state` is an optional
+        SearchState, for example with a node limit.
+        Returns a SearchResult; its move is None if the game is over.
+        """
+        self.ponderer.stop()
+        if position is None:
+            position = self.position
+        self._fit_table(position.geometry)
+        self.memory.new_search()
+        (score, move), depth, state = iterative_deepening(
+            position, budget, position.player == 1, None, state=state, return_stats=True,
+            book=self.book, memory=self.memory, max_depth=max_depth,
+            tablebase=self.tablebase)
+        return SearchResult(move, score, depth, state)
+
+    def ponder(self):
+        """Search the engine's game in the background until the next `play` or `best_move`."""
+        self.ponderer.start(self.position, self.position.player == 1)
+
+    def save(self, path=None):
+        """Write the table to `path`, or to the `table_path` given to the engine."""
+        path = path if path is not None else self.table_path
+        if path is None:
+            raise ValueError("No path to save the table to")
+        self.memory.save(path)
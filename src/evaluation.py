@@ -0,0 +1,219 @@
+"""Module providing a position that keeps its heuristic score up to date move by move."""
+
+from functools import lru_cache
+
+from .bitboard import CONNECT, DEFAULT_GEOMETRY, Position
+
+
+def run_score(cells, connect=CONNECT):
+    """
+    Score a line of cells (0 = empty, 1 and 2 = players) like `heuristic` does.
+    Every run of `connect` - 2 or `connect` - 1 pieces of a player (two or
+    three for four in a row) is worth 2 or 10 when one end is blocked by
+    the opponent or the edge, 20 or 100 when both ends are open and nothing
+    when both ends are blocked. Runs of one piece are never scored.
+    Player 1's runs count positive and player 2's negative.
+    """
+    values = {connect - 2: (2, 20), connect - 1: (10, 100)}
+    length = len(cells)
+    score = 0
+    for i, player in enumerate(cells):
+        if player == 0 or (i > 0 and cells[i - 1] == player):
+            continue
+        count = 1
+        while count < connect and i + count < length and cells[i + count] == player:
+            count += 1
+        opponent = 3 - player
+        back_blocked = i == 0 or cells[i - 1] == opponent
+        fwd_blocked = i + count >= length or cells[i + count] == opponent
+        if count < 2 or count not in values or (back_blocked and fwd_blocked):
+            continue
+        value = values[count][0 if back_blocked or fwd_blocked else 1]
+        score += value if player == 1 else -value
+    return score
+
+
+def _line_table(length, connect):
+    """Return the run score of every line of `length` cells, indexed by its base 3 code."""
+    table = []
+    for code in range(3 ** length):
+        table.append(run_score([code // 3 ** i % 3 for i in range(length)], connect))
+    return table
+
+
+def _lines(rows, cols):
+    """Return every row, column and diagonal with at least two cells as lists of (x, y)."""
+    lines = [[(x, y) for x in range(cols)] for y in range(rows)]
+    lines += [[(x, y) for y in range(rows)] for x in range(cols)]
+    for dx in (1, -1):
+        for start in range(-rows, cols + rows):
+            line = [(start + dx * y, y) for y in range(rows) if 0 <= start + dx * y < cols]
+            if len(line) >= 2:
+                lines.append(line)
+    return lines
+
+
+class EvaluationTables:
+    """
+    The lines of a geometry and their precomputed tables, see `evaluation_tables`.
+    lines: every row, column and diagonal as a list of (x, y).
+    line_tables[line]: the run score of every base 3 code of the line.
+    cell_lines[bit]: (line, power) for every line through the cell of bit
+    index `bit`, where power is the cell's base 3 digit value in the line code.
+    cell_weights[bit]: the positional value of the cell, the number of
+    windows of `connect` cells that pass through it.
+    """
+
+    def __init__(self, geometry):
+        self.lines = _lines(geometry.rows, geometry.cols)
+        tables = {length: _line_table(length, geometry.connect)
+                  for length in {len(line) for line in self.lines}}
+        self.line_tables = [tables[len(line)] for line in self.lines]
+        size = geometry.cols * geometry.h1
+        self.cell_lines = [() for _ in range(size)]
+        for index, line in enumerate(self.lines):
+            for i, (x, y) in enumerate(line):
+                self.cell_lines[geometry.cell_bit(x, y)] += ((index, 3 ** i),)
+        self.cell_weights = [0] * size
+        for y, row in enumerate(geometry.weights):
+            for x, weight in enumerate(row):
+                self.cell_weights[geometry.cell_bit(x, y)] = weight
+
+
+@lru_cache(maxsize=None)
+def evaluation_tables(geometry):
+    """Return the EvaluationTables of a geometry, built once per geometry."""
+    return EvaluationTables(geometry)
+
+
+_DEFAULT_TABLES = evaluation_tables(DEFAULT_GEOMETRY)
+HEURISTIC_TABLE = DEFAULT_GEOMETRY.weights
+LINES = _DEFAULT_TABLES.lines
+LINE_TABLES = _DEFAULT_TABLES.line_tables
+CELL_LINES = _DEFAULT_TABLES.cell_lines
+CELL_WEIGHTS = _DEFAULT_TABLES.cell_weights
+
+
+class EvaluatedPosition(Position):
+    """
+    Position that keeps the value of `heuristic` in `score`.
+    Every row, column and diagonal is kept as a base 3 code of its cells,
+    and the run score of each code is precomputed for the position's
+    geometry. Playing or undoing a move only updates the four lines through
+    the cell and the cell's positional value instead of rescanning the board.
+    """
+
+    __slots__ = ("codes", "score", "cell_lines", "line_tables", "cell_weights", "mirror_bits")
+
+    def __init__(self, player=1, geometry=DEFAULT_GEOMETRY):
+        super().__init__(player, geometry)
+        tables = evaluation_tables(geometry)
+        self.cell_lines = tables.cell_lines
+        self.line_tables = tables.line_tables
+        self.cell_weights = tables.cell_weights
+        self.mirror_bits = geometry.mirror_bits
+        self.codes = [0] * len(tables.lines)
+        self.score = 0
+
+    @classmethod
+    def from_board(cls, board, player=1, connect=CONNECT):
+        position = super().from_board(board, player, connect)
+        position.evaluate()
+        return position
+
+    @classmethod
+    def from_position(cls, other):
+        """Return an evaluated copy of a Position."""
+        position = cls(other.player, other.geometry)
+        position.boards = other.boards[:]
+        position.heights = other.heights[:]
+        position.moves = other.moves[:]
+        position.key_code, position.mirror_code = other.key_code, other.mirror_code
+        position.evaluate()
+        return position
+
+    def evaluate(self):
+        """Recompute the line codes and score from the bitboards."""
+        codes = [0] * len(self.codes)
+        score = 0
+        for bit, lines in enumerate(self.cell_lines):
+            for player, sign in ((1, 1), (2, -1)):
+                if self.boards[player] >> bit & 1:
+                    for line, power in lines:
+                        codes[line] += player * power
+                    score += sign * self.cell_weights[bit]
+        self.codes = codes
+        self.score = score + sum(table[code] for table, code in zip(self.line_tables, codes))
+        return self.score
+
+    def copy(self):
+        position = EvaluatedPosition(self.player, self.geometry)
+        position.boards = self.boards[:]
+        position.heights = self.heights[:]
+        position.moves = self.moves[:]
+        position.key_code, position.mirror_code = self.key_code, self.mirror_code
+        position.codes = self.codes[:]
+        position.score = self.score
+        return position
+
+    def play(self, col):
+        """
+        Play column `col` like `Position.play` and update the line codes
+        and score. The bitboards are updated here too rather than through
+        `Position.play`, which saves a call on the hottest path of the search.
+        """
+        heights = self.heights
+        index = heights[col]
+        bit = 1 << index
+        heights[col] = index + 1
+        player = self.player
+        boards = self.boards
+        boards[0] |= bit
+        boards[player] |= bit
+        shift = 2 - player
+        self.key_code += bit << shift
+        self.mirror_code += self.mirror_bits[index] << shift
+        self.moves.append(col)
+        self.player = 3 - player
+        codes = self.codes
+        score = self.score
+        line_tables = self.line_tables
+        for line, power in self.cell_lines[index]:
+            old = codes[line]
+            new = old + player * power
+            table = line_tables[line]
+            score += table[new] - table[old]
+            codes[line] = new
+        if player == 1:
+            self.score = score + self.cell_weights[index]
+        else:
+            self.score = score - self.cell_weights[index]
+
+    def undo(self):
+        """Take back the last move like `Position.undo` and restore the line codes and score."""
+        col = self.moves.pop()
+        heights = self.heights
+        index = heights[col] - 1
+        heights[col] = index
+        bit = 1 << index
+        player = 3 - self.player
+        self.player = player
+        boards = self.boards
+        boards[0] ^= bit
+        boards[player] ^= bit
+        shift = 2 - player
+        self.key_code -= bit << shift
+        self.mirror_code -= self.mirror_bits[index] << shift
+        codes = self.codes
+        score = self.score
+        line_tables = self.line_tables
+        for line, power in self.cell_lines[index]:
+            old = codes[line]
+            new = old - player * power
+            table = line_tables[line]
+            score += table[new] - table[old]
+            codes[line] = new
+        if player == 1:
+            self.score = score - self.cell_weights[index]
+        else:
+            self.score = score + self.cell_weights[index]
@@ -0,0 +1,248 @@
+"""
+Module providing multi-core iterative deepening with worker processes.
+
+Measure the depth every mode reaches in a fixed time with:
+    python -m src.parallel --time 2 --workers 4
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+
+from .benchmark import POSITIONS
+from .connect_4 import (
+    WIN_SCORE, SearchState, SearchTimeout, iterative_deepening, minimax, root_position
+)
+from .evaluation import EvaluatedPosition
+from .solver import position_from_moves
+from .transposition import DEFAULT_TABLE_SIZE, TranspositionTable, table_bytes
+
+MODES = ("lazy", "root")
+
+# Depth schedules of the Lazy SMP helpers: helper i skips the depths d
+# for which (d + SKIP_PHASE[i]) // SKIP_SIZE[i] is odd, so the helpers
+# search in blocks of 1 to 4 depths at different offsets and split up
+# over the depths instead of all searching the same one.
+SKIP_SIZE = (1, 1, 2, 2, 2, 2, 3, 3, 3, 3, 3, 3, 4, 4, 4, 4, 4, 4, 4, 4)
+SKIP_PHASE = (0, 1, 0, 1, 2, 3, 0, 1, 2, 3, 4, 5, 0, 1, 2, 3, 4, 5, 6, 7)
+
+# The worker pools kept between searches, by number of workers.
+_pools = {}
+
+
+def worker_pool(workers):
+    """
+    Return the pool of `workers` processes kept for the searches, started
+    and waited for on first use. Starting processes takes up to seconds
+    where they are spawned rather than forked, so it is done once and not
+    charged to the time of a search. The resource tracker is started
+    first, so that the workers share it and the shared tables of Lazy SMP
+    are tracked once.
+    """
+    executor = _pools.get(workers)
+    if executor is None:
+        resource_tracker.ensure_running()
+        executor = _pools[workers] = ProcessPoolExecutor(max_workers=workers)
+        list(executor.map(_ready, range(workers)))
+    return executor
+
+
+def _ready(worker):
+    """Return at once; run in every worker to have it started."""
+    return worker
+
+
+def parallel_iterative_deepening(board, cal_time, maximizing, last_move, workers=None,
+                                 mode="lazy", table_size=DEFAULT_TABLE_SIZE, executor=None):
+    """
+    Iterative deepening spread over `workers` processes (all cores by default).
+    In "lazy" mode (Lazy SMP) every worker searches the whole tree and all
+    of them share one transposition table in shared memory, so the results
+    of one worker cut the searches of the others. The first worker searches
+    every depth and the others skip depths on their own schedules (see
+    `skips_depth`), so at any time they are spread over several depths.
+    In "root" mode the root moves are split between the workers, each with
+    its own table, and the best move is picked at the deepest depth that
+    every worker completed.
+    `executor` is an optional ProcessPoolExecutor to search with instead
+    of the pool kept by `worker_pool`. The time starts when the pool is
+    ready, so starting the processes on first use isn't charged to it.
+    The workers stop at the deadline like `iterative_deepening` and only
+    report completed depths. Every worker completes at least depth 1.
+    Returns ((best_eval, best_move), depth, reports) where reports holds a
+    dict per worker with its node count and deepest completed depth.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown parallel mode: {mode}")
+    position = root_position(board, maximizing, last_move)
+    if position is None:
+        return (None, None), None, []
+    workers = workers or os.cpu_count() or 1
+    state = (position.to_board(), position.player, position.geometry.connect)
+    if executor is None:
+        executor = worker_pool(workers)
+    deadline = time.time() + cal_time
+    if mode == "lazy":
+        return _lazy_smp(executor, state, deadline, workers, table_size)
+    return _root_split(executor, state, position, deadline, workers, table_size)
+
+
+def _lazy_smp(executor, state, deadline, workers, table_size):
+    """Run Lazy SMP workers on one shared table and return the deepest result."""
+    shared = shared_memory.SharedMemory(create=True, size=table_bytes(table_size))
+    try:
+        jobs = [executor.submit(_lazy_worker, state, deadline, shared.name, table_size, worker)
+                for worker in range(workers)]
+        reports = [job.result() for job in jobs]
+    finally:
+        shared.close()
+        shared.unlink()
+    best = max(reports, key=lambda report: report["depth"])
+    return best["result"], best["depth"], [_public(report) for report in reports]
+
+
+def skips_depth(worker, depth):
+    """Return True if the Lazy SMP worker `worker` skips the depth `depth`."""
+    if worker == 0 or depth == 1:
+        return False
+    index = (worker - 1) % len(SKIP_SIZE)
+    return (depth + SKIP_PHASE[index]) // SKIP_SIZE[index] % 2 == 1
+
+
+def _lazy_worker(state, deadline, table_name, table_size, worker):
+    """Search the whole tree with iterative deepening on the shared table."""
+    board, player, connect = state
+    shared = shared_memory.SharedMemory(name=table_name)
+    table = TranspositionTable(table_size, shared.buf)
+    position = EvaluatedPosition.from_board(board, player, connect)
+    search = SearchState(deadline)
+    depth = 0
+    report = {"worker": worker, "nodes": 0, "depth": 0, "result": (0, None)}
+    while True:
+        depth += 1
+        if skips_depth(worker, depth):
+            continue
+        try:
+            result = minimax(position, depth, float("-inf"), float("inf"),
+                             player == 1, table, state=search)
+        except SearchTimeout:
+            break
+        report.update(depth=depth, result=result)
+        if (abs(result[0]) >= WIN_SCORE or depth >= position.geometry.cells - position.piece_count()
+                or time.time() >= deadline):
+            break
+    report["nodes"] = search.nodes
+    del table
+    shared.close()
+    return report
+
+
+def _root_split(executor, state, position, deadline, workers, table_size):
+    """Split the root moves between workers and combine their results."""
+    moves = [col for col in position.geometry.check_order if position.can_play(col)]
+    if not moves:
+        return (0, None), 1, []
+    workers = min(workers, len(moves))
+    jobs = [executor.submit(_root_worker, state, moves[worker::workers], deadline,
+                            table_size, worker)
+            for worker in range(workers)]
+    reports = [job.result() for job in jobs]
+
+    sign = 1 if position.player == 1 else -1
+    won = [report for report in reports if sign * report["result"][0] >= WIN_SCORE]
+    if won:
+        best = max(won, key=lambda report: sign * report["result"][0])
+        return best["result"], best["depth"], [_public(report) for report in reports]
+    depth = min(report["depth"] for report in reports)
+    results = [report["results"][depth - 1] for report in reports]
+    result = max(results, key=lambda result: sign * result[0])
+    return result, depth, [_public(report) for report in reports]
+
+
+def _root_worker(state, moves, deadline, table_size, worker):
+    """Search the root moves `moves` with iterative deepening and its own table."""
+    board, player, connect = state
+    position = EvaluatedPosition.from_board(board, player, connect)
+    table = TranspositionTable(table_size)
+    search = SearchState(deadline)
+    sign = 1 if player == 1 else -1
+    report = {"worker": worker, "nodes": 0, "depth": 0, "result": (0, None), "results": []}
+    depth = 0
+    while True:
+        depth += 1
+        alpha, beta = float("-inf"), float("inf")
+        best_eval, best_move = float("-inf") * sign, None
+        try:
+            for col in moves:
+                position.play(col)
+                child_eval, _ = minimax(position, depth - 1, alpha, beta,
+                                        player != 1, table, state=search)
+                position.undo()
+                if sign * child_eval > sign * best_eval:
+                    best_eval, best_move = child_eval, col
+                    if sign == 1:
+                        alpha = max(alpha, best_eval)
+                    else:
+                        beta = min(beta, best_eval)
+        except SearchTimeout:
+            break
+        report["results"].append((best_eval, best_move))
+        report.update(depth=depth, result=(best_eval, best_move))
+        if (sign * best_eval >= WIN_SCORE
+                or depth >= position.geometry.cells - position.piece_count()
+                or time.time() >= deadline):
+            break
+    report["nodes"] = search.nodes
+    return report
+
+
+def _public(report):
+    """Return the part of a worker report that is given to the caller."""
+    return {"worker": report["worker"], "nodes": report["nodes"], "depth": report["depth"]}
+
+
+def measure_depths(cal_time, workers=None, positions=POSITIONS, table_size=DEFAULT_TABLE_SIZE):
+    """
+    Search every position of `positions` (phase and moves as in the
+    benchmark) for `cal_time` seconds with `iterative_deepening` and with
+    `parallel_iterative_deepening` in every mode.
+    Returns a list of dicts with the moves and the depth of every search.
+    """
+    workers = workers or os.cpu_count() or 1
+    worker_pool(workers)
+    rows = []
+    for phase, moves in positions:
+        position = position_from_moves(moves)
+        board, maximizing = position.to_board(), position.player == 1
+        row = {"phase": phase, "moves": moves,
+               "serial": iterative_deepening(board, cal_time, maximizing, None,
+                                             table_size=table_size)[1]}
+        for mode in MODES:
+            row[mode] = parallel_iterative_deepening(board, cal_time, maximizing, None, workers,
+                                                     mode, table_size)[1]
+        rows.append(row)
+    return rows
+
+
+def main():
+    """Command line entry point for measuring the depth of the parallel modes in a fixed time."""
+    parser = argparse.ArgumentParser(
+        description="Compare the depth of serial and parallel search in a fixed time.")
+    parser.add_argument("--time", type=float, default=2.0, help="seconds per search")
+    parser.add_argument("--workers", type=int, help="worker processes (all cores by default)")
+    parser.add_argument("--table-size", type=int, default=DEFAULT_TABLE_SIZE,
+                        help="transposition table entries")
+    args = parser.parse_args()
+
+    rows = measure_depths(args.time, args.workers, table_size=args.table_size)
+    print(f"{'moves':<32} {'serial':>6} {'lazy':>6} {'root':>6}")
+    for row in rows:
+        print(f"{row['moves'] or '-':<32} {row['serial']:>6} {row['lazy']:>6} {row['root']:>6}")
+    for name in ("serial",) + MODES:
+        print(f"{name}: mean depth {sum(row[name] for row in rows) / len(rows):.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Module providing perft: counting every position a given number of moves
+ahead, which checks the board code against known counts and measures how
+many positions per second it plays through, apart from the search.
+
+Run perft with:
+    python -m src.perft 4453 --depth 8
+and check the board code against the known counts with --verify.
+"""
+
+import argparse
+import sys
+import time
+
+from .connect_4 import check_win, make_move, undo_move, valid_columns
+from .solver import position_from_moves
+
+DEFAULT_DEPTH = 7
+
+# Perft counts from the positions after the given moves (columns 1-7),
+# index i being depth i. No move is played in a won position, but a won
+# position is counted when it is reached at exactly the depth. The counts
+# were made with the list board code and agree with the bitboard code.
+# The empty board has 7 ** 7 - 7 positions at depth 7, since the seven
+# games that fill a column with the first six moves have six moves left.
+KNOWN_COUNTS = {
+    "": [1, 7, 49, 343, 2401, 16807, 117649, 823536, 5673234],
+    "4453": [1, 7, 49, 343, 2317, 16218, 108118, 749587, 4968454],
+    "4444443": [1, 6, 36, 216, 1296, 7056, 42323, 227929, 1349414],
+    "12121233": [1, 7, 42, 259, 1595, 9622, 59277, 352943, 2160091],
+}
+
+
+def perft(position, depth, table=None):
+    """
+    Return the number of positions `depth` moves ahead of a Position,
+    played through with `play` and `undo`. The position must not be won.
+    `table` is an optional dict that keeps the counts of the positions
+    already counted, keyed by their canonical key and depth, so a
+    position reached again, also mirrored, is counted once.
+    """
+    if depth == 0:
+        return 1
+    if table is not None:
+        key = (position.canonical_key()[0], depth)
+        count = table.get(key)
+        if count is not None:
+            return count
+    count = 0
+    has_win, mover = position.geometry.has_win, position.player
+    for col in position.valid_columns():
+        position.play(col)
+        if depth == 1:
+            count += 1
+        elif not has_win(position.boards[mover]):
+            count += perft(position, depth - 1, table)
+        position.undo()
+    if table is not None:
+        table[key] = count
+    return count
+
+
+def perft_board(board, depth, player):
+    """
+    Return the number of positions `depth` moves ahead of a 2D list board
+    with `player` to move, played through in place with `make_move`,
+    `check_win` and `undo_move`. The board must not be won.
+    """
+    if depth == 0:
+        return 1
+    count = 0
+    for col in valid_columns(board):
+        move = make_move(board, col, player)
+        if depth == 1:
+            count += 1
+        elif not check_win(board, move):
+            count += perft_board(board, depth - 1, 3 - player)
+        undo_move(board, move)
+    return count
+
+
+def divide(position, depth, table=None):
+    """Return the perft count of every move of a Position as a dict of column to count."""
+    counts = {}
+    for col in position.valid_columns():
+        position.play(col)
+        if depth > 1 and position.is_win(3 - position.player):
+            counts[col] = 0
+        else:
+            counts[col] = perft(position, depth - 1, table)
+        position.undo()
+    return counts
+
+
+def run_perft(moves, depth, representation="bitboard", use_table=False):
+    """
+    Count the positions `depth` moves ahead of the position after `moves`
+    (columns 1-7) with the "bitboard" or "list" board code, with a count
+    table for the bitboard one when `use_table` is set.
+    Returns a dict with the count, time and positions per second.
+    Raises ValueError for invalid or already won moves.
+    """
+    position = position_from_moves(moves)
+    if position.moves and position.is_win(3 - position.player):
+        raise ValueError(f"The game is already won after {moves}")
+    start = time.perf_counter()
+    if representation == "list":
+        count = perft_board(position.to_board(), depth, position.player)
+    else:
+        count = perft(position, depth, {} if use_table else None)
+    seconds = time.perf_counter() - start
+    return {"moves": moves, "depth": depth, "count": count, "time": seconds,
+            "pps": count / seconds if seconds > 0 else None}
+
+
+def verify(representation="bitboard", use_table=False, max_depth=None):
+    """
+    Count every position of KNOWN_COUNTS to every depth it has, up to
+    `max_depth`. Returns a list of the mismatches, empty when all agree.
+    """
+    mismatches = []
+    for moves, counts in KNOWN_COUNTS.items():
+        for depth, expected in enumerate(counts[:None if max_depth is None else max_depth + 1]):
+            count = run_perft(moves, depth, representation, use_table)["count"]
+            if count != expected:
+                mismatches.append(f"{moves or '-'} depth {depth}: {count} != {expected}")
+    return mismatches
+
+
+def main():
+    """Command line entry point for perft. Exits with 1 if a count is wrong."""
+    parser = argparse.ArgumentParser(description="Count connect four positions to a depth.")
+    parser.add_argument("moves", nargs="?", default="",
+                        help="columns (1-7) played from the empty board, e.g. 4453")
+    parser.add_argument("--depth", type=int, default=DEFAULT_DEPTH, help="moves to look ahead")
+    parser.add_argument("--board", choices=("bitboard", "list"), default="bitboard",
+                        help="board code to count with")
+    parser.add_argument("--table", action="store_true",
+                        help="count every position once with a table (bitboard only)")
+    parser.add_argument("--divide", action="store_true", help="show the count of every move")
+    parser.add_argument("--verify", action="store_true",
+                        help="check the counts of the known positions up to --depth")
+    args = parser.parse_args()
+
+    if args.verify:
+        mismatches = verify(args.board, args.table, args.depth)
+        for mismatch in mismatches:
+            print(f"Wrong count: {mismatch}")
+        if mismatches:
+            sys.exit(1)
+        print(f"All known counts up to depth {args.depth} match")
+        return
+    if args.divide:
+        position = position_from_moves(args.moves)
+        for col, count in divide(position, args.depth, {} if args.table else None).items():
+            print(f"{col + 1}: {count}")
+    for depth in range(1, args.depth + 1):
+        result = run_perft(args.moves, depth, args.board, args.table)
+        known = KNOWN_COUNTS.get(args.moves, [])
+        check = ""
+        if depth < len(known):
+            check = "ok" if known[depth] == result["count"] else f"expected {known[depth]}"
+        print(f"depth {depth:>2} count {result['count']:>12} time {result['time']:7.2f} s "
+              f"pps {result['pps'] or 0:10.0f} {check}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Module providing pondering: searching in a background thread while the opponent thinks."""
+
+import threading
+
+from .connect_4 import SearchState, iterative_deepening, root_position
+
+
+def expected_reply(position, memory):
+    """Return the move stored in `memory` for `position`, or None if there is none."""
+    key, mirrored = position.canonical_key()
+    entry = memory.get(key)
+    if entry is None or entry[3] is None:
+        return None
+    geometry = position.geometry
+    move = geometry.mirror_move(entry[3]) if mirrored else entry[3]
+    return move if 0 <= move < geometry.cols and position.can_play(move) else None
+
+
+class Ponderer:
+    """
+    Searches on the opponent's time in a background thread.
+    `start` is called when it's the opponent's turn. If `memory` has a
+    move for the position, the position after that expected reply is
+    searched; otherwise the opponent's position itself, which covers all
+    replies. The search runs until `stop`, which moves the deadline of its
+    SearchState to now: the search notices it at its next clock poll,
+    within a few milliseconds, and `stop` waits for the thread to finish.
+    Everything searched stays in `memory`, so the search after the real
+    reply starts from a warm table. On a ponder hit its early depths are
+    answered from the table at once.
+    """
+
+    def __init__(self, memory):
+        self.memory = memory
+        self.expected = None
+        self.result = None
+        self.depth = None
+        self._state = None
+        self._thread = None
+
+    def start(self, board, maximizing, last_move=None):
+        """
+        Start pondering the position of the opponent, given like the
+        arguments of `iterative_deepening`. Does nothing if the game is over.
+        """
+        self.stop()
+        position = root_position(board, maximizing, last_move)
+        if position is None or position.is_full():
+            return
+        position = position.copy()
+        self.expected = expected_reply(position, self.memory)
+        if self.expected is not None:
+            position.play(self.expected)
+            if position.is_win(3 - position.player) or position.is_full():
+                self.expected = None
+                position.undo()
+        self.result, self.depth = None, None
+        self._state = SearchState()
+        self._thread = threading.Thread(target=self._run, args=(position,), daemon=True)
+        self._thread.start()
+
+    def _run(self, position):
+        """Search `position` until the search is stopped."""
+        result, depth = iterative_deepening(position, float("inf"), position.player == 1, None,
+                                            state=self._state, memory=self.memory)
+        self.result, self.depth = result, depth
+
+    def is_running(self):
+        """Return True while the background search runs."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def stop(self):
+        """Stop the background search and wait for it. Returns the nodes it searched."""
+        if self._thread is None:
+            return 0
+        self._state.deadline = 0
+        self._thread.join()
+        self._thread = None
+        return self._state.nodes
+
+    def hit(self, move):
+        """Return True if `move` was the expected reply that was pondered."""
+        return self.expected is not None and move == self.expected
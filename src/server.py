@@ -0,0 +1,296 @@
+"""
+Module providing the search as a service: an asyncio server on localhost
+that answers best move requests as JSON lines over TCP.
+
+Run the server with:
+    python -m src.server --port 8765 --workers 4
+
+Every request is one JSON object on its own line, and every answer is one
+JSON line with the same "id":
+    {"id": 1, "moves": "4453", "time_ms": 200}
+    {"id": 1, "move": 3, "score": 12, "depth": 11, "nodes": 18527, "cached": false, ...}
+    {"id": 2, "type": "metrics"}
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from .bitboard import mirror_move
+from .book import OpeningBook
+from .engine import Engine
+from .solver import position_from_moves
+from .transposition import DEFAULT_TABLE_SIZE, TranspositionTable, table_bytes
+
+DEFAULT_PORT = 8765
+DEFAULT_CACHE_SIZE = 10000
+MAX_TIME_MS = 10000
+LATENCY_SAMPLES = 1000
+
+# The engine of a worker process, made by _init_worker.
+_worker = {}
+
+
+def _init_worker(table_name, table_size, book_path):
+    """Give the worker process an Engine on the shared table."""
+    shared = shared_memory.SharedMemory(name=table_name)
+    book = OpeningBook(book_path) if book_path else None
+    _worker["shared"] = shared
+    _worker["engine"] = Engine(book=book, memory=TranspositionTable(table_size, shared.buf))
+
+
+def _search(moves, time_ms):
+    """Search the position after `moves` for `time_ms` milliseconds in a worker."""
+    result = _worker["engine"].best_move(position_from_moves(moves), time_ms / 1000)
+    return {"move": result.move, "score": result.score, "depth": result.depth,
+            "nodes": result.state.nodes}
+
+
+class Metrics:
+    """
+    Counters of a server: requests, cache hits, requests that joined a
+    search already running for the same position, errors, the number of
+    searches waiting for or running in the pool (the queue depth) and its
+    peak, and the latency of the last LATENCY_SAMPLES requests.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.cache_hits = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.queue_depth = 0
+        self.peak_queue_depth = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def enqueue(self):
+        """Count a search sent to the pool."""
+        self.queue_depth += 1
+        self.peak_queue_depth = max(self.peak_queue_depth, self.queue_depth)
+
+    def as_dict(self):
+        """Return the metrics as a dict of plain values, latencies in milliseconds."""
+        latencies = sorted(self.latencies)
+
+        def percentile(fraction):
+            if not latencies:
+                return None
+            return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))]
+
+        return {
+            "requests": self.requests,
+            "cache_hits": self.cache_hits,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "queue_depth": self.queue_depth,
+            "peak_queue_depth": self.peak_queue_depth,
+            "latency_mean_ms": sum(latencies) / len(latencies) if latencies else None,
+            "latency_p50_ms": percentile(0.5),
+            "latency_p95_ms": percentile(0.95),
+            "latency_max_ms": latencies[-1] if latencies else None,
+        }
+
+
+class SearchServer:
+    """
+    Answers best move requests with a pool of `workers` processes (all
+    cores by default). The workers share one transposition table of
+    `table_size` entries in shared memory, so what one worker searched
+    helps the others, and can use the opening book at `book_path`.
+    Searches run in the pool, so the event loop keeps taking requests
+    while they run and a long search only holds up its own worker.
+    Results are kept in a cache of `cache_size` positions: a position is
+    answered from it when it was searched at least as long as requested.
+    A request for a position that is already being searched at least as
+    long waits for that search instead of starting another one.
+    Positions and their mirror images share cache entries, and a search
+    never replaces the cached result of a longer one. The shared table
+    isn't aged (see `TranspositionTable`), as the workers can't agree on
+    its generation.
+    """
+
+    def __init__(self, workers=None, table_size=DEFAULT_TABLE_SIZE,
+                 cache_size=DEFAULT_CACHE_SIZE, book_path=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.cache_size = cache_size
+        self.metrics = Metrics()
+        self._cache = OrderedDict()
+        self._running = {}
+        self._shared = shared_memory.SharedMemory(create=True, size=table_bytes(table_size))
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_init_worker,
+            initargs=(self._shared.name, table_size, book_path))
+        self._server = None
+        self._connections = {}
+
+    async def start(self, host="127.0.0.1", port=DEFAULT_PORT):
+        """Start listening; port 0 picks a free port. Returns the port."""
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        """Serve until the task is cancelled."""
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        """Stop listening, close the connections, stop the workers and free the shared table."""
+        if self._server is not None:
+            self._server.close()
+            for writer in self._connections.values():
+                writer.close()
+            await asyncio.gather(*self._connections, return_exceptions=True)
+            await self._server.wait_closed()
+        self._executor.shutdown(cancel_futures=True)
+        self._shared.close()
+        self._shared.unlink()
+
+    async def best_move(self, moves, time_ms):
+        """
+        Return the answer for the position after `moves` (1-based columns
+        as a string) searched for `time_ms` milliseconds: a dict with the
+        move (0-based column), score from player 1's point of view, depth,
+        nodes and whether it came from the cache or another request's search.
+        Raises ValueError for invalid moves or time.
+        """
+        if not isinstance(time_ms, (int, float)) or not 0 < time_ms <= MAX_TIME_MS:
+            raise ValueError(f"time_ms must be between 0 and {MAX_TIME_MS}")
+        position = position_from_moves(moves)
+        key, mirrored = position.canonical_key()
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] >= time_ms:
+            self._cache.move_to_end(key)
+            self.metrics.cache_hits += 1
+            return _answer(cached[1], mirrored, cached=True)
+        running = self._running.get(key)
+        if running is not None and running[0] >= time_ms:
+            self.metrics.coalesced += 1
+            return _answer(await asyncio.shield(running[1]), mirrored, coalesced=True)
+
+        future = asyncio.get_running_loop().run_in_executor(self._executor, _search,
+                                                            moves, time_ms)
+        self._running[key] = (time_ms, _canonical(future, mirrored))
+        self.metrics.enqueue()
+        try:
+            result = await asyncio.shield(self._running[key][1])
+        finally:
+            self.metrics.queue_depth -= 1
+            if self._running.get(key, (None, None))[0] == time_ms:
+                del self._running[key]
+        cached = self._cache.get(key)
+        if cached is None or time_ms >= cached[0]:
+            self._cache[key] = (time_ms, result)
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return _answer(result, mirrored)
+
+    async def answer(self, message):
+        """Return the answer to one decoded request."""
+        start = time.perf_counter()
+        self.metrics.requests += 1
+        reply = {"id": message.get("id")} if isinstance(message, dict) else {"id": None}
+        try:
+            if not isinstance(message, dict):
+                raise ValueError("A request must be a JSON object")
+            if message.get("type", "move") == "metrics":
+                reply.update(self.metrics.as_dict())
+                return reply
+            reply.update(await self.best_move(str(message.get("moves", "")),
+                                              message.get("time_ms")))
+        except ValueError as error:
+            self.metrics.errors += 1
+            reply["error"] = str(error)
+        latency = (time.perf_counter() - start) * 1000
+        self.metrics.latencies.append(latency)
+        reply["latency_ms"] = latency
+        return reply
+
+    async def _handle(self, reader, writer):
+        """Answer the requests of one connection, each as soon as it is ready."""
+        tasks = set()
+
+        async def reply(line):
+            try:
+                message = json.loads(line)
+            except json.JSONDecodeError:
+                self.metrics.errors += 1
+                answer = {"id": None, "error": "Invalid JSON"}
+            else:
+                answer = await self.answer(message)
+            writer.write((json.dumps(answer) + "\n").encode())
+            await writer.drain()
+
+        self._connections[asyncio.current_task()] = writer
+        try:
+            while line := await reader.readline():
+                if line.strip():
+                    task = asyncio.create_task(reply(line))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        except ConnectionError:
+            pass
+        finally:
+            del self._connections[asyncio.current_task()]
+            writer.close()
+
+
+async def _canonical_result(future, mirrored):
+    """Await a worker's result and turn its move into the move of the canonical position."""
+    result = await future
+    if mirrored and result["move"] is not None:
+        result = dict(result, move=mirror_move(result["move"]))
+    return result
+
+
+def _canonical(future, mirrored):
+    """Return a task giving the result of `future` for the canonical position."""
+    return asyncio.ensure_future(_canonical_result(future, mirrored))
+
+
+def _answer(result, mirrored, cached=False, coalesced=False):
+    """Return the answer for a canonical `result`, reflected when the position is mirrored."""
+    answer = dict(result, cached=cached, coalesced=coalesced)
+    if mirrored and answer["move"] is not None:
+        answer["move"] = mirror_move(answer["move"])
+    return answer
+
+
+async def _serve(args):
+    """Run the server of the command line arguments until interrupted."""
+    server = SearchServer(args.workers, args.table_size, args.cache_size, args.book)
+    port = await server.start(args.host, args.port)
+    print(f"Serving on {args.host}:{port} with {server.workers} workers")
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+
+
+def main():
+    """Command line entry point for the search server."""
+    parser = argparse.ArgumentParser(description="Serve connect four best moves over TCP.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port to listen on")
+    parser.add_argument("--workers", type=int, help="worker processes (all cores by default)")
+    parser.add_argument("--table-size", type=int, default=DEFAULT_TABLE_SIZE,
+                        help="entries of the shared transposition table")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE,
+                        help="positions kept in the result cache")
+    parser.add_argument("--book", help="opening book file for the workers")
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
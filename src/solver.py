@@ -0,0 +1,243 @@
+"""
+Module providing an exact solver: the outcome of a position with perfect
+play from both sides and the number of moves until the game ends.
+
+Solve a position from the command line with:
+    python -m src.solver 4453
+where the digits are the columns (1-7) played from the empty board.
+"""
+
+import argparse
+import time
+
+from .bitboard import (
+    BOTTOM, COLS, DEFAULT_GEOMETRY, H1, ROWS, Position, non_losing_cells, playable_cells,
+    winning_cells
+)
+from .connect_4 import CHECK_ORDER, POLL_INTERVAL, SearchState, SearchTimeout
+from .transposition import DEFAULT_TABLE_SIZE, LOWER, UPPER, TranspositionTable
+
+CELLS = ROWS * COLS
+COLUMN_BITS = tuple(((1 << ROWS) - 1) << (col * H1) for col in range(COLS))
+
+
+def win_score(pieces):
+    """Return the score of winning with the move played when `pieces` pieces are on the board."""
+    return (CELLS + 1 - pieces) // 2
+
+
+def _check_position(position):
+    """Raise ValueError if the game is over or the board isn't the standard one."""
+    if position.geometry is not DEFAULT_GEOMETRY:
+        raise ValueError("The solver only solves the standard 6x7 board")
+    if position.is_win(1) or position.is_win(2):
+        raise ValueError("The game is already won")
+
+
+class Solver:
+    """
+    Exact solver for connect four positions.
+    Scores are from the side to move's point of view: 0 is a draw, a
+    positive score a win and a negative score a loss. A win scores
+    `win_score` of the number of pieces on the board when the winning move
+    is played, so a quicker win scores more and a slower loss less. See
+    `outcome` for turning a score into the number of moves left.
+
+    The search is a negamax that only answers whether the score is above or
+    below a bound (a null window), and `solve` narrows the bounds of the
+    score until they meet. Moves that let the opponent win at once are never
+    searched: a node with an opponent's winning cell to block only searches
+    the block, and no move is played under a winning cell of the opponent.
+    Bounds are kept in a TranspositionTable, which is kept between solves.
+
+    Positions with 20 or more pieces are solved in a fraction of a second.
+    Solving the empty board takes billions of nodes, days in Python, so
+    early positions are better left to the opening book and `minimax`.
+    """
+
+    def __init__(self, table_size=DEFAULT_TABLE_SIZE):
+        self.table = TranspositionTable(table_size)
+        self.state = SearchState()
+
+    def solve(self, position, state=None):
+        """
+        Return the exact score of `position` for its side to move.
+        `state` is an optional SearchState for the node count and a deadline;
+        SearchTimeout is raised when the deadline passes.
+        Raises ValueError if the game is already over or the board isn't 6x7.
+        """
+        _check_position(position)
+        self.state = state if state is not None else SearchState()
+        return self._solve(position.boards[position.player], position.boards[0])
+
+    def analyze(self, position, state=None):
+        """
+        Return a list with the exact score of every column for the side to
+        move, None for a full column.
+        """
+        _check_position(position)
+        self.state = state if state is not None else SearchState()
+        current, mask = position.boards[position.player], position.boards[0]
+        pieces = mask.bit_count()
+        wins = winning_cells(current, mask)
+        scores = [None] * COLS
+        for col in range(COLS):
+            bit = playable_cells(mask) & COLUMN_BITS[col]
+            if not bit:
+                continue
+            if wins & bit:
+                scores[col] = win_score(pieces)
+            elif pieces + 1 == CELLS:
+                scores[col] = 0
+            else:
+                scores[col] = -self._solve(current ^ mask, mask | bit)
+        return scores
+
+    def best_move(self, position, state=None):
+        """
+        Return (score, move) of the best move of `position`, the quickest
+        win or the slowest loss. Ties go to the most central column.
+        A win with the next move is returned without solving the others.
+        """
+        _check_position(position)
+        wins = winning_cells(position.boards[position.player], position.boards[0])
+        for col in CHECK_ORDER:
+            if wins & playable_cells(position.boards[0]) & COLUMN_BITS[col]:
+                return win_score(position.piece_count()), col
+        return best_of(self.analyze(position, state))
+
+    def _solve(self, current, mask):
+        """Return the exact score for the side to move with pieces `current`."""
+        pieces = mask.bit_count()
+        if winning_cells(current, mask) & playable_cells(mask):
+            return win_score(pieces)
+        low, high = -((CELLS - pieces) // 2), win_score(pieces)
+        while low < high:
+            # Search at the middle, or nearer to 0 where most scores are.
+            middle = low + (high - low) // 2
+            if middle <= 0 and int(low / 2) < middle:
+                middle = int(low / 2)
+            elif middle >= 0 and high // 2 > middle:
+                middle = high // 2
+            score = self._negamax(current, mask, middle, middle + 1)
+            if score <= middle:
+                high = score
+            else:
+                low = score
+        return low
+
+    def _negamax(self, current, mask, alpha, beta):
+        """
+        Return the score of the position if it's inside (alpha, beta), an
+        upper bound of it if it's at most alpha and a lower bound if it's at
+        least beta. The side to move, with pieces `current`, must not have
+        a winning move: the move that led here didn't allow one.
+        """
+        state = self.state
+        state.nodes += 1
+        if not state.nodes & (POLL_INTERVAL - 1) and time.time() >= state.deadline:
+            raise SearchTimeout
+        pieces = mask.bit_count()
+        possible = non_losing_cells(current, mask)
+        if not possible:
+            return -((CELLS - pieces) // 2)  # the opponent wins with the next move
+        if pieces >= CELLS - 2:
+            return 0
+
+        # Neither side can win before its next move, which bounds the score.
+        low = -((CELLS - 2 - pieces) // 2)
+        high = (CELLS - 1 - pieces) // 2
+        key = current + mask + BOTTOM
+        entry = self.table.get(key)
+        table_move = None
+        if entry is not None:
+            _, flag, score, table_move = entry
+            if flag == LOWER:
+                low = max(low, score)
+            else:
+                high = min(high, score)
+        if alpha < low:
+            alpha = low
+            if alpha >= beta:
+                return alpha
+        if beta > high:
+            beta = high
+            if alpha >= beta:
+                return beta
+
+        moves = []
+        for col in CHECK_ORDER:
+            bit = possible & COLUMN_BITS[col]
+            if bit:
+                moves.append((winning_cells(current | bit, mask | bit).bit_count(), col, bit))
+        moves.sort(key=lambda move: (move[1] == table_move, move[0]), reverse=True)
+
+        depth = CELLS - pieces
+        for _, col, bit in moves:
+            score = -self._negamax(current ^ mask, mask | bit, -beta, -alpha)
+            if score >= beta:
+                self.table[key] = (depth, LOWER, score, col)
+                return score
+            if score > alpha:
+                alpha = score
+        self.table[key] = (depth, UPPER, alpha, None)
+        return alpha
+
+
+def best_of(scores):
+    """Return (score, move) of the best column of a list from `Solver.analyze`."""
+    move = max((col for col in CHECK_ORDER if scores[col] is not None),
+               key=lambda col: scores[col])
+    return scores[move], move
+
+
+def outcome(position, score):
+    """
+    Return (result, moves) for an exact score of `position`: result is
+    "win", "loss" or "draw" for the side to move and moves the number of
+    moves (plies) until the game ends with perfect play.
+    """
+    pieces = position.piece_count()
+    if score == 0:
+        return "draw", CELLS - pieces
+    # The winning move is played with `end` pieces on the board; it is
+    # the side to move's move when `end` has the parity of `pieces`.
+    parity = pieces % 2 if score > 0 else (pieces + 1) % 2
+    end = CELLS + 1 - 2 * abs(score)
+    if end % 2 != parity:
+        end -= 1
+    return ("win" if score > 0 else "loss"), end - pieces + 1
+
+
+def position_from_moves(moves):
+    """Return the Position after a string of 1-based columns such as "4453"."""
+    position = Position()
+    for char in moves:
+        col = int(char) - 1 if char.isdigit() else -1
+        if not 0 <= col < COLS or not position.can_play(col):
+            raise ValueError(f"Invalid move {char} in {moves}")
+        position.play(col)
+    return position
+
+
+def main():
+    """Command line entry point for solving a position."""
+    parser = argparse.ArgumentParser(description="Solve a connect four position exactly.")
+    parser.add_argument("moves", nargs="?", default="",
+                        help="columns (1-7) played from the empty board, e.g. 4453")
+    parser.add_argument("--analyze", action="store_true", help="score every column")
+    args = parser.parse_args()
+    position = position_from_moves(args.moves)
+    solver = Solver()
+    start = time.time()
+    scores = solver.analyze(position)
+    if args.analyze:
+        print(" ".join("-" if score is None else str(score) for score in scores))
+    score, move = best_of(scores)
+    result, moves = outcome(position, score)
+    print(f"score {score}: {result} in {moves} moves, best move {move + 1}")
+    print(f"{solver.state.nodes} nodes in {time.time() - start:.2f} seconds")
+
+
+if __name__ == "__main__":
+    main()
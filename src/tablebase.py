@@ -0,0 +1,337 @@
+"""
+Module providing an endgame tablebase: the exact result of late positions,
+made by retrograde analysis and read from a memory-mapped file.
+
+Generate a tablebase with:
+    python -m src.tablebase --empty 12 --random 200 --output tablebase.bin
+"""
+
+import argparse
+import mmap
+import os
+import random
+import struct
+import sys
+import time
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+
+from .analysis import read_games
+from .bitboard import DEFAULT_GEOMETRY, Position, geometry
+from .solver import position_from_moves
+
+DEFAULT_TABLEBASE_PATH = "tablebase.bin"
+DEFAULT_EMPTY = 12
+MAGIC = b"C4TB"
+HEADER = struct.Struct("<4sBBBBQ")  # magic, rows, cols, connect, most empty cells, count
+
+# Results for the side to move, and the sign they give the moves to the end.
+WIN, LOSS, DRAW = 1, 2, 3
+_SIGNS = (0, 1, -1, 0)
+
+# Every position is one 64-bit word: its canonical key (see
+# `Position.canonical_key`) shifted left by VALUE_BITS, and its value in
+# the low bits. The value is the result times 64 plus the number of moves
+# to the end of the game with perfect play, counting the winning move;
+# 0 for a draw. The words are sorted, so a probe is a binary search.
+VALUE_BITS = 8
+VALUE_MASK = (1 << VALUE_BITS) - 1
+
+
+class Tablebase:
+    """
+    Read-only tablebase file opened with mmap.
+    It has every position of its seeds with at most `max_empty` empty
+    cells; a position where the side to move can win at once is stored
+    but not followed further. Nothing is loaded into memory up front.
+    """
+
+    def __init__(self, path=DEFAULT_TABLEBASE_PATH):
+        with open(path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, rows, cols, connect, self.max_empty, self.count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a tablebase")
+        self.geometry = geometry(rows, cols, connect)
+        self._words = memoryview(self._map)[HEADER.size:HEADER.size + 8 * self.count].cast("Q")
+
+    def __len__(self):
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        """Close the memory map of the file."""
+        self._words.release()
+        self._map.close()
+
+    def probe_key(self, key):
+        """
+        Return the moves to the end of the game of the position with the
+        canonical key `key`: n when the side to move wins in n moves, -n
+        when it loses in n and 0 for a draw. None if it isn't stored.
+        """
+        value = self._value(key)
+        return None if value is None else _SIGNS[value >> 6] * (value & 63)
+
+    def _value(self, key):
+        """Return the value stored for the canonical key `key`, or None if it isn't stored."""
+        words = self._words
+        index = bisect_left(words, key << VALUE_BITS)
+        if index < self.count and words[index] >> VALUE_BITS == key:
+            return words[index] & VALUE_MASK
+        return None
+
+    def probe(self, position):
+        """
+        Return (result, moves) for `position`: WIN, LOSS or DRAW for the
+        side to move and the number of moves to the end of the game with
+        perfect play. Returns None if the position isn't in the tablebase.
+        """
+        if (position.geometry is not self.geometry
+                or position.geometry.cells - position.piece_count() > self.max_empty):
+            return None
+        value = self._value(position.canonical_key()[0])
+        return None if value is None else (value >> 6, value & 63)
+
+
+def open_tablebase(path=DEFAULT_TABLEBASE_PATH):
+    """Return the Tablebase of the file `path`, or None if there is no such file."""
+    return Tablebase(path) if os.path.exists(path) else None
+
+
+def _decode(code, shape):
+    """Return (mask, mirror code) of the position with the key code `code`."""
+    h1, cols = shape.h1, shape.cols
+    column = (1 << h1) - 1
+    mask = mirror = 0
+    for col in range(cols):
+        shift = col * h1
+        segment = code >> shift & column
+        # Above the pieces of a column the key code has one marker bit.
+        mask |= ((1 << segment.bit_length() - 1) - 1) << shift
+        mirror |= segment << (cols - 1 - col) * h1
+    return mask, mirror
+
+
+def _children(code, empty, shape):
+    """
+    Return the side to move in the position with the key code `code` and
+    `empty` empty cells, and the key codes of its children, or None for
+    them if the side to move wins at once.
+    """
+    mask, mirror = _decode(code, shape)
+    player = 1 if (shape.cells - empty) % 2 == 0 else 2
+    pieces = code - shape.bottom - mask  # the pieces of player 1
+    current = pieces if player == 1 else mask ^ pieces
+    moves = shape.playable_cells(mask)
+    if shape.winning_cells(current, mask) & moves:
+        return player, None
+    shift = 2 - player
+    mirror_bits = shape.mirror_bits
+    codes = []
+    while moves:
+        bit = moves & -moves
+        moves ^= bit
+        codes.append(min(code + (bit << shift),
+                         mirror + (mirror_bits[bit.bit_length() - 1] << shift)))
+    return player, codes
+
+
+def _expand(codes, empty, shape):
+    """Return the set of key codes of the children of the positions `codes`."""
+    below = set()
+    for code in codes:
+        children = _children(code, empty, shape)[1]
+        if children is not None:
+            below.update(children)
+    return below
+
+
+def _solve(codes, empty, values, shape):
+    """
+    Return the values of the positions `codes` with `empty` empty cells,
+    given the `values` of the positions with one empty cell less, and their
+    words of the tablebase file.
+    """
+    solved, words = {}, []
+    for code in codes:
+        player, children = _children(code, empty, shape)
+        if children is None:
+            value = WIN << 6 | 1
+        else:
+            win, loss, draw = None, 0, False
+            for child in children:
+                child_value = values[child] if empty > 1 else DRAW << 6
+                result, moves = child_value >> 6, child_value & 63
+                if result == LOSS:
+                    win = moves if win is None else min(win, moves)
+                elif result == WIN:
+                    loss = max(loss, moves)
+                else:
+                    draw = True
+            if win is not None:
+                value = WIN << 6 | win + 1
+            elif draw:
+                value = DRAW << 6
+            else:
+                value = LOSS << 6 | loss + 1
+        solved[code] = value
+        words.append(((code << 1 | player - 1) << VALUE_BITS) | value)
+    return solved, words
+
+
+def solve_positions(seeds, max_empty, shape=DEFAULT_GEOMETRY, executor=None, workers=1):
+    """
+    Solve every position with at most `max_empty` empty cells that can be
+    reached from the positions after the moves of `seeds` (lists of
+    columns) by retrograde analysis. First every reachable position is
+    found, one layer of empty cells at a time, then the layers are solved
+    backwards from the one with a single empty cell: a position is won if
+    a move leads to a lost position, lost if every move leads to a won
+    one and drawn otherwise. Seeds with more empty cells or a finished
+    game are skipped.
+    With an `executor`, every layer is split into `workers` parts that are
+    expanded and solved by its processes, so each position is handled once.
+    Returns the words of the tablebase file for the positions, unsorted.
+    """
+    layers = [set() for _ in range(max_empty + 1)]
+    for moves in seeds:
+        position = Position(geometry=shape)
+        for col in moves:
+            position.play(col)
+        empty = shape.cells - position.piece_count()
+        if 0 < empty <= max_empty and not position.is_win(3 - position.player):
+            layers[empty].add(min(position.key_code, position.mirror_code))
+
+    def run(function, codes, empty, *args):
+        """Run `function` on `codes` at once, or on `workers` parts of them in the executor."""
+        if executor is None:
+            return [function(codes, empty, *args, shape)]
+        codes = list(codes)
+        parts = [codes[index::workers] for index in range(workers)]
+        return list(executor.map(function, parts, [empty] * workers,
+                                 *[[arg] * workers for arg in args], [shape] * workers))
+
+    for empty in range(max_empty, 1, -1):
+        for below in run(_expand, layers[empty], empty):
+            layers[empty - 1].update(below)
+
+    words = []
+    values = {}
+    for empty in range(1, max_empty + 1):
+        solved = {}
+        for part_values, part_words in run(_solve, layers[empty], empty, values):
+            solved.update(part_values)
+            words += part_words
+        values = solved
+    return words
+
+
+def seed_positions(games, max_empty):
+    """
+    Return the moves of every game of `games` (lists of columns) up to the
+    first position with at most `max_empty` empty cells, for the games
+    that get there without ending.
+    """
+    seeds = []
+    for moves in games:
+        position = Position()
+        for col in moves:
+            if position.is_win(3 - position.player) or not position.can_play(col):
+                break
+            if position.geometry.cells - position.piece_count() <= max_empty:
+                seeds.append(list(position.moves))
+                break
+            position.play(col)
+        else:
+            if (position.geometry.cells - position.piece_count() <= max_empty
+                    and not position.is_win(3 - position.player)):
+                seeds.append(list(position.moves))
+    return seeds
+
+
+def record_games(lines):
+    """
+    Return the moves of every game of the game records `lines` (see
+    `read_games`) as lists of columns, and the number of games left out
+    for a move that isn't a column 1-7 or is played in a full column.
+    """
+    games, invalid = [], 0
+    for moves in read_games(lines):
+        try:
+            games.append(position_from_moves(moves).moves)
+        except ValueError:
+            invalid += 1
+    return games, invalid
+
+
+def random_games(count, max_empty, seed=None):
+    """Return the moves of `count` random games played until `max_empty` cells are left."""
+    rng = random.Random(seed)
+    games = []
+    while len(games) < count:
+        position = Position()
+        while position.geometry.cells - position.piece_count() > max_empty:
+            position.play(rng.choice(position.valid_columns()))
+            if position.is_win(3 - position.player):
+                break
+        else:
+            games.append(list(position.moves))
+    return games
+
+
+def generate_tablebase(path, seeds, max_empty=DEFAULT_EMPTY, workers=1):
+    """
+    Solve every position with at most `max_empty` empty cells reachable
+    from `seeds` (see `solve_positions`) and write the tablebase to `path`.
+    With more than one worker every layer of empty cells is split between
+    worker processes, so every position is still solved only once.
+    Returns the number of positions written.
+    """
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            words = sorted(solve_positions(seeds, max_empty, executor=executor, workers=workers))
+    else:
+        words = sorted(solve_positions(seeds, max_empty))
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, DEFAULT_GEOMETRY.rows, DEFAULT_GEOMETRY.cols,
+                               DEFAULT_GEOMETRY.connect, max_empty, len(words)))
+        file.write(struct.pack(f"={len(words)}Q", *words))
+    return len(words)
+
+
+def main():
+    """Command line entry point for generating a tablebase."""
+    parser = argparse.ArgumentParser(description="Generate a connect four endgame tablebase.")
+    parser.add_argument("--empty", type=int, default=DEFAULT_EMPTY,
+                        help="most empty cells of a position in the tablebase")
+    parser.add_argument("--games", help="file of games whose late positions are the seeds")
+    parser.add_argument("--random", type=int, default=0,
+                        help="number of random games to take seeds from")
+    parser.add_argument("--seed", type=int, help="seed of the random games")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes")
+    parser.add_argument("--output", default=DEFAULT_TABLEBASE_PATH, help="tablebase file to write")
+    args = parser.parse_args()
+
+    games = random_games(args.random, args.empty, args.seed)
+    if args.games:
+        with open(args.games, encoding="utf-8") as file:
+            recorded, invalid = record_games(file)
+        games += recorded
+        if invalid:
+            print(f"Left out {invalid} games with invalid moves", file=sys.stderr)
+    seeds = seed_positions(games, args.empty)
+    start = time.time()
+    count = generate_tablebase(args.output, seeds, args.empty, args.workers)
+    print(f"Wrote {count} positions from {len(seeds)} seeds to {args.output} "
+          f"in {time.time() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
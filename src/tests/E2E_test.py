@@ -1,30 +1,24 @@
 """Module for testing a full game played by AIs"""
 
 from random import uniform
-from connect_4 import create_board, make_move, check_win, check_draw, iterative_deepening
+from src.engine import Engine
 
 
 def test_end_to_end():
     """Run a game with two AI playing each other win a semi-random time limit"""
-    board = create_board()
+    engines = {1: Engine(), 2: Engine()}
+    cal_times = {1: uniform(0.1, 1), 2: uniform(0.1, 1)}
+    winner = None
 
-    cal_time1 = uniform(0.1,1)
-    cal_time2 = uniform(0.1,1)
-    last_move = None
-
-    for _ in range(21): # Maximum amount of moves turns, because 21 turns = 42 = 6x7 moves
-        best, _ = iterative_deepening(board, cal_time1, True, last_move)
-        _, best_move = best
-        assert best_move is not None and 0 <= best_move < 7
-        last_move = make_move(board, best_move, 1)
-        if check_win(board, last_move) or check_draw(board):
-            break
-
-        best, _ = iterative_deepening(board, cal_time2, False, last_move)
-        _, best_move = best
+    for _ in range(42): # Maximum amount of moves, because 6x7 = 42
+        player = engines[1].position.player
+        best_move = engines[player].best_move(budget=cal_times[player]).move
         assert best_move is not None and 0 <= best_move < 7
-        last_move = make_move(board, best_move, 2)
-        if check_win(board, last_move) or check_draw(board):
+        for engine in engines.values():
+            winner = engine.play(best_move)
+        if winner is not None:
             break
     else:
         assert False, "Game did not terminate within 42 moves"
+    assert engines[1].position.moves == engines[2].position.moves
+    assert engines[1].winner() == engines[2].winner() == winner
@@ -0,0 +1,70 @@
+"""This module is for testing the analysis of game records in file analysis.py"""
+
+import io
+import json
+import pytest
+from src.analysis import Analysis, analyze, game_positions, read_games, resume_point
+
+GAMES = "4453\n\n# a comment\n{\"moves\": \"4444\", \"winner\": null}\n7\n1212121\n12x\n"
+
+
+def without_cached(records):
+    """Return the records without the cached flag, which depends on the run"""
+    return [{name: value for name, value in record.items() if name != "cached"}
+            for record in records]
+
+
+def test_read_games():
+    """Check that game records are read from move strings and JSON lines, skipping comments"""
+    assert list(read_games(io.StringIO(GAMES))) == ["4453", "4444", "7", "1212121", "12x"]
+
+
+def test_game_positions():
+    """Check the positions of a game, and the errors of invalid moves and moves after the end"""
+    positions = list(game_positions(["45", "1212121", "12x", "12121214"]))
+    assert [record["moves"] for record in positions[:3]] == ["", "4", "45"]
+    assert [record["ply"] for record in positions[3:10]] == list(range(7))
+    assert positions[10] == {"game": 2, "ply": 0, "moves": ""}
+    assert positions[13]["error"] == "Invalid move x in 12x"
+    assert positions[-1]["error"] == "Moves after the end of the game in 12121214"
+    assert positions[-2]["moves"] == "121212"
+
+
+def test_duplicates_and_mirror_images_are_searched_once():
+    """Check that a repeated or mirrored position comes from the cache with the right move"""
+    analysis = Analysis(depth=4, workers=1, table_size=1 << 12)
+    records = list(analysis.run(game_positions(["1", "7", "1"])))
+    assert [record["cached"] for record in records] == [False, False, True, True, True, True]
+    assert analysis.searched == 2 and analysis.cache_hits == 4
+    assert records[3]["move"] == 6 - records[1]["move"]
+    assert records[3]["score"] == records[1]["score"]
+    assert records[5] == dict(records[1], game=2, cached=True)
+
+
+def test_node_budget():
+    """Check that a node budget stops every search near it"""
+    records = list(Analysis(nodes=200, workers=1, table_size=1 << 12).run(game_positions([""])))
+    assert records[0]["depth"] is not None and records[0]["nodes"] < 200 + 2000
+
+
+def test_resume_after_interruption(tmp_path):
+    """Check that a run cut off in the middle of a line continues with the same records"""
+    output = tmp_path / "analysis.jsonl"
+    analyze(io.StringIO(GAMES), output, depth=3, workers=1, table_size=1 << 12)
+    lines = output.read_text(encoding="utf-8").splitlines(keepends=True)
+    output.write_text("".join(lines[:7]) + lines[7][:20], encoding="utf-8")
+    assert resume_point(output)[0] == 7
+    analysis = analyze(io.StringIO(GAMES), output, depth=3, workers=1, table_size=1 << 12)
+    assert analysis.searched + analysis.cache_hits == len(lines) - 7 - 1
+    resumed = output.read_text(encoding="utf-8").splitlines(keepends=True)
+    assert without_cached(map(json.loads, resumed)) == without_cached(map(json.loads, lines))
+
+
+def test_resume_with_other_input_raises(tmp_path):
+    """Check that an output made from other games isn't continued"""
+    output = tmp_path / "analysis.jsonl"
+    analyze(io.StringIO("44\n"), output, depth=2, workers=1, table_size=1 << 12)
+    with pytest.raises(ValueError):
+        analyze(io.StringIO("45\n"), output, depth=2, workers=1, table_size=1 << 12)
+    with pytest.raises(ValueError):
+        analyze(io.StringIO("4\n"), output, depth=2, workers=1, table_size=1 << 12)
@@ -0,0 +1,49 @@
+"""This module is for testing the vectorized heuristic in file batch.py"""
+
+import random
+import pytest
+from src.bitboard import Position
+from src.connect_4 import heuristic
+
+np = pytest.importorskip("numpy")
+# pylint: disable-next=wrong-import-position
+from src.batch import heuristic_batch, bitboards, bitboards_to_cells
+
+
+def random_positions(count=300, seed=11):
+    """Return positions reached by random moves from a fixed seed"""
+    rng = random.Random(seed)
+    positions = []
+    for _ in range(count):
+        position = Position()
+        for _ in range(rng.randint(0, 42)):
+            if position.is_full() or position.is_win(3 - position.player):
+                break
+            position.play(rng.choice(position.valid_columns()))
+        positions.append(position)
+    return positions
+
+
+def test_batch_matches_heuristic_for_boards():
+    """Check that the batch scores of list boards equal heuristic"""
+    boards = [position.to_board() for position in random_positions()]
+    assert heuristic_batch(np.array(boards)).tolist() == [heuristic(b) for b in boards]
+
+
+def test_batch_matches_heuristic_for_bitboards():
+    """Check that the batch scores of bitboard pairs equal heuristic"""
+    positions = random_positions()
+    expected = [heuristic(position.to_board()) for position in positions]
+    assert heuristic_batch(bitboards(positions)).tolist() == expected
+
+
+def test_bitboards_to_cells():
+    """Check that bitboard pairs are converted to the create_board layout"""
+    positions = random_positions(20)
+    cells = bitboards_to_cells(bitboards(positions))
+    assert cells.tolist() == [position.to_board() for position in positions]
+
+
+def test_empty_batch():
+    """Check that an empty batch gives no scores"""
+    assert len(heuristic_batch(np.zeros((0, 6, 7), dtype=int))) == 0
@@ -0,0 +1,65 @@
+"""This module is for testing the benchmark in file benchmark.py"""
+
+import pytest
+from src.benchmark import (
+    POSITIONS, bench_position, compare, load_baseline, run_benchmark, save_baseline
+)
+from src.bitboard import playable_cells, winning_cells
+from src.connect_4 import POLL_INTERVAL
+from src.solver import position_from_moves
+
+SMALL = [("opening", ""), ("middlegame", "41215417512"), ("endgame", "466116636564374731432")]
+
+
+def test_positions_are_not_decided():
+    """Check that no benchmark position is won or has a win in one for the side to move"""
+    for _, moves in POSITIONS:
+        position = position_from_moves(moves)
+        assert not position.is_win(3 - position.player)
+        own = position.boards[position.player]
+        mask = position.boards[0]
+        assert not winning_cells(own, mask) & playable_cells(mask)
+
+
+def test_fixed_depth_is_reproducible():
+    """Check that a fixed depth search gives the same nodes and move every time"""
+    first = bench_position("324", depth=6)
+    second = bench_position("324", depth=6)
+    assert first["depth"] == 6 and len(first["time_to_depth"]) == 6
+    assert (first["nodes"], first["move"], first["score"]) == \
+        (second["nodes"], second["move"], second["score"])
+
+
+def test_fixed_nodes_stop_search():
+    """Check that a fixed node search stops within a poll interval of the limit"""
+    result = bench_position("", nodes=5000)
+    assert 5000 <= result["nodes"] < 5000 + POLL_INTERVAL
+    assert result["move"] is not None
+
+
+def test_signature_is_total_nodes():
+    """Check that the signature of a run is the sum of the nodes of its positions"""
+    result = run_benchmark(depth=5, positions=SMALL)
+    assert result["signature"] == sum(position["nodes"] for position in result["positions"])
+    assert [position["phase"] for position in result["positions"]] == \
+        ["opening", "middlegame", "endgame"]
+
+
+def test_compare_finds_regressions(tmp_path):
+    """Check that more nodes or too much more time than the baseline are regressions"""
+    path = tmp_path / "baseline.json"
+    save_baseline(run_benchmark(depth=4, positions=SMALL), path)
+    baseline = load_baseline(path)
+    assert not compare(dict(baseline), baseline)
+    assert len(compare(dict(baseline, nodes=baseline["nodes"] + 1), baseline)) == 1
+    assert len(compare(dict(baseline, time=baseline["time"] * 1.3), baseline)) == 1
+    assert not compare(dict(baseline, time=baseline["time"] * 1.3), baseline, 0.5)
+
+
+def test_compare_other_settings_raises():
+    """Check that a baseline of another depth or other positions can't be compared"""
+    baseline = run_benchmark(depth=4, positions=SMALL)
+    with pytest.raises(ValueError):
+        compare(run_benchmark(depth=3, positions=SMALL), baseline)
+    with pytest.raises(ValueError):
+        compare(run_benchmark(depth=4, positions=SMALL[:2]), baseline)
@@ -0,0 +1,291 @@
+"""This module is for testing the bitboard position in file bitboard.py"""
+
+import pickle
+import random
+import pytest
+from src.bitboard import (
+    DEFAULT_GEOMETRY, FULL, Position, cell_bit, geometry, has_four, non_losing_cells,
+    playable_cells, winning_cells
+)
+from src.connect_4 import create_board, make_move, minimax, iterative_deepening
+
+
+def test_from_board_and_to_board_round_trip():
+    """Check that converting a list board to a position and back keeps it intact"""
+    board = [
+    [0, 0, 0, 0, 0, 0, 0],
+    [0, 0, 0, 0, 0, 0, 0],
+    [0, 0, 0, 0, 0, 0, 0],
+    [0, 0, 0, 1, 2, 0, 0],
+    [0, 0, 1, 2, 1, 2, 0],
+    [0, 0, 2, 1, 2, 1, 1]
+    ]
+    assert Position.from_board(board).to_board() == board
+
+
+def test_play_matches_make_move():
+    """Check that playing on a position matches make_move on a list board"""
+    board = create_board()
+    position = Position()
+    player = 1
+    for col in [3, 3, 2, 4, 4, 0, 6, 3]:
+        make_move(board, col, player)
+        position.play(col)
+        player = 3 - player
+    assert position.to_board() == board
+    assert position.player == player
+
+
+def test_undo_restores_position():
+    """Check that undo takes back moves exactly"""
+    position = Position()
+    for col in [3, 2, 3, 4]:
+        position.play(col)
+    key = position.key()
+    position.play(5)
+    position.play(5)
+    position.undo()
+    position.undo()
+    assert position.key() == key
+    assert position.moves == [3, 2, 3, 4]
+    assert position.player == 1
+
+
+def test_full_column_cannot_be_played():
+    """Check that a full column is reported as not playable"""
+    position = Position()
+    for _ in range(6):
+        position.play(0)
+    assert not position.can_play(0)
+    assert position.valid_columns() == [1, 2, 3, 4, 5, 6]
+
+
+def test_has_four_all_directions():
+    """Check horizontal, vertical and both diagonal wins"""
+    lines = [
+        [(x, 5) for x in range(4)],
+        [(0, y) for y in range(5, 1, -1)],
+        [(i, 5 - i) for i in range(4)],
+        [(3 - i, 5 - i) for i in range(4)],
+    ]
+    for line in lines:
+        bits = sum(1 << cell_bit(x, y) for x, y in line[:3])
+        assert not has_four(bits)
+        x, y = line[3]
+        assert has_four(bits | 1 << cell_bit(x, y))
+
+
+def test_winning_cells_all_directions():
+    """Check that the missing cell of a line of three is a winning cell in every direction"""
+    lines = [
+        ([(x, 5) for x in range(4)], range(4)),
+        ([(0, y) for y in range(5, 1, -1)], [3]),  # a vertical line can only grow upwards
+        ([(i, 5 - i) for i in range(4)], range(4)),
+        ([(3 - i, 5 - i) for i in range(4)], range(4)),
+    ]
+    for line, gaps in lines:
+        for gap in gaps:
+            bits = sum(1 << cell_bit(x, y) for x, y in line if (x, y) != line[gap])
+            x, y = line[gap]
+            gap_bit = 1 << cell_bit(x, y)
+            assert winning_cells(bits, bits) & gap_bit
+            assert not winning_cells(bits, bits | gap_bit) & gap_bit
+            assert winning_cells(bits, bits) & (bits | ~FULL) == 0
+
+
+def test_playable_cells():
+    """Check that the playable cells are the lowest empty cell of every column that isn't full"""
+    position = Position()
+    for col in [3, 3, 2] + [6] * 6:
+        position.play(col)
+    expected = [cell_bit(0, 5), cell_bit(1, 5), cell_bit(2, 4), cell_bit(3, 3), cell_bit(4, 5),
+                cell_bit(5, 5)]
+    assert playable_cells(position.boards[0]) == sum(1 << bit for bit in expected)
+
+
+def test_no_win_across_column_edge():
+    """Check that pieces at the top of one column and bottom of the next don't connect"""
+    cells = [(0, 1), (0, 0), (1, 5), (1, 4)]
+    assert not has_four(sum(1 << cell_bit(x, y) for x, y in cells))
+
+
+def test_minimax_on_position_matches_list_board():
+    """Check that minimax gives the same result for a list board and a position"""
+    board = [
+    [0, 0, 0, 0, 0, 0, 0],
+    [0, 0, 0, 0, 0, 0, 0],
+    [0, 0, 1, 0, 0, 0, 0],
+    [0, 0, 2, 0, 0, 0, 2],
+    [0, 2, 2, 0, 1, 0, 1],
+    [0, 1, 2, 0, 1, 1, 2]
+    ]
+    position = Position.from_board(board, 1)
+    expected = minimax(board, 5, float("-inf"), float("inf"), True, {})
+    assert minimax(position, 5, float("-inf"), float("inf"), True, {}) == expected
+    assert position.to_board() == board
+
+
+def test_iterative_deepening_on_position():
+    """Check that iterative deepening accepts a position and finds a win in one"""
+    position = Position()
+    for col in [0, 0, 1, 1, 2, 2]:
+        position.play(col)
+    result, _ = iterative_deepening(position, 1, True, None)
+    assert result == (100000, 3)
+
+
+def test_mirror_key():
+    """Check that the mirror key is the key of the reflected board"""
+    board = [
+    [0, 0, 0, 0, 0, 0, 0],
+    [0, 0, 0, 0, 0, 0, 0],
+    [0, 0, 0, 0, 0, 0, 0],
+    [0, 0, 0, 1, 2, 0, 0],
+    [0, 0, 1, 2, 1, 2, 0],
+    [0, 0, 2, 1, 2, 1, 1]
+    ]
+    mirrored = [row[::-1] for row in board]
+    position = Position.from_board(board)
+    assert position.mirror_key() == Position.from_board(mirrored).key()
+    assert position.canonical_key() == (min(position.key(), position.mirror_key()),
+                                         position.mirror_key() < position.key())
+
+
+def test_mirror_key_kept_by_play_and_undo():
+    """Check that play and undo keep the mirror key equal to reflecting the board"""
+    position = Position()
+    for col in [3, 2, 2, 6, 0, 0, 5]:
+        position.play(col)
+        reflected = Position.from_board([row[::-1] for row in position.to_board()],
+                                        position.player)
+        assert position.mirror_key() == reflected.key()
+    for _ in range(3):
+        position.undo()
+    rebuilt = Position.from_board(position.to_board(), position.player)
+    assert (position.key(), position.mirror_key()) == (rebuilt.key(), rebuilt.mirror_key())
+
+
+def random_positions(shape, count, seed):
+    """Return `count` positions of random unfinished games on a board of `shape`"""
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        position = Position(geometry=shape)
+        for _ in range(rng.randrange(shape.cells)):
+            position.play(rng.choice(position.valid_columns()))
+            if position.is_win(3 - position.player):
+                position.undo()
+                break
+        positions.append(position)
+    return positions
+
+
+def test_geometry_is_cached_and_picklable():
+    """Check that a board size is built once and survives pickling as the same object"""
+    assert geometry() is geometry(6, 7, 4) is DEFAULT_GEOMETRY
+    shape = geometry(7, 9, 5)
+    assert geometry(7, 9, 5) is shape and shape is not DEFAULT_GEOMETRY
+    assert pickle.loads(pickle.dumps(shape)) is shape
+    with pytest.raises(ValueError):
+        geometry(3, 3, 4)
+
+
+def test_geometry_tables():
+    """Check the center-first order and window counts of a few board sizes"""
+    assert DEFAULT_GEOMETRY.check_order == (3, 2, 4, 1, 5, 0, 6)
+    assert geometry(7, 8).check_order == (3, 4, 2, 5, 1, 6, 0, 7)
+    assert DEFAULT_GEOMETRY.weights[0] == (3, 4, 5, 7, 5, 4, 3)
+    assert DEFAULT_GEOMETRY.weights[2] == (5, 8, 11, 13, 11, 8, 5)
+    assert len(DEFAULT_GEOMETRY.windows) == 69
+    assert len(geometry(7, 9).windows) == 6 * 7 + 4 * 9 + 2 * 6 * 4
+
+
+def test_win_functions_match_windows():
+    """Check has_win and winning_cells against the windows on other sizes and lengths"""
+    for shape in [geometry(7, 6), geometry(7, 9), geometry(6, 7, 5), geometry(5, 5, 3)]:
+        for position in random_positions(shape, 30, shape.cols):
+            mask = position.boards[0]
+            for player in (1, 2):
+                bits = position.boards[player]
+                expected = 0
+                for window in shape.windows:
+                    cells = [1 << shape.cell_bit(x, y) for x, y in window]
+                    empty = [cell for cell in cells if not mask & cell]
+                    if len(empty) == 1 and all(bits & cell for cell in cells if cell != empty[0]):
+                        expected |= empty[0]
+                assert shape.winning_cells(bits, mask) == expected
+                assert shape.has_win(bits) == any(
+                    all(bits >> shape.cell_bit(x, y) & 1 for x, y in window)
+                    for window in shape.windows)
+
+
+def test_larger_board_round_trip():
+    """Check list board conversion, mirroring and undo on a 9x7 board"""
+    shape = geometry(7, 9)
+    position = random_positions(shape, 1, 3)[0]
+    board = position.to_board()
+    assert len(board) == 7 and len(board[0]) == 9
+    assert Position.from_board(board, position.player).boards == position.boards
+    mirrored = Position(geometry=shape)
+    for col in position.moves:
+        mirrored.play(shape.mirror_move(col))
+    assert mirrored.key() == position.mirror_key()
+    while position.moves:
+        position.undo()
+    assert position.boards == [0, 0, 0] and position.key_code == shape.bottom
+
+
+def test_cell_windows():
+    """Check that every cell lists exactly the windows through it"""
+    for shape in (DEFAULT_GEOMETRY, geometry(7, 9, 5)):
+        for x in range(shape.cols):
+            for y in range(shape.rows):
+                bit = shape.cell_bit(x, y)
+                expected = sorted(
+                    sum(1 << shape.cell_bit(*cell) for cell in window)
+                    for window in shape.windows if (x, y) in window)
+                assert sorted(shape.cell_windows[bit]) == expected
+                assert len(shape.coordinate_windows[y][x]) == len(expected)
+                assert shape.weights[y][x] == len(expected)
+
+
+def test_winning_moves():
+    """Check the winning move queries against playing every column"""
+    for shape in (DEFAULT_GEOMETRY, geometry(7, 8)):
+        for position in random_positions(shape, 60, 5):
+            expected = []
+            for col in position.valid_columns():
+                position.play(col)
+                if position.is_win(3 - position.player):
+                    expected.append(col)
+                position.undo()
+            assert position.winning_moves() == expected
+            assert [col for col in position.valid_columns()
+                    if position.is_winning_move(col)] == expected
+
+
+def test_non_losing_moves():
+    """Check that the non losing moves are the moves after which the opponent can't win at once"""
+    for position in random_positions(DEFAULT_GEOMETRY, 200, 6):
+        if position.winning_moves():
+            continue
+        expected = []
+        for col in position.valid_columns():
+            position.play(col)
+            if not position.winning_moves():
+                expected.append(col)
+            position.undo()
+        assert position.non_losing_moves() == expected
+
+
+def test_non_losing_cells_block_and_double_threat():
+    """Check that a single threat must be blocked and two threats leave nothing"""
+    position = Position()
+    for col in [0, 6, 1, 6, 2]:
+        position.play(col)
+    assert position.non_losing_moves() == [3]
+    position = Position()
+    for col in [1, 6, 2, 6, 3]:
+        position.play(col)
+    assert position.non_losing_moves() == []
+    assert non_losing_cells(position.boards[position.player], position.boards[0]) == 0
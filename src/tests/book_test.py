@@ -0,0 +1,94 @@
+"""This module is for testing the opening book in file book.py"""
+
+import pytest
+from src.bitboard import Position
+from src.book import (
+    OpeningBook, book_positions, generate_book, open_book, search_book_position
+)
+from src.connect_4 import create_board, make_move, iterative_deepening
+from src.engine import Engine
+
+
+@pytest.fixture(name="book_path", scope="module")
+def fixture_book_path(tmp_path_factory):
+    """Generate a small book once for the tests of this module"""
+    path = tmp_path_factory.mktemp("book") / "book.bin"
+    generate_book(path, 2, 4)
+    return path
+
+
+def test_book_positions_fold_mirror_images():
+    """Check the number of positions per move count when mirror images are folded"""
+    counts = [0, 0, 0, 0]
+    for moves in book_positions(3):
+        counts[len(moves)] += 1
+    assert counts == [1, 4, 25, 121]
+
+
+def test_book_header(book_path):
+    """Check that the book records its depth, ply and number of positions"""
+    with OpeningBook(book_path) as book:
+        assert (book.ply, book.depth, len(book)) == (2, 4, 30)
+
+
+def test_lookup_matches_search(book_path):
+    """Check that every book answer equals a search of the position"""
+    with OpeningBook(book_path) as book:
+        for moves in book_positions(2):
+            position = Position()
+            for col in moves:
+                position.play(col)
+            key, score, move = search_book_position(moves, 4)
+            assert book.lookup(position) == (score, move if key == position.key() else 6 - move)
+
+
+def test_lookup_mirrored_position(book_path):
+    """Check that a position and its mirror image get mirrored moves and the same score"""
+    left, right = Position(), Position()
+    for col in [1, 0]:
+        left.play(col)
+        right.play(6 - col)
+    with OpeningBook(book_path) as book:
+        left_score, left_move = book.lookup(left)
+        right_score, right_move = book.lookup(right)
+    assert left_score == right_score
+    assert left_move == 6 - right_move
+
+
+def test_lookup_missing_position(book_path):
+    """Check that a position deeper than the book isn't found"""
+    position = Position()
+    for col in [3, 3, 3]:
+        position.play(col)
+    with OpeningBook(book_path) as book:
+        assert book.lookup(position) is None
+
+
+def test_iterative_deepening_uses_book(book_path):
+    """Check that iterative deepening answers a book position from the book"""
+    board = create_board()
+    make_move(board, 2, 1)
+    with OpeningBook(book_path) as book:
+        expected = book.lookup(Position.from_board(board, 2))
+        result, depth = iterative_deepening(board, 10, False, (2, 5), book=book)
+    assert result == expected
+    assert depth == 4
+
+
+def test_not_a_book_raises(tmp_path):
+    """Check that opening a file that isn't a book raises a value error"""
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"not a book at all")
+    with pytest.raises(ValueError):
+        OpeningBook(path)
+
+
+def test_open_book_for_engine(book_path, tmp_path):
+    """Check that open_book opens an existing book for an engine and gives None without a file"""
+    assert open_book(tmp_path / "missing.bin") is None
+    with open_book(book_path) as book:
+        engine = Engine(1 << 10, book=book)
+        engine.play(3)
+        result = engine.best_move(budget=10)
+        assert (result.score, result.move) == book.lookup(engine.position)
+        assert result.depth == 4 and result.state.nodes == 0
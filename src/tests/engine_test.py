@@ -0,0 +1,118 @@
+"""This module is for testing the engine in file engine.py"""
+
+import time
+import pytest
+from src.bitboard import geometry
+from src.engine import Engine
+from src.evaluation import EvaluatedPosition
+
+
+def test_second_move_starts_deep():
+    """Check that the search of the next move answers its first depths from the kept table"""
+    engine = Engine(1 << 18)
+    result = engine.best_move(budget=0.3)
+    engine.play(result.move)
+    stats = engine.best_move(budget=0.3).state
+    assert all(record["nodes"] == 1 for record in stats.depths[:result.depth - 2])
+
+
+def test_search_starts_new_generation():
+    """Check that every search starts a new generation of the table"""
+    engine = Engine(1 << 10)
+    engine.best_move(budget=0.05)
+    engine.best_move(budget=0.05)
+    assert engine.memory.generation == 2
+
+
+def test_warm_start_from_file(tmp_path):
+    """Check that an engine loads the table saved by another and answers from it"""
+    path = tmp_path / "table.bin"
+    engine = Engine(1 << 16, table_path=path)
+    depth = engine.best_move(budget=0.3).depth
+    engine.save()
+    warm = Engine(table_path=path)
+    assert len(warm.memory) == len(engine.memory)
+    stats = warm.best_move(budget=0.3).state
+    assert all(record["nodes"] == 1 for record in stats.depths[:depth])
+
+
+def test_save_without_path_raises():
+    """Check that saving an engine without a table path raises a ValueError"""
+    with pytest.raises(ValueError):
+        Engine(1 << 10).save()
+
+
+def test_max_depth_stops_search():
+    """Check that a search with a maximum depth stops there however much time is left"""
+    assert Engine(1 << 10).best_move(budget=10, max_depth=4).depth == 4
+
+
+def test_play_reports_result():
+    """Check that play returns the result and refuses moves after the game or in full columns"""
+    engine = Engine(1 << 10)
+    for col in [0, 1, 0, 1, 0, 1]:
+        assert engine.play(col) is None
+    with pytest.raises(ValueError):
+        engine.play(7)
+    assert engine.play(0) == 1 and engine.winner() == 1
+    with pytest.raises(ValueError):
+        engine.play(2)
+    engine.new_game()
+    for col in [0] * 6:
+        engine.play(col)
+    with pytest.raises(ValueError):
+        engine.play(0)
+    engine.new_game(geometry(4, 4, 4))
+    for col in [0, 1, 2, 3] * 2 + [1, 0, 3, 2] * 2:
+        result = engine.play(col)
+    assert result == 0 and engine.winner() == 0
+
+
+def test_best_move_of_engine_game_and_other_position():
+    """Check that best_move searches the engine's game or a given position without changing it"""
+    engine = Engine(1 << 12)
+    for col in [0, 6, 1, 6, 2]:
+        engine.play(col)
+    result = engine.best_move(budget=float("inf"), max_depth=9)
+    assert result.move == 3 and result.score < 0
+    assert engine.position.moves == [0, 6, 1, 6, 2]
+    position = EvaluatedPosition()
+    for col in [0, 6, 1, 6, 2, 5]:
+        position.play(col)
+    assert engine.best_move(position, 0.2).move == 3
+    assert position.moves == [0, 6, 1, 6, 2, 5]
+    engine.new_game()
+    for col in [0, 6, 1, 6, 2, 6, 3]:
+        engine.play(col)
+    assert engine.best_move(budget=0.2).move is None
+
+
+def test_pondering_stops_on_play():
+    """Check that pondering runs in the background and stops when a move is played"""
+    engine = Engine(1 << 12)
+    engine.play(3)
+    engine.ponder()
+    time.sleep(0.1)
+    assert engine.ponderer.is_running()
+    engine.play(3)
+    assert not engine.ponderer.is_running()
+
+
+def test_new_game_on_other_board_clears_table():
+    """Check that a game on another board clears the table and a game on the same board keeps it"""
+    engine = Engine(1 << 14)
+    engine.best_move(budget=float("inf"), max_depth=6)
+    engine.new_game()
+    assert len(engine.memory) > 0
+    engine.new_game(geometry(6, 7))
+    engine.new_game(geometry(7, 6))
+    assert len(engine.memory) == 0
+    for col in [2, 3, 2]:
+        engine.play(col)
+    result = engine.best_move(budget=float("inf"), max_depth=6)
+    fresh = Engine(1 << 14, geometry=geometry(7, 6))
+    for col in [2, 3, 2]:
+        fresh.play(col)
+    expected = fresh.best_move(budget=float("inf"), max_depth=6)
+    assert (result.move, result.score, result.state.nodes) == (
+        expected.move, expected.score, expected.state.nodes)
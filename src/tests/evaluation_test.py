@@ -0,0 +1,119 @@
+"""This module is for testing the incremental evaluation in file evaluation.py"""
+
+import random
+from src.bitboard import Position, geometry
+from src.connect_4 import create_board, heuristic
+from src.evaluation import EvaluatedPosition, evaluation_tables, run_score
+
+
+def regression_corpus(games=200, seed=2025):
+    """Yield the list board of every position in random games played from a fixed seed"""
+    rng = random.Random(seed)
+    for _ in range(games):
+        position = EvaluatedPosition()
+        while not position.is_full():
+            position.play(rng.choice(position.valid_columns()))
+            yield position.to_board()
+            if position.is_win(3 - position.player):
+                break
+
+
+def test_run_score_rules():
+    """Check the run values of a single line"""
+    assert run_score([0, 1, 1, 0, 0, 0, 0]) == 20
+    assert run_score([2, 1, 1, 0, 0, 0, 0]) == 2
+    assert run_score([1, 1, 1, 0, 0, 0, 0]) == 10
+    assert run_score([0, 1, 1, 1, 0, 0, 0]) == 100
+    assert run_score([2, 1, 1, 2, 0, 0, 0]) == 0
+    assert run_score([0, 2, 2, 0, 1, 0, 0]) == -20
+
+
+def test_score_matches_heuristic_on_corpus():
+    """Check that the incremental score equals heuristic on every position of the corpus"""
+    for board in regression_corpus():
+        assert EvaluatedPosition.from_board(board).score == heuristic(board)
+
+
+def test_heuristic_of_other_board_sizes():
+    """Check that heuristic scores list boards of other sizes like the incremental score"""
+    rng = random.Random(11)
+    for rows, cols in [(8, 7), (7, 6), (7, 9)]:
+        assert heuristic(create_board(rows, cols)) == 0
+        position = EvaluatedPosition(geometry=geometry(rows, cols))
+        while not position.is_full():
+            position.play(rng.choice(position.valid_columns()))
+            assert heuristic(position.to_board()) == position.score
+            if position.is_win(3 - position.player):
+                break
+
+
+def test_score_kept_up_to_date_by_play_and_undo():
+    """Check that play and undo keep the score equal to a full rescan"""
+    rng = random.Random(7)
+    position = EvaluatedPosition()
+    for _ in range(500):
+        if position.moves and (position.is_full() or rng.random() < 0.4):
+            position.undo()
+        else:
+            position.play(rng.choice(position.valid_columns()))
+        assert position.score == heuristic(position.to_board())
+    while position.moves:
+        position.undo()
+    assert position.score == 0
+
+
+def test_heuristic_of_evaluated_position():
+    """Check that heuristic returns the kept score for an evaluated position"""
+    board = [
+    [0, 0, 0, 0, 0, 0, 0],
+    [0, 0, 0, 0, 0, 0, 0],
+    [0, 0, 0, 0, 0, 0, 0],
+    [0, 0, 0, 1, 2, 0, 0],
+    [0, 0, 1, 2, 1, 2, 0],
+    [0, 0, 2, 1, 2, 1, 1]
+    ]
+    assert heuristic(EvaluatedPosition.from_board(board)) == 24
+
+
+def test_run_score_other_lengths():
+    """Check that runs one and two short of `connect` are scored for other lengths"""
+    assert run_score([0, 1, 1, 1, 0, 0, 0], connect=5) == 20
+    assert run_score([0, 1, 1, 1, 1, 0, 0], connect=5) == 100
+    assert run_score([0, 1, 1, 0, 0, 0, 0], connect=5) == 0
+    assert run_score([0, 2, 2, 0, 0], connect=3) == -100
+
+
+def test_score_kept_up_to_date_on_other_sizes():
+    """Check that play and undo keep the score equal to a full rescan on larger boards"""
+    rng = random.Random(8)
+    for shape in [geometry(7, 8), geometry(7, 9), geometry(6, 7, 5)]:
+        position = EvaluatedPosition(geometry=shape)
+        assert position.cell_lines is evaluation_tables(shape).cell_lines
+        for _ in range(300):
+            if position.moves and (position.is_full() or rng.random() < 0.4):
+                position.undo()
+            else:
+                position.play(rng.choice(position.valid_columns()))
+            assert position.score == EvaluatedPosition.from_position(position).score
+        while position.moves:
+            position.undo()
+        assert position.score == 0
+
+
+def test_play_and_undo_match_position():
+    """Check that the evaluated play and undo keep the bitboards and keys of a plain Position"""
+    rng = random.Random(9)
+    for shape in [geometry(), geometry(7, 9)]:
+        position = EvaluatedPosition(geometry=shape)
+        plain = Position(geometry=shape)
+        for _ in range(300):
+            if position.moves and (position.is_full() or rng.random() < 0.4):
+                position.undo()
+                plain.undo()
+            else:
+                col = rng.choice(position.valid_columns())
+                position.play(col)
+                plain.play(col)
+            assert (position.boards, position.heights, position.moves, position.player) == \
+                (plain.boards, plain.heights, plain.moves, plain.player)
+            assert (position.key(), position.mirror_key()) == (plain.key(), plain.mirror_key())
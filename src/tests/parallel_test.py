@@ -0,0 +1,108 @@
+"""This module is for testing the multi-core search in file parallel.py"""
+
+import pytest
+from src.connect_4 import create_board, make_move
+from src.parallel import (
+    SKIP_SIZE, measure_depths, parallel_iterative_deepening, skips_depth, worker_pool
+)
+from src.transposition import EXACT, TranspositionTable, table_bytes
+
+
+def win_in_one_board():
+    """Return a board where player 1 wins by playing column 4 (index 3)"""
+    board = create_board()
+    for col in range(3):
+        make_move(board, col, 1)
+        make_move(board, col, 2)
+    return board
+
+
+@pytest.mark.parametrize("mode", ["lazy", "root"])
+def test_parallel_finds_win_in_one(mode):
+    """Check that both modes find a win in one"""
+    result, depth, reports = parallel_iterative_deepening(
+        win_in_one_board(), 0.2, True, None, workers=2, mode=mode)
+    assert result[1] == 3
+    assert result[0] >= 100000
+    assert depth >= 1
+    assert len(reports) == 2
+
+
+@pytest.mark.parametrize("mode", ["lazy", "root"])
+def test_parallel_reports_nodes(mode):
+    """Check that every worker reports its node count and depth"""
+    result, depth, reports = parallel_iterative_deepening(
+        create_board(), 0.2, True, None, workers=2, mode=mode)
+    assert 0 <= result[1] < 7
+    assert depth >= 1
+    assert [report["worker"] for report in reports] == [0, 1]
+    assert all(report["nodes"] > 0 and report["depth"] >= 1 for report in reports)
+
+
+def test_parallel_detects_win_immediately():
+    """Check that an already won game returns at once"""
+    board = create_board()
+    for i in range(4):
+        make_move(board, i, 1)
+    result = parallel_iterative_deepening(board, 1, True, (3, 5), workers=2)
+    assert result == ((None, None), None, [])
+
+
+@pytest.mark.parametrize("mode", ["lazy", "root"])
+def test_parallel_full_board_is_a_draw(mode):
+    """Check that a full board without a win is a draw in both modes like in the serial search"""
+    board = [[1, 1, 2, 1, 1, 2, 1] if row % 2 == 0 else [2, 2, 1, 2, 2, 1, 2]
+             for row in range(6)]
+    result, _, _ = parallel_iterative_deepening(board, 0.2, True, None, workers=2, mode=mode)
+    assert result == (0, None)
+
+
+def test_lazy_workers_spread_over_depths():
+    """Check that the Lazy SMP workers search depth 1 but don't follow the same depth schedule"""
+    workers = range(len(SKIP_SIZE) + 1)
+    assert not any(skips_depth(worker, 1) for worker in workers)
+    assert not any(skips_depth(0, depth) for depth in range(1, 43))
+    schedules = {tuple(skips_depth(worker, depth) for depth in range(2, 20)) for worker in workers}
+    assert len(schedules) == len(workers)
+    for depth in range(2, 20):
+        searching = sum(not skips_depth(worker, depth) for worker in workers)
+        assert 1 < searching < len(workers)
+
+
+def test_parallel_unknown_mode_raises():
+    """Check that an unknown mode raises a value error"""
+    with pytest.raises(ValueError):
+        parallel_iterative_deepening(create_board(), 0.1, True, None, workers=1, mode="tree")
+
+
+def test_worker_pool_is_kept():
+    """Check that the searches reuse one started pool per number of workers"""
+    pool = worker_pool(2)
+    assert worker_pool(2) is pool
+    parallel_iterative_deepening(create_board(), 0.05, True, None, workers=2)
+    assert worker_pool(2) is pool
+
+
+def test_measure_depths():
+    """Check that the depth of the serial search and of both modes is measured for every position"""
+    rows = measure_depths(0.05, 2, positions=[("opening", ""), ("middlegame", "41215417512")])
+    assert [row["moves"] for row in rows] == ["", "41215417512"]
+    assert all(row[name] >= 1 for row in rows for name in ("serial", "lazy", "root"))
+
+
+def test_tables_share_a_buffer():
+    """Check that two tables on the same buffer see each other's entries"""
+    buffer = bytearray(table_bytes(64))
+    first = TranspositionTable(64, buffer)
+    second = TranspositionTable(64, buffer)
+    first[1234] = (5, EXACT, 42, 2)
+    assert second.get(1234) == (5, EXACT, 42, 2)
+
+
+def test_torn_entry_is_a_miss():
+    """Check that an entry whose two words don't belong together isn't returned"""
+    table = TranspositionTable(64)
+    table[1234] = (5, EXACT, 42, 2)
+    slot = (1234 % table.buckets) << 1
+    table.data[slot] += 1
+    assert table.get(1234) is None
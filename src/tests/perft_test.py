@@ -0,0 +1,44 @@
+"""This module is for testing perft in file perft.py"""
+
+import pytest
+from src.perft import KNOWN_COUNTS, divide, perft, run_perft, verify
+from src.solver import position_from_moves
+
+
+def test_known_counts():
+    """Check the bitboard code with and without a table and the list board code against perft"""
+    assert not verify(max_depth=5)
+    assert not verify(use_table=True, max_depth=7)
+    assert not verify("list", max_depth=4)
+
+
+def test_table_gives_same_counts():
+    """Check that counting with a table gives the counts of counting every path"""
+    position = position_from_moves("4453")
+    table = {}
+    assert perft(position, 6, table) == perft(position, 6) == KNOWN_COUNTS["4453"][6]
+    assert table and position.moves == [3, 3, 4, 2]
+
+
+def test_divide_sums_to_perft():
+    """Check that the counts of the moves add up to the count of the position"""
+    position = position_from_moves("12121233")
+    counts = divide(position, 5)
+    assert sorted(counts) == position.valid_columns()
+    assert sum(counts.values()) == KNOWN_COUNTS["12121233"][5]
+
+
+def test_won_game_moves_not_counted():
+    """Check that no move is played after a win and a win at the depth is counted"""
+    position = position_from_moves("121212")
+    assert perft(position, 1) == 7
+    assert divide(position, 2)[0] == 0
+    assert perft(position, 2) == 6 * 7
+
+
+def test_run_perft_reports_speed_and_rejects_won_game():
+    """Check the result of a perft run and that a won game raises a ValueError"""
+    result = run_perft("", 5)
+    assert result["count"] == 16807 and result["pps"] > 0
+    with pytest.raises(ValueError):
+        run_perft("1212121", 3)
@@ -0,0 +1,95 @@
+"""This module is for testing pondering in file ponder.py"""
+
+import time
+from src.connect_4 import (
+    SearchState, create_board, iterative_deepening, make_move
+)
+from src.ponder import Ponderer, expected_reply
+from src.evaluation import EvaluatedPosition
+from src.transposition import TranspositionTable
+
+# Generous limit for waiting on the background thread, far above what it
+# needs, so the tests don't depend on the speed of the machine.
+TIMEOUT = 10
+
+
+def wait_for_depth(memory, position, depth):
+    """Wait until `memory` has an entry searched to `depth` for `position`"""
+    deadline = time.time() + TIMEOUT
+    while time.time() < deadline:
+        entry = memory.get(position.canonical_key()[0])
+        if entry is not None and entry[0] >= depth:
+            return
+        time.sleep(0.01)
+    raise AssertionError(f"The background search didn't reach depth {depth}")
+
+
+def test_stop_is_quick():
+    """Check that stopping the background search returns in time and ends the thread"""
+    memory = TranspositionTable()
+    ponderer = Ponderer(memory)
+    ponderer.start(create_board(), True)
+    wait_for_depth(memory, EvaluatedPosition(), 2)
+    assert ponderer.is_running()
+    start = time.time()
+    nodes = ponderer.stop()
+    assert time.time() - start < TIMEOUT
+    assert not ponderer.is_running() and nodes > 0
+    assert ponderer.depth >= 1
+
+
+def test_expected_reply_is_pondered():
+    """Check that the reply stored in the table is the one pondered"""
+    memory = TranspositionTable()
+    board = create_board()
+    (_, move), _ = iterative_deepening(board, 0.2, True, None, memory=memory)
+    last_move = make_move(board, move, 1)
+    position = EvaluatedPosition.from_board(board, 2)
+    expected = expected_reply(position, memory)
+    assert expected is not None
+    ponderer = Ponderer(memory)
+    ponderer.start(board, False, last_move)
+    time.sleep(0.1)
+    ponderer.stop()
+    assert ponderer.expected == expected
+    assert ponderer.hit(expected) and not ponderer.hit((expected + 1) % 7)
+
+
+def test_ponder_hit_searches_deeper():
+    """Check that after a ponder hit a fixed depth search takes fewer nodes than with a new table"""
+    memory = TranspositionTable()
+    board = create_board()
+    (_, move), _ = iterative_deepening(board, float("inf"), True, None, memory=memory,
+                                       max_depth=6)
+    last_move = make_move(board, move, 1)
+    ponderer = Ponderer(memory)
+    ponderer.start(board, False, last_move)
+    pondered = EvaluatedPosition.from_board(board, 2)
+    pondered.play(ponderer.expected)
+    wait_for_depth(memory, pondered, 6)
+    ponderer.stop()
+    last_move = make_move(board, ponderer.expected, 2)
+    cold, warm = SearchState(), SearchState()
+    iterative_deepening(board, float("inf"), True, last_move, state=cold, max_depth=6)
+    iterative_deepening(board, float("inf"), True, last_move, state=warm, memory=memory,
+                        max_depth=6)
+    assert warm.nodes < cold.nodes
+
+
+def test_no_pondering_when_game_over():
+    """Check that a won game doesn't start a background search"""
+    board = create_board()
+    for col in [0, 1, 0, 1, 0, 1]:
+        make_move(board, col, 1 if col == 0 else 2)
+    last_move = make_move(board, 0, 1)
+    ponderer = Ponderer(TranspositionTable())
+    ponderer.start(board, False, last_move)
+    assert not ponderer.is_running()
+    assert ponderer.stop() == 0
+
+
+def test_earlier_deadline_is_kept():
+    """Check that iterative deepening keeps a deadline set on its state before it started"""
+    state = SearchState(deadline=0)
+    _, depth = iterative_deepening(create_board(), 5, True, None, state=state)
+    assert depth == 0 and state.nodes == 0
@@ -0,0 +1,111 @@
+"""This module is for testing the search server in file server.py"""
+
+import asyncio
+import json
+from src.server import Metrics, SearchServer
+from src.solver import position_from_moves
+
+
+async def exchange(port, messages):
+    """Send JSON lines to the server and return the answers by id"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    for message in messages:
+        writer.write((message if isinstance(message, str) else json.dumps(message)).encode()
+                     + b"\n")
+    await writer.drain()
+    answers = [json.loads(await reader.readline()) for _ in messages]
+    writer.close()
+    return {answer["id"]: answer for answer in answers}, [answer["id"] for answer in answers]
+
+
+def serve(test, workers=1):
+    """Run the coroutine function `test` with a started server and its port"""
+    async def run():
+        server = SearchServer(workers, table_size=1 << 14)
+        try:
+            return await test(server, await server.start(port=0))
+        finally:
+            await server.close()
+    return asyncio.run(run())
+
+
+def test_win_in_one_over_tcp():
+    """Check that the server answers a request with the winning move"""
+    async def test(_, port):
+        answers, _ = await exchange(port, [{"id": 1, "moves": "112233", "time_ms": 100}])
+        assert answers[1]["move"] == 3 and answers[1]["score"] > 0
+        assert not answers[1]["cached"] and answers[1]["latency_ms"] > 0
+    serve(test)
+
+
+def test_repeated_and_mirrored_positions_cached():
+    """Check that a repeated position and its mirror image are answered from the cache"""
+    async def test(server, port):
+        first, _ = await exchange(port, [{"id": 1, "moves": "445566", "time_ms": 100}])
+        again, _ = await exchange(port, [{"id": 2, "moves": "445566", "time_ms": 50},
+                                         {"id": 3, "moves": "443322", "time_ms": 100},
+                                         {"id": 4, "moves": "445566", "time_ms": 200}])
+        assert again[2]["cached"] and again[2]["move"] == first[1]["move"]
+        assert again[3]["cached"] and again[3]["move"] == 6 - first[1]["move"]
+        assert not again[4]["cached"]
+        assert server.metrics.cache_hits == 2
+    serve(test)
+
+
+def test_shorter_search_keeps_longer_cached():
+    """Check that a search finishing after a longer one of the same position doesn't replace it"""
+    async def test(server, _):
+        key = position_from_moves("44").canonical_key()[0]
+        search = asyncio.create_task(server.best_move("44", 50))
+        await asyncio.sleep(0)
+        longer = {"move": 3, "score": 0, "depth": 20, "nodes": 1}
+        server._cache[key] = (500, longer)  # pylint: disable=protected-access
+        await search
+        assert server._cache[key] == (500, longer)  # pylint: disable=protected-access
+    serve(test)
+
+
+def test_identical_requests_share_search():
+    """Check that requests for a position already being searched wait for that search"""
+    async def test(server, port):
+        answers, _ = await exchange(port, [{"id": i, "moves": "4", "time_ms": 200}
+                                           for i in range(3)])
+        assert sum(answer["coalesced"] for answer in answers.values()) == 2
+        assert len({answer["nodes"] for answer in answers.values()}) == 1
+        assert server.metrics.peak_queue_depth == 1
+    serve(test)
+
+
+def test_slow_search_does_not_block_others():
+    """Check that a short search is answered before a long one sent earlier"""
+    async def test(_, port):
+        answers, order = await exchange(port, [{"id": "slow", "moves": "", "time_ms": 1500},
+                                               {"id": "fast", "moves": "4", "time_ms": 50}])
+        assert order == ["fast", "slow"]
+        assert answers["fast"]["latency_ms"] < 1000
+    serve(test, workers=2)
+
+
+def test_bad_requests_get_errors():
+    """Check that bad requests are answered with an error and the connection stays open"""
+    async def test(server, port):
+        answers, _ = await exchange(port, ["not json", [1, 2],
+                                           {"id": 1, "moves": "48", "time_ms": 100},
+                                           {"id": 2, "moves": "4", "time_ms": 0},
+                                           {"id": 3, "moves": "4x", "time_ms": 100}])
+        assert all("error" in answer for answer in answers.values())
+        metrics, _ = await exchange(port, [{"id": "m", "type": "metrics"}])
+        assert metrics["m"]["errors"] == 5 and metrics["m"]["queue_depth"] == 0
+        assert server.metrics.requests == 5
+    serve(test)
+
+
+def test_latency_percentiles():
+    """Check the latency summary of the metrics"""
+    metrics = Metrics()
+    assert metrics.as_dict()["latency_p50_ms"] is None
+    metrics.latencies.extend(range(1, 101))
+    summary = metrics.as_dict()
+    assert (summary["latency_p50_ms"], summary["latency_p95_ms"], summary["latency_max_ms"]) \
+        == (51, 96, 100)
+    assert summary["latency_mean_ms"] == 50.5
@@ -0,0 +1,98 @@
+"""This module is for testing the exact solver in file solver.py"""
+
+import random
+import pytest
+from src.bitboard import Position, geometry
+from src.connect_4 import WIN_SCORE, SearchState, SearchTimeout, minimax
+from src.solver import CELLS, Solver, outcome, position_from_moves
+
+
+def random_endgames(count, pieces, seed):
+    """Return `count` unfinished positions of random games with at least `pieces` pieces"""
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        position = position_from_moves("")
+        for _ in range(rng.randint(pieces, CELLS - 2)):
+            position.play(rng.choice(position.valid_columns()))
+            if position.is_win(3 - position.player):
+                break
+        else:
+            positions.append(position)
+    return positions
+
+
+def test_win_in_one():
+    """Check that a win with the next move gets the highest score for the position"""
+    position = position_from_moves("112233")
+    solver = Solver()
+    assert solver.solve(position) == 18
+    assert outcome(position, 18) == ("win", 1)
+    assert solver.best_move(position) == (18, 3)
+
+
+def test_forced_loss():
+    """Check that a position with two threats of the opponent is a loss in two moves"""
+    position = position_from_moves("44553")
+    assert outcome(position, Solver().solve(position)) == ("loss", 2)
+
+
+def test_matches_full_depth_minimax():
+    """Check the result and game length against minimax searching to the end of the game"""
+    solver = Solver()
+    for position in random_endgames(40, 30, 1):
+        depth = CELLS - position.piece_count()
+        score, _ = minimax(position, depth, float("-inf"), float("inf"), True, {})
+        if position.player == 2:
+            score = -score
+        if score == 0:
+            expected = ("draw", depth)
+        else:
+            expected = ("win" if score > 0 else "loss", depth - (abs(score) - WIN_SCORE))
+        assert outcome(position, solver.solve(position)) == expected
+
+
+def test_analyze_scores_every_column():
+    """Check that the best column of analyze gives the score of the position"""
+    solver = Solver()
+    for position in random_endgames(10, 26, 2):
+        scores = solver.analyze(position)
+        assert [score is None for score in scores] == \
+            [not position.can_play(col) for col in range(7)]
+        assert max(score for score in scores if score is not None) == solver.solve(position)
+
+
+def test_middle_game_solved_quickly():
+    """Check that a position with 20 pieces is solved with few nodes"""
+    position = position_from_moves("44445666322522646126")
+    state = SearchState()
+    assert Solver().solve(position, state) == 3
+    assert state.nodes < 20000
+
+
+def test_solve_deadline():
+    """Check that the solver stops at the deadline of its SearchState"""
+    with pytest.raises(SearchTimeout):
+        Solver().solve(position_from_moves("4"), SearchState(deadline=0))
+
+
+def test_finished_game_raises():
+    """Check that solving a won game raises a ValueError"""
+    position = position_from_moves("1212121")
+    for method in [Solver().solve, Solver().analyze, Solver().best_move]:
+        with pytest.raises(ValueError):
+            method(position)
+
+
+def test_invalid_moves_raise():
+    """Check that moves outside the board or in a full column raise a ValueError"""
+    with pytest.raises(ValueError):
+        position_from_moves("48")
+    with pytest.raises(ValueError):
+        position_from_moves("1111111")
+
+
+def test_other_board_size_raises():
+    """Check that the solver refuses boards other than 6x7"""
+    with pytest.raises(ValueError):
+        Solver().solve(Position(geometry=geometry(7, 8)))
@@ -0,0 +1,131 @@
+"""This module is for testing the endgame tablebase in file tablebase.py"""
+
+import io
+import pytest
+from src.bitboard import Position, geometry
+from src.connect_4 import WIN_SCORE
+from src.engine import Engine
+from src.evaluation import EvaluatedPosition
+from src.solver import Solver, win_score
+from src.tablebase import (
+    DRAW, LOSS, WIN, Tablebase, _decode, generate_tablebase, random_games, record_games,
+    seed_positions
+)
+
+EMPTY = 10
+
+
+@pytest.fixture(name="seeds", scope="module")
+def fixture_seeds():
+    """Seed positions of a few random games"""
+    return seed_positions(random_games(20, EMPTY, seed=3), EMPTY)
+
+
+@pytest.fixture(name="path", scope="module")
+def fixture_path(seeds, tmp_path_factory):
+    """Tablebase file generated from the seeds"""
+    path = tmp_path_factory.mktemp("tablebase") / "tablebase.bin"
+    generate_tablebase(path, seeds, EMPTY)
+    return path
+
+
+def position_of(moves):
+    """Return the Position after the columns of `moves`"""
+    position = Position()
+    for col in moves:
+        position.play(col)
+    return position
+
+
+def test_seed_positions():
+    """Check that an unfinished game gives its first position with few enough empty cells"""
+    games = random_games(5, EMPTY, seed=1)
+    for moves in games:
+        position = position_of(moves)
+        assert position.piece_count() == 42 - EMPTY and not position.is_win(3 - position.player)
+    moves = games[0]
+    assert seed_positions([moves], 12) == [moves[:30]]
+    assert seed_positions([moves], EMPTY) == [moves]
+    assert not seed_positions([moves[:20], [0, 1] * 3 + [0]], EMPTY)
+
+
+def test_record_games_validates_columns():
+    """Check that games with columns outside 1-7 or moves in a full column are left out"""
+    lines = io.StringIO("4453\n0123\n489\n1111111\n{\"moves\": \"44\"}\n")
+    assert record_games(lines) == ([[3, 3, 4, 2], [3, 3]], 3)
+
+
+def test_decode():
+    """Check that the mask and mirror code are recovered from the key code"""
+    position = position_of([3, 3, 2, 6, 6, 6, 0])
+    assert _decode(position.key_code, position.geometry) == (position.boards[0],
+                                                            position.mirror_code)
+
+
+def test_results_agree_with_solver(seeds, path):
+    """Check the result and moves to the end of every reachable position against the solver"""
+    solver = Solver(1 << 16)
+    checked = 0
+    with Tablebase(path) as tablebase:
+        stack = [position_of(moves) for moves in seeds]
+        while stack:
+            position = stack.pop()
+            result, moves = tablebase.probe(position)
+            signed = {WIN: moves, LOSS: -moves, DRAW: 0}[result]
+            assert tablebase.probe_key(position.canonical_key()[0]) == signed
+            score = solver.solve(position)
+            if result == DRAW:
+                assert score == 0
+            else:
+                expected = win_score(position.piece_count() + moves - 1)
+                assert score == (expected if result == WIN else -expected)
+            checked += 1
+            if moves > 1 or result == DRAW:
+                for col in position.valid_columns():
+                    child = position_of(position.moves + [col])
+                    if not child.is_full():
+                        stack.append(child)
+        assert checked >= len(tablebase) and len(tablebase) > 100
+
+
+def test_probe_outside_tablebase(path, tmp_path):
+    """Check that positions with more empty cells or on another board aren't found"""
+    with Tablebase(path) as tablebase:
+        assert tablebase.probe(position_of([3, 3])) is None
+        assert tablebase.probe(Position(geometry=geometry(4, 4, 3))) is None
+    other = tmp_path / "other.bin"
+    other.write_bytes(b"C4BK" + bytes(20))
+    with pytest.raises(ValueError):
+        Tablebase(other)
+
+
+def test_parallel_generation_writes_same_file(seeds, path, tmp_path):
+    """Check that splitting the seeds between worker processes writes the same tablebase"""
+    parallel = tmp_path / "parallel.bin"
+    generate_tablebase(parallel, seeds, EMPTY, workers=2)
+    assert parallel.read_bytes() == path.read_bytes()
+
+
+def test_search_probes_tablebase(tmp_path):
+    """Check that a search with the tablebase gives the exact result in fewer nodes"""
+    path = tmp_path / "tablebase.bin"
+    seeds = seed_positions(random_games(20, 12, seed=4), 12)
+    generate_tablebase(path, seeds, 12)
+    solver = Solver(1 << 16)
+    with Tablebase(path) as tablebase:
+        for moves in seeds:
+            position = EvaluatedPosition()
+            for col in moves:
+                position.play(col)
+            plain = Engine(1 << 14).best_move(position, float("inf"), 6)
+            probed = Engine(1 << 14, tablebase=tablebase).best_move(position, float("inf"), 12)
+            assert probed.state.nodes <= plain.state.nodes
+            result, left = tablebase.probe(position)
+            if result == DRAW:
+                assert probed.score == 0
+            elif left > 1:
+                assert probed.state.tb_hits
+                assert abs(probed.score) == WIN_SCORE + probed.depth - left
+                assert (probed.score > 0) == ((position.player == 1) == (result == WIN))
+                scores = solver.analyze(position)
+                assert scores[probed.move] == max(score for score in scores if score is not None)
@@ -0,0 +1,82 @@
+"""This module is for testing the tournament runner in file tournament.py"""
+
+import json
+import math
+from src.evaluation import EvaluatedPosition
+from src.tournament import (
+    book_openings, play_match_game, random_openings, run_tournament, score_to_elo, summarize
+)
+
+
+def records(wins, draws, losses):
+    """Return tournament records with the given results for player A"""
+    return ([{"winner": "A"}] * wins + [{"winner": None}] * draws
+            + [{"winner": "B"}] * losses)
+
+
+def test_random_openings():
+    """Check that random openings have the given length, don't end the game and repeat"""
+    openings = random_openings(20, 6, seed=3)
+    assert len(openings) == 20 and all(len(moves) == 6 for moves in openings)
+    for moves in openings:
+        position = EvaluatedPosition()
+        for col in moves:
+            position.play(col)
+            assert not position.is_win(3 - position.player)
+    assert random_openings(20, 6, seed=3) == openings
+
+
+def test_book_openings():
+    """Check that book openings are every two move position with mirror images once"""
+    openings = book_openings(2)
+    assert len(openings) == 25 and all(len(moves) == 2 for moves in openings)
+
+
+def test_play_match_game():
+    """Check that a game is played to the end from its opening"""
+    moves, winner = play_match_game([3, 3], {"depth": 4}, {"depth": 1})
+    assert moves[:2] == [3, 3]
+    assert winner in (0, 1, 2)
+    position = EvaluatedPosition()
+    for col in moves:
+        position.play(col)
+    assert position.is_full() or position.is_win(winner)
+
+
+def test_summary_of_results():
+    """Check the score, Elo and its interval of a known result"""
+    summary = summarize(records(6, 2, 2))
+    assert (summary["games"], summary["wins"], summary["draws"], summary["losses"]) == (10, 6, 2, 2)
+    assert summary["score"] == 0.7
+    assert math.isclose(summary["elo"], 147.19, abs_tol=0.01)
+    assert summary["elo_low"] < summary["elo"] < summary["elo_high"]
+    assert summarize(records(3, 4, 3))["elo"] == 0
+
+
+def test_sprt_decisions():
+    """Check that the SPRT accepts H1 for a clear win, H0 for a clear loss and waits otherwise"""
+    assert summarize(records(60, 30, 10), elo0=0, elo1=50)["sprt"] == "H1"
+    assert summarize(records(10, 30, 60), elo0=0, elo1=50)["sprt"] == "H0"
+    assert summarize(records(6, 2, 5), elo0=0, elo1=50)["sprt"] is None
+    assert summarize(records(5, 0, 0))["sprt"] is None
+    assert summarize([])["score"] is None
+
+
+def test_score_to_elo_limits():
+    """Check the Elo difference of an even score and of winning or losing every game"""
+    assert score_to_elo(0.5) == 0
+    assert score_to_elo(1) == float("inf") and score_to_elo(0) == float("-inf")
+
+
+def test_tournament_streams_results(tmp_path):
+    """Check that every game is written as a JSON line with the colours swapped per opening"""
+    output = tmp_path / "results.jsonl"
+    summary = run_tournament({"depth": 3}, {"depth": 1}, [[3], [2, 4]], output, workers=2)
+    lines = [json.loads(line) for line in output.read_text().splitlines()]
+    assert len(lines) == summary["games"] == 4
+    assert sorted(line["game"] for line in lines) == [0, 1, 2, 3]
+    for line in lines:
+        assert line["moves"].startswith(line["opening"])
+        assert (line["player1"], line["player2"]) == (("A", "B") if line["game"] % 2 == 0
+                                                      else ("B", "A"))
+    assert summary["wins"] + summary["draws"] + summary["losses"] == 4
@@ -0,0 +1,177 @@
+"""This module is for testing the transposition table in file transposition.py"""
+
+import pytest
+from src.bitboard import Position, geometry
+from src.connect_4 import SearchState, minimax
+from src.transposition import EXACT, LOWER, UPPER, TranspositionTable, fold_key, table_bytes
+
+
+def test_store_and_get():
+    """Check that a stored entry can be read back"""
+    table = TranspositionTable(64)
+    table[12345] = (4, LOWER, -17, 3)
+    assert table.get(12345) == (4, LOWER, -17, 3)
+    assert 12345 in table
+    assert table.get(54321) is None
+
+
+def test_move_none_is_kept():
+    """Check that an entry without a best move reads back as None"""
+    table = TranspositionTable(64)
+    table[99] = (2, UPPER, 5, None)
+    assert table[99] == (2, UPPER, 5, None)
+
+
+def test_size_is_bounded():
+    """Check that the table never holds more entries than its size"""
+    table = TranspositionTable(16)
+    for key in range(1, 1000):
+        table[key] = (key % 10, EXACT, key, key % 7)
+    assert len(table) <= 2 * table.buckets <= 18
+
+
+def test_deeper_entry_is_kept():
+    """Check that a shallow entry doesn't push a deeper one out of the table"""
+    table = TranspositionTable(2)
+    buckets = table.buckets
+    deep, shallow, newest = 1, 1 + buckets, 1 + 2 * buckets
+    table[deep] = (8, EXACT, 100, 3)
+    table[shallow] = (2, EXACT, 50, 4)
+    table[newest] = (1, EXACT, 10, 5)
+    assert table.get(deep) == (8, EXACT, 100, 3)
+    assert table.get(shallow) is None
+    assert table.get(newest) == (1, EXACT, 10, 5)
+
+
+def test_deeper_entry_takes_deep_slot():
+    """Check that a deeper entry takes the deep slot and keeps the old one in the second"""
+    table = TranspositionTable(2)
+    old, new = 1, 1 + table.buckets
+    table[old] = (3, EXACT, 1, 0)
+    table[new] = (5, LOWER, 2, 1)
+    assert table.get(new) == (5, LOWER, 2, 1)
+    assert table.get(old) == (3, EXACT, 1, 0)
+
+
+def test_old_generation_gives_way():
+    """Check that an entry of an older search is replaced by a shallower one of a new search"""
+    table = TranspositionTable(2)
+    old, first, second = 1, 1 + table.buckets, 1 + 2 * table.buckets
+    table[old] = (9, EXACT, 100, 3)
+    table.new_search()
+    table[first] = (2, EXACT, 50, 4)
+    table[second] = (1, EXACT, 10, 5)
+    assert table.get(old) is None
+    assert table.get(first) == (2, EXACT, 50, 4)
+    assert table.get(second) == (1, EXACT, 10, 5)
+
+
+def test_old_generation_is_read():
+    """Check that entries of an older search are still found"""
+    table = TranspositionTable(64)
+    table[7] = (4, UPPER, -3, 6)
+    for _ in range(300):
+        table.new_search()
+    assert table.get(7) == (4, UPPER, -3, 6)
+    assert table.generation == 300 % 256
+
+
+def test_shared_table_is_not_aged():
+    """Check that a table on a buffer stays in the first generation"""
+    buffer = bytearray(table_bytes(64))
+    table = TranspositionTable(64, buffer)
+    table.new_search()
+    table[7] = (4, UPPER, -3, 6)
+    assert table.generation == 0
+    assert TranspositionTable(64, buffer).get(7) == (4, UPPER, -3, 6)
+
+
+def test_save_and_load(tmp_path):
+    """Check that a saved table loads with the same entries, count and generation"""
+    table = TranspositionTable(1000)
+    table.new_search()
+    for key in range(1, 300):
+        table[key * 7919] = (key % 12, key % 3, key - 150, key % 7)
+    path = tmp_path / "table.bin"
+    table.save(path)
+    loaded = TranspositionTable.load(path)
+    assert loaded.buckets == table.buckets and len(loaded) == len(table)
+    assert loaded.generation == table.generation
+    for key in range(1, 300):
+        assert loaded.get(key * 7919) == table.get(key * 7919)
+
+
+def test_load_rejects_other_files(tmp_path):
+    """Check that a file that isn't a whole saved table raises a ValueError"""
+    path = tmp_path / "table.bin"
+    path.write_bytes(b"not a table at all")
+    with pytest.raises(ValueError):
+        TranspositionTable.load(path)
+    TranspositionTable(100).save(path)
+    path.write_bytes(path.read_bytes()[:-8])
+    with pytest.raises(ValueError):
+        TranspositionTable.load(path)
+
+
+def test_minimax_with_table_matches_dict():
+    """Check that minimax gives the same result with a table as with a dict"""
+    position = Position()
+    for col in [3, 3, 2, 4]:
+        position.play(col)
+    expected = minimax(position, 6, float("-inf"), float("inf"), True, {})
+    small = TranspositionTable(100)
+    assert minimax(position, 6, float("-inf"), float("inf"), True, small) == expected
+    assert len(small) <= 102
+
+
+def test_exact_entry_is_reused():
+    """Check that searching the same position again is answered from the table"""
+    position = Position()
+    for col in [3, 3, 2, 4]:
+        position.play(col)
+    table = TranspositionTable()
+    first = minimax(position, 6, float("-inf"), float("inf"), True, table)
+    entry = table.get(position.canonical_key()[0])
+    assert entry[0] == 6 and entry[1] == EXACT
+    assert minimax(position, 6, float("-inf"), float("inf"), True, table) == first
+
+
+def test_mirror_image_shares_entry():
+    """Check that the mirror image of a searched position is answered from its entry"""
+    position = Position()
+    for col in [3, 3, 2, 4, 1]:
+        position.play(col)
+    mirrored = Position()
+    for col in [3, 3, 4, 2, 5]:
+        mirrored.play(col)
+    table = TranspositionTable()
+    score, move = minimax(position, 6, float("-inf"), float("inf"), False, table)
+    stored = len(table)
+    state = SearchState()
+    assert minimax(mirrored, 6, float("-inf"), float("inf"), False, table, state=state) == \
+        (score, 6 - move)
+    assert state.nodes == 1 and len(table) == stored
+
+
+def test_win_score_from_deeper_entry():
+    """Check that a win stored by a deeper search is scored for the depth it's reused at"""
+    position = Position()
+    for col in [0, 6, 1, 6, 2, 5]:
+        position.play(col)
+    table = TranspositionTable()
+    assert minimax(position, 5, float("-inf"), float("inf"), True, table) == (100004, 3)
+    assert minimax(position, 3, float("-inf"), float("inf"), True, table) == (100002, 3)
+
+
+def test_large_keys_are_folded():
+    """Check that keys of boards larger than 64 bits are stored and read back"""
+    table = TranspositionTable(1 << 10)
+    shape = geometry(7, 9)
+    position = Position(geometry=shape)
+    for col in [0, 8, 8, 4]:
+        position.play(col)
+    key = position.key()
+    assert key >> 64 and fold_key(key) < 1 << 64 and fold_key(12345) == 12345
+    table[key] = (5, EXACT, 42, 8)
+    assert table.get(key) == (5, EXACT, 42, 8)
+    assert table.get(key ^ 1 << 70) is None
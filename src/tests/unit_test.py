@@ -1,11 +1,15 @@
 """This module is for testing the the functions in file connect_4.py"""
 
+import json
+import threading
 import time
 import pytest
-from connect_4 import (
-    create_board, make_move, check_win, check_draw,
-    heuristic, minimax, iterative_deepening
+from src.connect_4 import (
+    create_board, make_move, undo_move, check_win, check_draw,
+    heuristic, minimax, iterative_deepening, SearchState, SearchTimeout
 )
+from src.bitboard import geometry
+from src.evaluation import EvaluatedPosition
 
 # Board functionalities
 
@@ -33,6 +37,19 @@ def test_make_move_full_column_raises():
         make_move(board, 0, 1)
 
 
+def test_undo_move_restores_board():
+    """Test that undo_move takes back moves made with make_move in reverse order"""
+    board = create_board()
+    moves = [make_move(board, col, 1 + i % 2) for i, col in enumerate([3, 3, 2, 4, 3])]
+    for move in reversed(moves[2:]):
+        undo_move(board, move)
+    expected = create_board()
+    make_move(expected, 3, 1)
+    make_move(expected, 3, 2)
+    assert board == expected
+    assert make_move(board, 2, 1) == moves[2]
+
+
 # Check win correctness
 
 def test_check_win_horizontal():
@@ -237,3 +254,197 @@ def test_iterative_deepening_detects_win_in_one():
         make_move(board, i, 1)
     result, _ = iterative_deepening(board, 1, True, (2, 5))
     assert result[0] == 100000
+
+
+def test_iterative_deepening_stops_at_full_board():
+    """Check that iterative deepening doesn't search deeper than the empty cells"""
+    board = [
+            [0, 0, 2, 1, 2, 2, 2],
+            [1, 1, 1, 2, 1, 1, 1],
+            [2, 2, 2, 1, 2, 2, 2],
+            [1, 1, 2, 2, 1, 1, 1],
+            [2, 2, 1, 1, 2, 2, 2],
+            [1, 1, 1, 2, 1, 1, 1],
+    ]
+    start = time.time()
+    _, depth = iterative_deepening(board, 5, True, None)
+    assert time.time() - start < 1
+    assert depth <= 2
+
+
+def test_minimax_raises_when_deadline_passed():
+    """Check that minimax aborts a search whose deadline has passed"""
+    with pytest.raises(SearchTimeout):
+        minimax(create_board(), 8, float("-inf"), float("inf"), True, {},
+                state=SearchState(deadline=0))
+
+
+def test_iterative_deepening_hard_time_limit():
+    """Check that a passed deadline aborts the depth being searched instead of finishing it"""
+    state, results = SearchState(), []
+    search = threading.Thread(target=lambda: results.append(
+        iterative_deepening(create_board(), 3600, True, None, state=state)), daemon=True)
+    search.start()
+    deadline = time.time() + 10
+    while len(state.depths) < 7 or state.root_depth != len(state.depths) + 1:
+        assert time.time() < deadline
+        time.sleep(0.001)
+    aborted = state.root_depth
+    state.deadline = 0
+    search.join(10)
+    assert not search.is_alive()
+    (_, best_move), depth = results[0]
+    assert best_move is not None and depth == aborted - 1 == len(state.depths)
+
+
+def test_iterative_deepening_restores_position_after_timeout():
+    """Check that an aborted search leaves the searched position as it was"""
+    position = EvaluatedPosition()
+    for col in [3, 3, 2]:
+        position.play(col)
+    score, key = position.score, position.key()
+    iterative_deepening(position, 0.2, False, None)
+    assert position.moves == [3, 3, 2]
+    assert position.score == score and position.key() == key
+
+
+def test_iterative_deepening_returns_stats():
+    """Check that the statistics of a search are returned and add up"""
+    result, depth, stats = iterative_deepening(create_board(), 0.2, True, None, return_stats=True)
+    assert isinstance(result, tuple)
+    assert [record["depth"] for record in stats.depths] == list(range(1, depth + 1))
+    assert sum(record["nodes"] for record in stats.depths) <= stats.nodes
+    assert sum(stats.cutoff_index) == stats.cutoffs > 0
+    assert stats.tt_hits <= stats.tt_probes and stats.tt_stores > 0
+    assert 0 < stats.leaves < stats.nodes
+    assert stats.depths[1]["ebf"] == stats.depths[1]["nodes"] / stats.depths[0]["nodes"]
+
+
+def test_stats_are_machine_readable():
+    """Check that the statistics convert to JSON"""
+    _, _, stats = iterative_deepening(create_board(), 0.1, True, None, return_stats=True)
+    data = json.loads(stats.to_json())
+    assert data["nodes"] == stats.nodes
+    assert data["depths"][0]["depth"] == 1
+
+
+def test_iterative_deepening_prints_nothing(capsys):
+    """Check that the search doesn't write to the terminal"""
+    iterative_deepening(create_board(), 0.1, True, None)
+    assert capsys.readouterr().out == ""
+
+
+def test_principal_variation_search_node_count():
+    """Check the result and node count of a fixed depth search against the old full window search"""
+    position = EvaluatedPosition()
+    for col in [3, 3, 2, 4]:
+        position.play(col)
+    state = SearchState()
+    result = minimax(position, 9, float("-inf"), float("inf"), True, {}, state=state)
+    assert result == (29, 3)
+    # The search without null windows needed 136553 nodes for this position.
+    assert state.nodes < 136553 // 2
+
+
+def test_minimax_fail_low_and_high():
+    """Check that a window above or below the score returns a bound on the correct side"""
+    board = create_board()
+    score, _ = minimax(board, 5, float("-inf"), float("inf"), True, {})
+    assert minimax(board, 5, score + 10, score + 20, True, {})[0] <= score + 10
+    assert minimax(board, 5, score - 20, score - 10, True, {})[0] >= score - 10
+
+
+def test_win_in_one_found_without_searching():
+    """Check that a node with a winning move returns it without searching any child"""
+    position = EvaluatedPosition()
+    for col in [0, 6, 1, 6, 2, 5]:
+        position.play(col)
+    state = SearchState()
+    assert minimax(position, 6, float("-inf"), float("inf"), True, {}, state=state) == \
+        (100005, 3)
+    assert state.nodes == 1
+
+
+def test_forced_block_is_found():
+    """Check that the only move that stops a win in one is played"""
+    position = EvaluatedPosition()
+    for col in [6, 0, 5, 1, 0, 2]:
+        position.play(col)
+    assert minimax(position, 4, float("-inf"), float("inf"), True, {})[1] == 3
+
+
+def test_double_threat_lost_without_searching():
+    """Check that a node facing two winning cells of the opponent is lost without searching"""
+    position = EvaluatedPosition()
+    for col in [1, 6, 2, 6, 3]:
+        position.play(col)
+    state = SearchState()
+    score, move = minimax(position, 6, float("-inf"), float("inf"), False, {}, state=state)
+    assert score == 100004 and move in (0, 4)
+    assert state.nodes == 1
+
+
+def test_losing_moves_pruned_node_count():
+    """Check that skipping moves that hand the opponent a win keeps the result and cuts nodes"""
+    position = EvaluatedPosition()
+    for col in [3, 3, 2, 4]:
+        position.play(col)
+    state = SearchState()
+    assert minimax(position, 9, float("-inf"), float("inf"), True, {}, state=state) == (29, 3)
+    # Searching every move, with only immediate wins checked, needed 18453 nodes.
+    assert state.nodes < 18453
+
+
+def test_move_ordering_node_count():
+    """Check that killer and history ordering cut the node count of a fixed depth search"""
+    position = EvaluatedPosition()
+    for col in [3, 3, 2, 4]:
+        position.play(col)
+    state = SearchState()
+    assert minimax(position, 9, float("-inf"), float("inf"), True, {}, state=state) == (29, 3)
+    # With only the table move searched first the search needed 51832 nodes.
+    assert state.nodes < 51832 // 2
+    assert any(state.history[1]) and any(state.history[2])
+    assert state.killers[len(position.moves) + 1][0] is not None
+
+
+def test_history_kept_between_depths():
+    """Check that iterative deepening keeps the history and killers of earlier depths"""
+    _, depth, stats = iterative_deepening(create_board(), 0.3, True, None, return_stats=True)
+    assert depth > 2
+    assert sum(stats.history[1]) + sum(stats.history[2]) >= stats.cutoffs
+
+
+def test_list_board_of_other_size():
+    """Check board functions on a 7x9 list board with five in a row"""
+    board = create_board(7, 9)
+    assert len(board) == 7 and len(board[0]) == 9
+    for col in range(4):
+        last_move = make_move(board, col + 5, 1)
+    assert last_move == (8, 6)
+    assert check_win(board, last_move) and not check_win(board, last_move, connect=5)
+    assert check_win(board, make_move(board, 4, 1), connect=5)
+
+
+def test_search_on_larger_board():
+    """Check that a 9x7 search finds a win in one and blocks a win of the opponent"""
+    shape = geometry(7, 9)
+    position = EvaluatedPosition(geometry=shape)
+    for col in [8, 0, 7, 0, 6, 1]:
+        position.play(col)
+    assert minimax(position, 4, float("-inf"), float("inf"), True, {}) == (100003, 5)
+    position.undo()
+    position.play(3)
+    assert minimax(position, 4, float("-inf"), float("inf"), False, {})[1] == 5
+    (_, move), _, state = iterative_deepening(position, 0.3, False, None, return_stats=True)
+    assert move == 5
+    assert len(state.killers) == shape.cells + 1 and len(state.cutoff_index) == 9
+
+
+def test_search_state_fits_geometry():
+    """Check that the move ordering tables grow to fit a larger board and never shrink"""
+    state = SearchState()
+    state.fit(geometry(7, 9))
+    assert len(state.history[1]) == 9 * 8 and len(state.killers) == 64
+    state.fit(geometry())
+    assert len(state.history[2]) == 9 * 8 and len(state.killers) == 64
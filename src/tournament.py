@@ -0,0 +1,228 @@
+"""
+Module providing a headless tournament between two engine settings,
+played on all cores with the results streamed to a JSONL file.
+
+Run a tournament with:
+    python -m src.tournament --games 200 --a-time 0.1 --b-time 0.2 --output results.jsonl
+"""
+
+import argparse
+import json
+import math
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .book import OpeningBook, book_positions
+from .engine import Engine
+from .evaluation import EvaluatedPosition
+from .tablebase import Tablebase
+
+DEFAULT_TABLE_SIZE = 1 << 18
+
+
+def random_openings(count, plies, seed=None):
+    """Return `count` lists of `plies` random moves that don't end the game."""
+    rng = random.Random(seed)
+    openings = []
+    while len(openings) < count:
+        position = EvaluatedPosition()
+        for _ in range(plies):
+            position.play(rng.choice(position.valid_columns()))
+            if position.is_win(3 - position.player):
+                break
+        else:
+            openings.append(list(position.moves))
+    return openings
+
+
+def book_openings(plies):
+    """Return the moves of every position of exactly `plies` moves, mirror images once."""
+    return [moves for moves in book_positions(plies) if len(moves) == plies]
+
+
+def play_match_game(opening, first, second):
+    """
+    Play one game from the moves `opening` with the player settings `first`
+    as player 1 and `second` as player 2.
+    A player's settings is a dict with "time" (seconds per move) and/or
+    "depth" (fixed search depth), and optionally "table_size", "book"
+    (the path of an opening book) and "tablebase" (the path of a tablebase).
+    Every player has an Engine that follows the game.
+    Returns (moves, winner) where winner is 1, 2 or 0 for a draw.
+    """
+    settings = {1: first, 2: second}
+    engines = {1: _engine(first), 2: _engine(second)}
+    for col in opening:
+        for engine in engines.values():
+            engine.play(col)
+    winner = None
+    while winner is None:
+        player = engines[1].position.player
+        move = engines[player].best_move(budget=settings[player].get("time", float("inf")),
+                                         max_depth=settings[player].get("depth")).move
+        for engine in engines.values():
+            winner = engine.play(move)
+    return list(engines[1].position.moves), winner
+
+
+def _engine(settings):
+    """Return a new Engine for a player's settings."""
+    book = OpeningBook(settings["book"]) if settings.get("book") else None
+    tablebase = Tablebase(settings["tablebase"]) if settings.get("tablebase") else None
+    return Engine(settings.get("table_size", DEFAULT_TABLE_SIZE), book=book, tablebase=tablebase)
+
+
+def _moves_string(moves):
+    """Return moves as a string of 1-based columns."""
+    return "".join(str(col + 1) for col in moves)
+
+
+def run_tournament(player_a, player_b, openings, output, workers=None, sprt=None):
+    """
+    Play every opening twice, once with each player starting, between the
+    settings `player_a` and `player_b` (see `play_match_game`).
+    The games run in a process pool of `workers` processes (all cores by
+    default) and a JSON line per game is appended to the file `output` as
+    soon as the game ends. `sprt` is an optional (elo0, elo1, alpha, beta)
+    test; the tournament stops as soon as it accepts either hypothesis.
+    Returns the `summarize` dict of the games played.
+    """
+    sprt_args = dict(zip(("elo0", "elo1", "alpha", "beta"), sprt)) if sprt else {}
+    records = []
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        jobs = {}
+        for number, opening in enumerate(openings):
+            for side, names in enumerate((("A", "B"), ("B", "A"))):
+                first, second = (player_a, player_b) if side == 0 else (player_b, player_a)
+                job = executor.submit(play_match_game, opening, first, second)
+                jobs[job] = (2 * number + side, opening, names)
+        with open(output, "a", encoding="utf-8") as file:
+            for job in as_completed(jobs):
+                game, opening, names = jobs[job]
+                moves, winner = job.result()
+                record = {
+                    "game": game,
+                    "opening": _moves_string(opening),
+                    "player1": names[0],
+                    "player2": names[1],
+                    "moves": _moves_string(moves),
+                    "winner": names[winner - 1] if winner else None,
+                    "result": ("1-0", "0-1")[winner - 1] if winner else "1/2-1/2",
+                }
+                file.write(json.dumps(record) + "\n")
+                file.flush()
+                records.append(record)
+                if sprt and summarize(records, **sprt_args)["sprt"] is not None:
+                    break
+    finally:
+        executor.shutdown(cancel_futures=True)
+    return summarize(records, **sprt_args)
+
+
+def elo_to_score(elo):
+    """Return the expected score of a player `elo` points stronger than the opponent."""
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def score_to_elo(score):
+    """Return the Elo difference that gives the expected score `score`."""
+    if score <= 0:
+        return float("-inf")
+    if score >= 1:
+        return float("inf")
+    return -400 * math.log10(1 / score - 1)
+
+
+def summarize(records, elo0=0, elo1=10, alpha=0.05, beta=0.05):
+    """
+    Return the result of player A from tournament records: wins, draws,
+    losses, score, the Elo difference with the bounds of its 95% confidence
+    interval, and a sequential probability ratio test of H0 "A is elo0
+    stronger" against H1 "A is elo1 stronger". "llr" is the log-likelihood
+    ratio and "sprt" is "H0" or "H1" once it crosses a bound, else None.
+    The test uses the normal approximation of the score, so it stays
+    undecided until the games have at least two different results.
+    """
+    wins = sum(1 for record in records if record["winner"] == "A")
+    losses = sum(1 for record in records if record["winner"] == "B")
+    games = len(records)
+    draws = games - wins - losses
+    summary = {"games": games, "wins": wins, "draws": draws, "losses": losses,
+               "score": None, "elo": None, "elo_low": None, "elo_high": None,
+               "llr": 0.0, "lower": math.log(beta / (1 - alpha)),
+               "upper": math.log((1 - beta) / alpha), "sprt": None}
+    if not games:
+        return summary
+    score = (wins + draws / 2) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2
+                + losses * score ** 2) / games
+    margin = 1.96 * math.sqrt(variance / games)
+    summary.update(score=score, elo=score_to_elo(score),
+                   elo_low=score_to_elo(score - margin), elo_high=score_to_elo(score + margin))
+    if variance > 0:
+        score0, score1 = elo_to_score(elo0), elo_to_score(elo1)
+        llr = games * (score1 - score0) * (2 * score - score0 - score1) / (2 * variance)
+        summary["llr"] = llr
+        if llr >= summary["upper"]:
+            summary["sprt"] = "H1"
+        elif llr <= summary["lower"]:
+            summary["sprt"] = "H0"
+    return summary
+
+
+def _player(prefix, args):
+    """Return the settings of player `prefix` from the command line arguments."""
+    settings = {"table_size": args.table_size}
+    for name in ("time", "depth", "book", "tablebase"):
+        value = getattr(args, f"{prefix}_{name}")
+        if value is not None:
+            settings[name] = value
+    if "time" not in settings and "depth" not in settings:
+        settings["time"] = 0.1
+    return settings
+
+
+def main():
+    """Command line entry point for running a tournament."""
+    parser = argparse.ArgumentParser(description="Play a connect four engine tournament.")
+    for prefix in ("a", "b"):
+        parser.add_argument(f"--{prefix}-time", type=float, help=f"seconds per move of {prefix}")
+        parser.add_argument(f"--{prefix}-depth", type=int, help=f"search depth of {prefix}")
+        parser.add_argument(f"--{prefix}-book", help=f"opening book file of {prefix}")
+        parser.add_argument(f"--{prefix}-tablebase", help=f"endgame tablebase file of {prefix}")
+    parser.add_argument("--games", type=int, default=100, help="games, two per opening")
+    parser.add_argument("--openings", choices=("random", "book"), default="random",
+                        help="random openings or every position of the book")
+    parser.add_argument("--plies", type=int, default=4, help="moves in every opening")
+    parser.add_argument("--seed", type=int, help="seed of the random openings")
+    parser.add_argument("--workers", type=int, help="worker processes (all cores by default)")
+    parser.add_argument("--table-size", type=int, default=DEFAULT_TABLE_SIZE,
+                        help="transposition table entries per engine")
+    parser.add_argument("--sprt", type=float, nargs=2, metavar=("ELO0", "ELO1"),
+                        help="stop when the SPRT of elo0 against elo1 is decided")
+    parser.add_argument("--output", default="tournament.jsonl", help="JSONL file to append to")
+    args = parser.parse_args()
+
+    pairs = max(1, args.games // 2)
+    if args.openings == "book":
+        openings = book_openings(args.plies)
+        openings = (openings * (pairs // len(openings) + 1))[:pairs]
+    else:
+        openings = random_openings(pairs, args.plies, args.seed)
+    sprt = (args.sprt[0], args.sprt[1], 0.05, 0.05) if args.sprt else None
+    summary = run_tournament(_player("a", args), _player("b", args), openings,
+                             args.output, args.workers, sprt)
+    print(f"Games {summary['games']}: A won {summary['wins']}, drew {summary['draws']}, "
+          f"lost {summary['losses']}")
+    if summary["games"]:
+        print(f"Elo of A: {summary['elo']:.1f} ({summary['elo_low']:.1f} to "
+              f"{summary['elo_high']:.1f})")
+    if sprt:
+        print(f"SPRT [{sprt[0]}, {sprt[1]}]: LLR {summary['llr']:.2f} "
+              f"({summary['lower']:.2f}, {summary['upper']:.2f}) "
+              f"{summary['sprt'] or 'undecided'}")
+
+
+if __name__ == "__main__":
+    main()
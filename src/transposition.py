@@ -0,0 +1,197 @@
+"""Module providing a fixed-size transposition table for the minimax search."""
+
+import struct
+from array import array
+
+DEFAULT_TABLE_SIZE = 1 << 20
+
+# Bound types of a stored score
+EXACT, LOWER, UPPER = 0, 1, 2
+
+# An entry is packed into one 64-bit word: the score offset to be positive
+# in the low 32 bits, then the depth, the bound type, the move + 1 and the
+# generation of the search that stored it.
+_SCORE_OFFSET = 1 << 31
+_SCORE_MASK = (1 << 32) - 1
+GENERATIONS = 256
+
+# Keys of boards larger than the standard one can take more than 64 bits;
+# they are folded into 64 bits with a multiplicative hash of the high bits.
+_KEY_MASK = (1 << 64) - 1
+_FOLD_MULTIPLIER = 0x9E3779B97F4A7C15
+
+# A saved table is a header followed by the check and data words.
+MAGIC = b"C4TT"
+HEADER = struct.Struct("<4sIB")  # magic, bucket count, generation
+
+
+def _pack(depth, flag, score, move, generation=0):
+    """Pack an entry into one integer."""
+    move = 0 if move is None else move + 1
+    return (score + _SCORE_OFFSET) | depth << 32 | flag << 40 | move << 42 | generation << 48
+
+
+def _unpack(data):
+    """Return the (depth, flag, score, move) entry of a packed integer."""
+    move = (data >> 42) & 0x3F
+    return ((data >> 32) & 0xFF, (data >> 40) & 0x3,
+            (data & _SCORE_MASK) - _SCORE_OFFSET, move - 1 if move else None)
+
+
+def fold_key(key):
+    """Return a position key of any size as a 64-bit key; keys of up to 64 bits are kept."""
+    if key <= _KEY_MASK:
+        return key
+    return (key ^ (key >> 64) * _FOLD_MULTIPLIER) & _KEY_MASK
+
+
+def table_bytes(size):
+    """Return the number of bytes a table of `size` entries needs as a buffer."""
+    return 2 * 8 * 2 * (max(1, size // 2) | 1)
+
+
+class TranspositionTable:
+    """
+    Transposition table with a fixed number of entries.
+    Entries are (depth, flag, score, move) tuples keyed by `Position.key()`,
+    where flag tells if the score is EXACT, a LOWER bound (the search
+    failed high) or an UPPER bound (the search failed low).
+    The table is stored in flat arrays split into buckets of two slots:
+    the first slot keeps the deepest search seen for the bucket and the
+    second one always takes the newest entry, so memory use never grows
+    during a search. Supports the same `get` and item assignment as the
+    dict the search used to take, so a plain dict still works in its place.
+
+    Every entry also records the generation of the search that stored it.
+    `new_search` starts a new generation, and an entry of an older one can
+    be replaced in the deep slot by any newer entry, however shallow, so a
+    table kept between moves and games fills with the current positions
+    instead of staying full of old deep ones. Older entries are still read.
+    A table on a `buffer` isn't aged: every process sharing it would count
+    its own generations, so it stays in generation 0.
+    `save` and `load` keep a table on disk for a warm start.
+
+    Keys of more than 64 bits, from boards larger than the standard one,
+    are folded into 64 bits with `fold_key`.
+
+    Every slot is two words, the packed entry and the key XORed with it.
+    A slot only matches if both words were written by the same store, so
+    several processes can share one table through `buffer` (for example
+    a multiprocessing shared memory block of `table_bytes(size)` bytes)
+    without locks: an entry torn by a concurrent write is just a miss.
+    """
+
+    def __init__(self, size=DEFAULT_TABLE_SIZE, buffer=None):
+        # An odd bucket count spreads the structured bitboard keys evenly.
+        self.buckets = max(1, size // 2) | 1
+        slots = 2 * self.buckets
+        if buffer is None:
+            self.checks = array("Q", [0]) * slots
+            self.data = array("Q", [0]) * slots
+        else:
+            words = memoryview(buffer)[:table_bytes(size)].cast("Q")
+            self.checks = words[:slots]
+            self.data = words[slots:]
+        self.count = 0
+        self.generation = 0
+        self.shared = buffer is not None
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __getitem__(self, key):
+        entry = self.get(key)
+        if entry is None:
+            raise KeyError(key)
+        return entry
+
+    def get(self, key, default=None):
+        """Return the (depth, flag, score, move) entry stored for `key`, or `default`."""
+        if key > _KEY_MASK:
+            key = fold_key(key)
+        slot = (key % self.buckets) << 1
+        data = self.data[slot]
+        if self.checks[slot] ^ data != key:
+            slot += 1
+            data = self.data[slot]
+            if self.checks[slot] ^ data != key:
+                return default
+        return _unpack(data)
+
+    def __setitem__(self, key, entry):
+        """
+        Store a (depth, flag, score, move) entry.
+        The entry replaces the deep slot if it was searched at least as deep
+        as the one stored there or that one is from an older generation; the
+        displaced entry moves to the second slot. Otherwise the entry goes
+        to the second slot.
+        """
+        if key > _KEY_MASK:
+            key = fold_key(key)
+        data = _pack(*entry, self.generation)
+        slot = (key % self.buckets) << 1
+        checks, table = self.checks, self.data
+        old = table[slot]
+        old_key = checks[slot] ^ old
+        if (old_key == key or old_key == 0 or entry[0] >= (old >> 32) & 0xFF
+                or old >> 48 != self.generation):
+            if old_key not in (key, 0):
+                self._write(slot + 1, old_key, old)
+            elif checks[slot + 1] ^ table[slot + 1] == key:
+                checks[slot + 1] = table[slot + 1] = 0
+                self.count -= 1
+        else:
+            slot += 1
+        self._write(slot, key, data)
+
+    def _write(self, slot, key, data):
+        """Write a packed entry into `slot`, keeping the count of used slots."""
+        if self.checks[slot] == self.data[slot]:
+            self.count += 1
+        self.checks[slot] = key ^ data
+        self.data[slot] = data
+
+    def new_search(self):
+        """Start a new generation: entries stored from now on take precedence."""
+        if not self.shared:
+            self.generation = (self.generation + 1) % GENERATIONS
+
+    def save(self, path):
+        """Write the table to the file `path`."""
+        with open(path, "wb") as file:
+            file.write(HEADER.pack(MAGIC, self.buckets, self.generation))
+            file.write(memoryview(self.checks).cast("B"))
+            file.write(memoryview(self.data).cast("B"))
+
+    @classmethod
+    def load(cls, path):
+        """Return a table read from a file written by `save`."""
+        with open(path, "rb") as file:
+            magic, buckets, generation = HEADER.unpack(file.read(HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a transposition table")
+            checks, data = array("Q"), array("Q")
+            checks.frombytes(file.read(16 * buckets))
+            data.frombytes(file.read(16 * buckets))
+        if len(checks) != 2 * buckets or len(data) != 2 * buckets:
+            raise ValueError(f"{path} is truncated")
+        table = cls(2 * buckets)
+        table.checks, table.data = checks, data
+        table.generation = generation
+        table.count = sum(1 for check, word in zip(checks, data) if check != word)
+        return table
+
+    def clear(self):
+        """Remove all entries."""
+        slots = 2 * self.buckets
+        if isinstance(self.data, array):
+            self.checks = array("Q", [0]) * slots
+            self.data = array("Q", [0]) * slots
+        else:
+            self.checks.cast("B")[:] = bytes(8 * slots)
+            self.data.cast("B")[:] = bytes(8 * slots)
+        self.count = 0
+        self.generation = 0
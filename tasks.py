@@ -3,14 +3,66 @@ from invoke import task
 @task
 def test(ctx):
     """Run unit testing"""
-    ctx.run("pytest src/tests/unit_test.py --maxfail=1 --disable-warnings -q", pty=True)
+    ctx.run("pytest src/tests --ignore=src/tests/E2E_test.py --maxfail=1 --disable-warnings -q",
+            pty=True)
 
 @task
 def coverage(ctx):
     """Run unit testing with coverage report"""
-    ctx.run("pytest src/tests/unit_test.py --cov=src --cov-report=term-missing", pty=True)
+    ctx.run("pytest src/tests --ignore=src/tests/E2E_test.py --cov=src "
+            "--cov-report=term-missing", pty=True)
 
 @task
 def E2E(ctx):
     """Run a game with two AI playing each other win a semi-random time limit"""
     ctx.run("pytest src/tests/test_E2E.py -v --disable-warnings", pty=True)
+
+@task
+def book(ctx, ply=6, depth=8, workers=1):
+    """Generate the opening book"""
+    ctx.run(f"python -m src.book --ply {ply} --depth {depth} --workers {workers}", pty=True)
+
+@task
+def solve(ctx, moves=""):
+    """Solve a position given as the columns (1-7) played from the empty board"""
+    ctx.run(f"python -m src.solver {moves} --analyze", pty=True)
+
+@task
+def tournament(ctx, games=100, a_time=0.1, b_time=0.1, output="tournament.jsonl"):
+    """Play a tournament between two time controls on all cores"""
+    ctx.run(f"python -m src.tournament --games {games} --a-time {a_time} --b-time {b_time} "
+            f"--output {output}", pty=True)
+
+@task
+def bench(ctx, depth=10, update=False):
+    """Run the fixed depth benchmark and fail if it regressed from the baseline"""
+    ctx.run(f"python -m src.benchmark --depth {depth}" + (" --repeat 3 --update" if update else ""),
+            pty=True)
+
+@task
+def serve(ctx, port=8765, workers=0):
+    """Serve best moves as JSON over TCP on localhost"""
+    ctx.run(f"python -m src.server --port {port}" + (f" --workers {workers}" if workers else ""),
+            pty=True)
+
+@task
+def analyze(ctx, games="-", output="analysis.jsonl", depth=10):
+    """Analyse every position of a file of games to a JSONL file, continuing an interrupted run"""
+    ctx.run(f"python -m src.analysis {games} --output {output} --depth {depth}", pty=True)
+
+@task
+def parallel(ctx, time=2.0, workers=0):
+    """Compare the depth the serial and parallel searches reach in a fixed time"""
+    ctx.run(f"python -m src.parallel --time {time}" + (f" --workers {workers}" if workers else ""),
+            pty=True)
+
+@task
+def perft(ctx, depth=7, moves=""):
+    """Count the positions to a depth and check the board code against the known counts"""
+    ctx.run(f"python -m src.perft {moves} --depth {depth}", pty=True)
+
+@task
+def tablebase(ctx, empty=12, games=200, workers=1):
+    """Generate the endgame tablebase from the late positions of random games"""
+    ctx.run(f"python -m src.tablebase --empty {empty} --random {games} --workers {workers}",
+            pty=True)